@@ -6,6 +6,7 @@ import sys
 import discord
 from discord.ext import commands
 
+from classes.command_tree import LittleAngelCommandTree
 from classes.database import db
 from classes.scheduler import scheduler
 from modules.configuration import CONFIG
@@ -23,6 +24,7 @@ class LittleAngelBot(commands.AutoShardedBot):
             guild_messages=True,
             voice_states=True,
             auto_moderation_execution=True,
+            moderation=True,
         )
 
         next_status = next(CONFIG.ACTIVITY_NAMES)
@@ -32,6 +34,7 @@ class LittleAngelBot(commands.AutoShardedBot):
             case_insensitive=True,
             help_command=None,
             intents=discord_intents,
+            tree_cls=LittleAngelCommandTree,
             status=discord.Status.idle,
             activity=discord.Streaming(name=next_status.get("name"), url=next_status.get("streaming_url")) if next_status.get("streaming_url") else discord.CustomActivity(name=next_status.get("name"))
         )
@@ -58,6 +61,21 @@ class LittleAngelBot(commands.AutoShardedBot):
         await load_all_extensions(self, "listeners")
 
     async def close(self):
+        from modules.automod.action_executor import ACTION_EXECUTOR
+        from modules.automod.log_writer      import AUTOMOD_LOG_WRITER
+        from modules.automod.work_queue      import AUTOMOD_WORK_QUEUE
+        from modules.analysis_pool           import ANALYSIS_POOL
+        from modules.http_session            import close_http_session
+
+        await AUTOMOD_WORK_QUEUE.close()
+        await ACTION_EXECUTOR.close()
+        await AUTOMOD_LOG_WRITER.close()
+        await ANALYSIS_POOL.close()
+
+        await close_http_session()
+
+        LOGGER.info("Очередь действий модерации и логи автомодерации завершены")
+
         await db.close()
         await asyncio.to_thread(scheduler.shutdown, wait=True)
 
@@ -0,0 +1,11 @@
+import discord
+from discord import app_commands
+
+from modules.interaction_lane import INTERACTION_LANE
+
+class LittleAngelCommandTree(app_commands.CommandTree):
+
+    # каждое взаимодействие отмечается в отдельной очереди, чтобы автомодерация уступала ему цикл событий
+    async def _call(self, interaction: discord.Interaction):
+        INTERACTION_LANE.begin(interaction)
+        await super()._call(interaction)
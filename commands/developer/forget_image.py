@@ -0,0 +1,29 @@
+import discord
+from discord.ext import commands
+
+from classes.bot import LittleAngelBot
+from modules.automod.image_hash import KNOWN_IMAGES
+from modules.configuration import CONFIG
+
+class ForgetImage(commands.Cog):
+    def __init__(self, bot: LittleAngelBot):
+        self.bot = bot
+
+    # хэш берётся из лога срабатывания «Картинка из рейда»
+    @commands.command(name="forgetimage", description="Убрать картинку из индекса рейдовых картинок")
+    @commands.is_owner()
+    async def forget_image_command(self, ctx: commands.Context, image_hash: str):
+        try:
+            value = int(image_hash, 16)
+        except ValueError:
+            await ctx.reply(embed=discord.Embed(title="❌ Ошибка!", description="Хэш должен быть шестнадцатеричным числом из лога автомодерации", color=0xff0000))
+            return
+
+        if not await KNOWN_IMAGES.remove(value):
+            await ctx.reply(embed=discord.Embed(description="Такой картинки нет в индексе", color=CONFIG.LITTLE_ANGEL_COLOR))
+            return
+
+        await ctx.reply(embed=discord.Embed(description="☑️ Картинка убрана из индекса!", color=CONFIG.LITTLE_ANGEL_COLOR))
+
+async def setup(bot: LittleAngelBot):
+    await bot.add_cog(ForgetImage(bot))
@@ -0,0 +1,171 @@
+import asyncio
+import itertools
+import random
+import string
+import time
+import typing
+
+import discord
+from discord.ext import commands
+
+from classes.bot import LittleAngelBot
+from modules.analysis_pool import ANALYSIS_POOL
+from modules.automod.link_filter import detect_links
+from modules.automod.work_queue import AutomodWorkQueue
+from modules.configuration import CONFIG
+from modules.interaction_lane import INTERACTION_LANE, ACKNOWLEDGE_TARGET
+
+PROBE_INTERVAL       = 0.1  # как часто замерять задержку цикла событий во время прогона
+INTERACTION_INTERVAL = 0.5  # как часто отправлять проверочное взаимодействие во время прогона
+RUN_TIMEOUT          = 300  # сколько секунд максимум длится прогон, даже если часть задач не завершилась
+
+SYNTHETIC_FRAGMENTS = (
+    "привет всем, заходите",
+    "d i s c o r d . g g / ",
+    "ｄｉｓｃｏｒｄ．ｇｇ／",
+    "discord%2Egg%2F",
+    "t . m e / ",
+    "[жми сюда](https://example.com/",
+    "@everyone",
+)
+
+def synthetic_message() -> str:
+    parts = random.choices(SYNTHETIC_FRAGMENTS, k=random.randint(3, 8))
+    parts.append("".join(random.choices(string.ascii_letters + string.digits, k=random.randint(6, 40))))
+    return " ".join(parts) * random.randint(1, 20)
+
+class _ProbeResponse:
+    def __init__(self):
+        self.done = False
+
+    def is_done(self) -> bool:
+        return self.done
+
+# Проверочное взаимодействие: то, что InteractionLane читает у настоящего
+class ProbeInteraction:
+    _ids = itertools.count(1)
+
+    def __init__(self):
+        self.id = next(self._ids)
+        self.created_at = discord.utils.utcnow()
+        self.response = _ProbeResponse()
+
+def percentile(ordered: typing.List[float], p: float) -> float:
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))] if ordered else 0.0
+
+class RaidReplay(commands.Cog):
+    def __init__(self, bot: LittleAngelBot):
+        self.bot = bot
+
+    # Прогоняет синтетический рейд через отдельную очередь автомодерации (рабочая очередь не трогается)
+    # и замеряет задержку цикла событий и ответов на проверочные взаимодействия, которые идут через
+    # общий учёт взаимодействий и так же заставляют обработчики уступать
+    @commands.command(name="raidtest", description="Прогнать синтетический рейд через автомодерацию")
+    @commands.is_owner()
+    async def raid_replay(self, ctx: commands.Context, messages: int = 500):
+        loop = asyncio.get_running_loop()
+        finished = asyncio.Event()
+
+        queue = AutomodWorkQueue()
+        queue.start()
+
+        # все задачи ставятся до того, как обработчики успеют их взять: сверх ёмкости очередь
+        # вытесняла бы уже принятые задачи, и прогон ждал бы их завершения вечно
+        messages = max(0, min(messages, queue.capacity))
+        remaining = messages
+        accepted = 0
+
+        lane_before = INTERACTION_LANE.stats()
+        recorded_before = INTERACTION_LANE.recorded
+        acknowledgements: typing.List[float] = []
+        probes: typing.List[ProbeInteraction] = []
+
+        async def acknowledge(probe: ProbeInteraction):
+            # обработчик команды начинает работу на следующей итерации цикла событий
+            await asyncio.sleep(0)
+            probe.response.done = True
+            acknowledgements.append((discord.utils.utcnow() - probe.created_at).total_seconds())
+
+        async def job(text: str):
+            nonlocal remaining
+            try:
+                await detect_links(self.bot, text, follow_redirects=False)
+            finally:
+                remaining -= 1
+                if remaining <= 0:
+                    finished.set()
+
+        for _ in range(messages):
+            if queue.submit(3, lambda text=synthetic_message(): job(text)):
+                accepted += 1
+            else:
+                remaining -= 1
+
+        if remaining <= 0:
+            finished.set()
+
+        started = time.monotonic()
+        deadline = started + RUN_TIMEOUT
+        next_interaction = started
+        lags = []
+
+        try:
+            while not finished.is_set() and time.monotonic() < deadline:
+                if time.monotonic() >= next_interaction:
+                    probe = ProbeInteraction()
+                    probes.append(probe)
+                    INTERACTION_LANE.begin(probe, record=False)
+                    asyncio.create_task(acknowledge(probe))
+                    next_interaction += INTERACTION_INTERVAL
+
+                before = loop.time()
+                await asyncio.sleep(PROBE_INTERVAL)
+                lags.append(loop.time() - before - PROBE_INTERVAL)
+        finally:
+            await queue.close()
+
+        duration = time.monotonic() - started
+        unfinished = max(0, remaining)
+
+        # дожидается ответов на последние проверочные взаимодействия
+        while len(acknowledgements) < len(probes):
+            await asyncio.sleep(PROBE_INTERVAL)
+
+        lags.sort()
+        p95 = percentile(lags, 0.95)
+        max_lag = lags[-1] if lags else 0.0
+
+        acknowledgements.sort()
+        acknowledge_p95 = percentile(acknowledgements, 0.95)
+        over_target = sum(1 for latency in acknowledgements if latency > ACKNOWLEDGE_TARGET)
+
+        # настоящие взаимодействия за время прогона: разница счётчиков до и после
+        lane = INTERACTION_LANE.stats()
+        real_missed = lane["missed"] - lane_before["missed"]
+        real_recorded = min(INTERACTION_LANE.recorded - recorded_before, len(INTERACTION_LANE.samples))
+        real_samples = sorted(list(INTERACTION_LANE.samples)[-real_recorded:]) if real_recorded else []
+        yields = lane["yields"] - lane_before["yields"]
+
+        pool = ANALYSIS_POOL.stats()
+        passed = max_lag < ACKNOWLEDGE_TARGET and acknowledge_p95 < ACKNOWLEDGE_TARGET and not real_missed and not unfinished
+
+        await ctx.reply(embed=discord.Embed(
+            title="☑️ Прогон завершён" if passed else "❌ Цель по задержке не выдержана",
+            description=(
+                f"Сообщений принято в очередь: `{accepted}/{messages}`\n"
+                f"Время обработки: `{duration:.2f}с`" + (f", не завершено за `{RUN_TIMEOUT}с`: `{unfinished}`" if unfinished else "") + "\n"
+                f"Задержка цикла событий: p95 `{p95 * 1000:.0f}мс`, максимум `{max_lag * 1000:.0f}мс` (цель `{ACKNOWLEDGE_TARGET * 1000:.0f}мс`)\n\n"
+                f"Проверочные взаимодействия: `{len(acknowledgements)}`, p95 ответа `{acknowledge_p95 * 1000:.0f}мс`, выше цели `{over_target}`\n"
+                f"Настоящие взаимодействия за прогон: `{len(real_samples)}`, p95 ответа `{percentile(real_samples, 0.95) * 1000:.0f}мс`, пропущено `{real_missed}`\n"
+                f"Уступок взаимодействиям: `{yields}`\n"
+                f"Медленных задач анализа: `{pool['slow']}`, снято по времени: `{pool['timeouts']}`"
+            ),
+            color=CONFIG.LITTLE_ANGEL_COLOR if passed else 0xff0000
+        ))
+
+    @raid_replay.error
+    async def raid_replay_error(self, ctx: commands.Context, error):
+        await ctx.reply(embed=discord.Embed(title="❌ Произошла ошибка!", color=0xff0000, description=f"```py\n{error}```"))
+
+async def setup(bot: LittleAngelBot):
+    await bot.add_cog(RaidReplay(bot))
@@ -8,6 +8,10 @@ from discord.ext import commands
 
 from classes.bot import LittleAngelBot
 from classes.database import db
+from modules.analysis_pool import ANALYSIS_POOL
+from modules.audit_log_cache import AUDIT_LOG
+from modules.automod.name_verdicts import NAME_VERDICTS
+from modules.automod.work_queue import AUTOMOD_WORK_QUEUE
 
 LOGGER = logging.getLogger(__name__)
 
@@ -31,7 +35,13 @@ class Ping(commands.Cog):
 
         status = "🟢 Отлично" if rest_latency < 300 else "🟠 Медленно"
 
-        await interaction.edit_original_response(content=f"🏓 Понг!\n\n**WebSocket задержка**: `{ws_latency}мс`\n**Реальная задержка** (время между командой и ответом): `{rest_latency}мс`\n**Задержка Базы Данных**: `{database_latency}мс`\n\n**Состояние**: {status}")
+        queue_stats = AUTOMOD_WORK_QUEUE.stats()
+        shed_count = sum(value for key, value in queue_stats.items() if key.startswith("shed_"))
+        pool_stats = ANALYSIS_POOL.stats()
+        audit_stats = AUDIT_LOG.stats()
+        name_stats = NAME_VERDICTS.stats()
+
+        await interaction.edit_original_response(content=f"🏓 Понг!\n\n**WebSocket задержка**: `{ws_latency}мс`\n**Реальная задержка** (время между командой и ответом): `{rest_latency}мс`\n**Задержка Базы Данных**: `{database_latency}мс`\n**Очередь автомодерации**: `{queue_stats['depth']}/{queue_stats['capacity']}` (пропущено проверок: `{shed_count}`, вытеснено: `{queue_stats.get('evicted', 0) + queue_stats.get('dropped', 0)}`)\n**Процессы анализа**: `{pool_stats['workers']}` (задач в процессах: `{pool_stats['offloaded']}`, на месте: `{pool_stats['inline']}`)\n**Журнал аудита в кэше**: `{audit_stats['keys']}` (найдено: `{audit_stats['hits']}`, не найдено: `{audit_stats['misses']}`)\n**Проверенные названия**: `{name_stats['size']}/{name_stats['capacity']}` (из кэша: `{name_stats['hits']}`, проверено: `{name_stats['misses']}`)\n\n**Состояние**: {status}")
 
     @ping.error
     async def ping_error(self, interaction: discord.Interaction, error):
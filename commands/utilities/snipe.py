@@ -3,15 +3,20 @@ import io
 import typing
 
 from aiocache import SimpleMemoryCache
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 import discord
 from discord import app_commands
 from discord.ext import commands
 
 from classes.bot import LittleAngelBot
+from modules.audit_log_cache import AUDIT_LOG
 from modules.configuration import CONFIG
+from modules.lock_manager import KeyedLockManager
 
 SNIPE_CACHE = SimpleMemoryCache()
+# список снайпов канала читается и перезаписывается целиком, поэтому параллельные удаления
+# в одном канале дописывают его по очереди и не затирают друг друга
+SNIPE_LOCKS = KeyedLockManager()
 
 async def snippet(bot: LittleAngelBot, ci: discord.Interaction, channel: typing.Union[discord.StageChannel, discord.TextChannel, discord.VoiceChannel, discord.Thread], index: int, view: discord.ui.View = None, method: str = None):
     user_permissions_in_channel = channel.permissions_for(ci.user)
@@ -200,21 +205,13 @@ class Snipe(commands.Cog):
 
     @commands.Cog.listener()
     async def on_bulk_message_delete(self, messages: typing.List[discord.Message]):
-        now = int(datetime.now(timezone.utc).timestamp())
+        deleted_at = discord.utils.utcnow()
 
         channel_id = messages[0].channel.id
-        existing = await SNIPE_CACHE.get(channel_id) or []
-
-        deleted_user = False
-        perms = False
-        try:
-            async for entry in messages[0].guild.audit_logs(limit=1, action=discord.AuditLogAction.message_bulk_delete):
-                perms = True
-                if entry.target.id == channel_id and int(entry.created_at.timestamp()) == now:
-                    deleted_user = entry.user
-        except:
-            pass
+        guild = messages[0].guild
+        perms = guild.me.guild_permissions.view_audit_log
 
+        sdicts = []
         for message in messages:
             if not message.is_system():
                 try:
@@ -224,9 +221,21 @@ class Snipe(commands.Cog):
                         files = [{'bytes': await a.read(use_cached=False), 'filename': a.filename} for a in message.attachments]
                 except (discord.NotFound, discord.HTTPException, asyncio.CancelledError, RuntimeError):
                     files = []
-                existing.append({'msg': message, 'perms': perms, 'deleted_user': deleted_user, 'files': files})
+                sdicts.append({'msg': message, 'perms': perms, 'deleted_user': False, 'files': files})
+
+        # снайпы сохраняются сразу, удаливший дописывается в них, когда придёт запись журнала
+        async with SNIPE_LOCKS.lock(channel_id):
+            existing = await SNIPE_CACHE.get(channel_id) or []
+            existing.extend(sdicts)
+            await SNIPE_CACHE.set(channel_id, existing, ttl=3600)
+
+        if not perms:
+            return
 
-        await SNIPE_CACHE.set(channel_id, existing, ttl=3600)
+        entry = await AUDIT_LOG.wait_for(guild, discord.AuditLogAction.message_bulk_delete, channel_id, after=deleted_at - timedelta(seconds=2))
+        if entry is not None and entry.user is not None:
+            for sdict in sdicts:
+                sdict['deleted_user'] = entry.user
 
 
     @commands.Cog.listener()
@@ -236,15 +245,14 @@ class Snipe(commands.Cog):
         if not message.guild:
             return
 
-        now = int(datetime.now(timezone.utc).timestamp())
+        deleted_at = discord.utils.utcnow()
 
         channel_id = message.channel.id
-        existing = await SNIPE_CACHE.get(channel_id) or []
 
         sdict = {
             'msg': message,
             'deleted_user': False,
-            'perms': False
+            'perms': message.guild.me.guild_permissions.view_audit_log
         }
         try:
             try:
@@ -254,16 +262,25 @@ class Snipe(commands.Cog):
         except (discord.NotFound, discord.HTTPException, asyncio.CancelledError, RuntimeError):
             sdict['files'] = []
 
-        try:
-            async for entry in message.guild.audit_logs(limit=1, action=discord.AuditLogAction.message_delete):
-                sdict['perms'] = True
-                if entry.target == message.author and entry.extra.channel.id == message.channel.id and int(entry.created_at.timestamp()) == now:
-                    sdict['deleted_user'] = entry.user
-        except:
-            pass
+        async with SNIPE_LOCKS.lock(channel_id):
+            existing = await SNIPE_CACHE.get(channel_id) or []
+            existing.append(sdict)
+            await SNIPE_CACHE.set(channel_id, existing, ttl=3600)
+
+        if not sdict['perms']:
+            return
 
-        existing.append(sdict)
-        await SNIPE_CACHE.set(channel_id, existing, ttl=3600)
+        # своё сообщение участник удаляет без записи в журнале, поэтому снайп сохраняется сразу,
+        # а удаливший дописывается, когда запись придёт
+        entry = await AUDIT_LOG.wait_for(
+            message.guild,
+            discord.AuditLogAction.message_delete,
+            message.author.id,
+            after=deleted_at - timedelta(seconds=2),
+            check=lambda entry: entry.extra.channel.id == message.channel.id
+        )
+        if entry is not None and entry.user is not None:
+            sdict['deleted_user'] = entry.user
 
 
     @app_commands.command(name="снайп", description="Показывает удалённые сообщения в канале")
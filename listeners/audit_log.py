@@ -0,0 +1,16 @@
+import discord
+from discord.ext import commands
+
+from classes.bot import LittleAngelBot
+from modules.audit_log_cache import AUDIT_LOG
+
+class AuditLog(commands.Cog):
+    def __init__(self, bot: LittleAngelBot):
+        self.bot = bot
+
+    @commands.Cog.listener()
+    async def on_audit_log_entry_create(self, entry: discord.AuditLogEntry):
+        AUDIT_LOG.add(entry)
+
+async def setup(bot: LittleAngelBot):
+    await bot.add_cog(AuditLog(bot))
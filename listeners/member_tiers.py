@@ -0,0 +1,64 @@
+import discord
+from discord.ext import commands
+
+from classes.bot import LittleAngelBot
+from modules.automod.member_tiers import MEMBER_TIERS
+from modules.configuration import CONFIG
+
+class MemberTiers(commands.Cog):
+    def __init__(self, bot: LittleAngelBot):
+        self.bot = bot
+
+    @commands.Cog.listener()
+    async def on_ready(self):
+        guild = self.bot.get_guild(CONFIG.GUILD_ID)
+        if not guild:
+            return
+
+        if not guild.chunked:
+            await guild.chunk()
+
+        await MEMBER_TIERS.fill(guild)
+
+    @commands.Cog.listener()
+    async def on_member_join(self, member: discord.Member):
+        if member.guild.id != CONFIG.GUILD_ID:
+            return
+        MEMBER_TIERS.update(member)
+
+    @commands.Cog.listener()
+    async def on_member_remove(self, member: discord.Member):
+        MEMBER_TIERS.discard(member.id)
+
+    @commands.Cog.listener()
+    async def on_member_update(self, before: discord.Member, after: discord.Member):
+        if after.guild.id != CONFIG.GUILD_ID:
+            return
+        if before.roles != after.roles:
+            MEMBER_TIERS.update(after)
+
+    @commands.Cog.listener()
+    async def on_guild_role_update(self, before: discord.Role, after: discord.Role):
+        if after.guild.id != CONFIG.GUILD_ID:
+            return
+        if before.permissions != after.permissions:
+            for member in after.members:
+                MEMBER_TIERS.update(member)
+
+    @commands.Cog.listener()
+    async def on_guild_role_delete(self, role: discord.Role):
+        if role.guild.id != CONFIG.GUILD_ID:
+            return
+        # участники роли уже неизвестны, кэш заполнится заново при обращении
+        MEMBER_TIERS.clear()
+
+    @commands.Cog.listener()
+    async def on_guild_update(self, before: discord.Guild, after: discord.Guild):
+        if after.id != CONFIG.GUILD_ID:
+            return
+        if before.owner_id != after.owner_id:
+            MEMBER_TIERS.discard(before.owner_id)
+            MEMBER_TIERS.discard(after.owner_id)
+
+async def setup(bot: LittleAngelBot):
+    await bot.add_cog(MemberTiers(bot))
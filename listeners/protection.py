@@ -1,21 +1,33 @@
 import asyncio
-from collections import defaultdict, deque
+import functools
 from datetime import datetime, timedelta, timezone
 import logging
-import time
 import typing
 
 import discord
-from discord.ext import commands, tasks
+from discord.ext import commands
 
 from classes.bot import LittleAngelBot
-from modules.automod.attachment_spam_filter import check_attachment_spam, ATTACHMENTS_FROM_NEW_MEMBERS_CACHE
-from modules.automod.flood_filter import flood_and_messages_check, MESSAGES_FROM_NEW_MEMBERS_CACHE
+from modules.analysis_pool import ANALYSIS_POOL
+from modules.audit_log_cache import AUDIT_LOG
+from modules.automod.attachment_scanner import has_cached_verdict_shape, is_text_attachment, scan_text_attachment
+from modules.automod.attachment_spam_filter import check_attachment_spam, delete_attachment_spam, describe_attachments
+from modules.automod.content_fingerprints import KNOWN_CONTENTS
+from modules.automod.edit_scan import edit_scan_text, get_scanned_parts, remember_scanned
+from modules.automod.flood_filter import append_message, flood_and_messages_check
 from modules.automod.handle_violation import handle_automod_violation, handle_violation, safe_ban, safe_send_to_log, apply_invite_lockdown, DISCORD_AUTOMOD_CACHE, LOCK_MANAGER_FOR_DISCORD_AUTOMOD
-from modules.automod.link_filter import detect_links, check_message_for_invite_codes
-from modules.automod.mention_filter import check_mention_abuse, MENTIONS_FROM_NEW_MEMBERS_CACHE
+from modules.automod.image_hash import HASH_TIMEOUT, KNOWN_IMAGES, PRESSURE_TIMEOUT, hash_image_attachment, is_image_attachment
+from modules.automod.link_filter import detect_links, check_message_for_invite_codes, has_redirect_candidates
+from modules.automod.member_state import locked_member_state
+from modules.automod.member_tiers import MEMBER_TIERS
+from modules.automod.mention_filter import check_mention_abuse, delete_mention_abuse
+from modules.automod.mention_storm_filter import check_mention_storm
+from modules.automod.name_verdicts import NAME_VERDICTS
+from modules.automod.regex_audit import run_regex_audit
+from modules.automod.slowmode_controller import SlowmodeController
 from modules.automod.spam_filter import is_spam_block
-from modules.automod.thread_filter import flood_and_threads_check, THREADS_FROM_NEW_MEMBERS_CACHE
+from modules.automod.thread_filter import flood_and_threads_check
+from modules.automod.work_queue import AUTOMOD_WORK_QUEUE
 from modules.configuration import CONFIG
 from modules.extract_message_content import extract_message_content
 
@@ -23,92 +35,20 @@ class AutoModeration(commands.Cog):
     def __init__(self, bot: LittleAngelBot):
         self.bot = bot
 
-        self._channel_activity = defaultdict(lambda: deque())
-        self._channel_locks    = defaultdict(asyncio.Lock)
+        self.slowmode = SlowmodeController(bot)
 
-        self.SLOWMODE_LEVELS = [
-            (40, 30, 600),
-            (30, 15, 300),
-            (15, 3, 120),
-        ]
-        self._slowmode_state = {}
-        self.WINDOW          = 10
+        self._regex_audit: typing.Optional[asyncio.Task] = None
 
-    @commands.Cog.listener()
-    async def on_ready(self):
-        if not self._slowmode_task.is_running():
-            self._slowmode_task.start()
-
-    @tasks.loop(seconds=5)
-    async def _slowmode_task(self):
-        now = time.time()
-
-        for channel_id, times in list(self._channel_activity.items()):
-            channel = self.bot.get_channel(channel_id)
-            if not channel or not isinstance(channel, discord.TextChannel):
-                continue
-
-            async with self._channel_locks[channel_id]:
-                while times and now - times[0] > self.WINDOW:
-                    times.popleft()
-
-                count = len(times)
-                current_delay = channel.slowmode_delay
-
-                target_delay = 0
-                for limit, delay, _ in self.SLOWMODE_LEVELS:
-                    if count >= limit:
-                        target_delay = delay
-                        break
+    async def cog_load(self):
+        ANALYSIS_POOL.start()
+        self._regex_audit = asyncio.create_task(run_regex_audit())
+        await KNOWN_IMAGES.load()
+        await KNOWN_CONTENTS.load()
+        AUTOMOD_WORK_QUEUE.start()
 
-                last_state = self._slowmode_state.get(channel_id)
-
-                if target_delay > current_delay:
-                    try:
-                        await channel.edit(slowmode_delay=target_delay, reason="Ужесточение замедления в виду увеличения активности")
-                        self._slowmode_state[channel_id] = (target_delay, now)
-                    except (discord.Forbidden, discord.HTTPException):
-                        pass
-                    continue
-
-                if current_delay > target_delay and last_state:
-                    last_delay, since = last_state
-
-                    if last_delay != current_delay:
-                        self._slowmode_state[channel_id] = (current_delay, now)
-                        continue
-
-                    hold_time = next(
-                        (h for _, d, h in self.SLOWMODE_LEVELS if d == last_delay),
-                        120
-                    )
-
-                    if now - since < hold_time:
-                        continue
-
-                    lower_levels = [
-                        d for _, d, _ in self.SLOWMODE_LEVELS
-                        if d < last_delay
-                    ]
-
-                    next_delay = max(
-                        (d for d in lower_levels if d >= target_delay),
-                        default=target_delay
-                    )
-
-                    try:
-                        await channel.edit(slowmode_delay=next_delay, reason="Смягчение замедления в виду уменьшения активности")
-                        if next_delay > 0:
-                            self._slowmode_state[channel_id] = (next_delay, now)
-                        else:
-                            self._slowmode_state.pop(channel_id, None)
-                    except (discord.Forbidden, discord.HTTPException):
-                        pass
-
-                if not times and channel.slowmode_delay == 0:
-                    self._channel_activity.pop(channel_id, None)
-                    self._channel_locks.pop(channel_id, None)
-                    self._slowmode_state.pop(channel_id, None)
+    async def cog_unload(self):
+        self.slowmode.close()
+        await AUTOMOD_WORK_QUEUE.close()
 
     @commands.Cog.listener()
     async def on_thread_create(self, thread: discord.Thread):
@@ -123,20 +63,7 @@ class AutoModeration(commands.Cog):
             return
         
         # расстановка приоритетов
-        priority: int = 2
-
-        if thread.owner.guild_permissions.manage_messages:
-            priority = 0
-        else:
-            now = datetime.now(timezone.utc)
-
-            if thread.owner.joined_at:
-                difference_between_join_and_now = now - thread.owner.joined_at
-
-                if difference_between_join_and_now > timedelta(weeks=2):
-                    priority = 1
-                elif difference_between_join_and_now < timedelta(days=2):
-                    priority = 3
+        priority: int = MEMBER_TIERS.thread_priority(thread.owner)
 
         if priority == 0:
             return
@@ -180,21 +107,21 @@ class AutoModeration(commands.Cog):
                         force_ban=True
                     )
 
-                await THREADS_FROM_NEW_MEMBERS_CACHE.delete(thread.owner.id)
-
                 return
 
 
     @commands.Cog.listener()
     async def on_message_edit(self, message_before: discord.Message, message_after: discord.Message):
-        if message_before.content == message_after.content:
+        # повторно проверяется только изменённая часть текста и новые ембеды
+        rescan_text = await edit_scan_text(message_before, message_after)
+        if rescan_text is None:
             return
 
-        await self.on_message(message_after)
+        await self.on_message(message_after, rescan_text=rescan_text)
 
 
     @commands.Cog.listener()
-    async def on_message(self, message: discord.Message):
+    async def on_message(self, message: discord.Message, rescan_text: typing.Optional[str] = None):
 
         if not message.guild:
             return
@@ -225,44 +152,66 @@ class AutoModeration(commands.Cog):
                 except discord.NotFound:
                     return
         
-        priority: int = 2                       # расстановка приоритетов
-        difference_between_join_and_now = None  # время с момента присоединения
+        priority: int = MEMBER_TIERS.message_priority(message.author)  # расстановка приоритетов
 
-        if message.author.guild_permissions.manage_messages:
-            priority = 0
-        elif message.interaction_metadata:
+        if priority > 0 and message.interaction_metadata:
             priority = 3
         elif message.channel.id in CONFIG.ADS_CHANNELS_IDS:
             priority = 0
-        else:
-            now = datetime.now(timezone.utc)
 
-            if message.author.joined_at:
-                difference_between_join_and_now = now - message.author.joined_at
+        if priority == 0:
+            return
 
-                if difference_between_join_and_now > timedelta(weeks=2):
-                    priority = 1
-                elif next((role for role in message.author.roles if role.id in CONFIG.AUTOMOD_WHITELISTED_ROLES_IDS), None):
-                    priority = 1
-                elif difference_between_join_and_now < timedelta(days=2):
-                    priority = 3
+        # известная рассылка получает вердикт сразу, без очереди и сетевых проверок
+        known_match = await KNOWN_CONTENTS.match(message.content) if message.content and priority > 1 else None
+
+        if known_match:
+
+            preview = message.content[:300].replace("`", "'")
+
+            extra = (
+                f"Совпадение с известной рассылкой: {'точное' if known_match.exact else f'отличие {known_match.distance} бит из 64'}\n"
+                f"Причина, по которой рассылка запомнена: {known_match.reason}\n\n"
+                f"Содержание сообщения (первые 300 символов):\n```\n{preview}\n```"
+            )
+
+            await handle_violation(
+                self.bot,
+                detected_member=message.author,
+                detected_channel=message.channel,
+                detected_guild=message.guild,
+                detected_message=message,
+                reason_title="Известная рассылка",
+                reason_text="сообщение повторяет ранее замеченную рекламу",
+                extra_info=extra,
+                timeout_reason="Известная рассылка"
+            )
 
-        if priority == 0:
             return
 
-        if isinstance(message.channel, discord.TextChannel):
-            now = time.time()
-            channel_id = message.channel.id
+        if isinstance(message.channel, discord.TextChannel) and rescan_text is None:
+            self.slowmode.record_message(message.channel)
+
+        # сама проверка выполняется пулом обработчиков в порядке риска
+        AUTOMOD_WORK_QUEUE.submit(priority, functools.partial(self._moderate_message, message, priority, rescan_text))
 
-            async with self._channel_locks[channel_id]:
-                times = self._channel_activity[channel_id]
-                times.append(now)
+    # Окна участника (упоминания, флуд, вложения) обновляются и оцениваются за одно взятие блокировки
+    # состояния; сетевые запросы, удаления и кластеризация флуда в пуле выполняются без неё
+    async def _moderate_message(
+        self,
+        message: discord.Message,
+        priority: int,
+        rescan_text: typing.Optional[str] = None
+    ):
 
-                while times and now - times[0] > self.WINDOW:
-                    times.popleft()
+        # при редактировании вердикты по активности, вложениям и опросу берутся из первой проверки
+        scanned_parts = get_scanned_parts(message.id)
+
+        # при переполненной очереди дорогие сетевые проверки пропускаются
+        under_pressure = AUTOMOD_WORK_QUEUE.under_pressure
 
         # модерация активности  
-        if message.activity and priority > 0:
+        if message.activity and priority > 0 and "activity" not in scanned_parts:
 
             if message.activity.get('type') == 3 and (not message.activity.get('icon_override') or 'spotify:' not in message.activity.get('icon_override')):
 
@@ -297,43 +246,37 @@ class AutoModeration(commands.Cog):
 
                 return
             
+            remember_scanned(message.id, "activity")
+
         # модерация вложенных файлов
+        # под нагрузкой полная проверка файлов пропускается, но повторно присланные файлы
+        # получают вердикт из кэша, а картинки сравниваются с известными рейдовыми
         if message.attachments and priority > 0:
 
             for attachment in message.attachments:
 
-                if not attachment.content_type:
+                if attachment.id in scanned_parts:
                     continue
 
-                if attachment.content_type and any(ct in attachment.content_type for ct in [
-                    "text/", "application/json", "application/xml", 
-                    "application/x-yaml", "application/yaml"
-                ]):
-
-                    # ограничение по размеру
-                    # if attachment.size > MAX_FILE_SIZE_BYTES:
-                    #     continue
+                if is_text_attachment(attachment):
 
-                    try:
-                        file_bytes = await asyncio.wait_for(attachment.read(), timeout=30)
-                    except (asyncio.TimeoutError, discord.HTTPException):
+                    if under_pressure and not has_cached_verdict_shape(attachment):
+                        AUTOMOD_WORK_QUEUE.shed("attachments")
                         continue
 
-                    if file_bytes.count(b"\x00") > 100:
-                        continue
-
-                    content = file_bytes[:1_000_000].decode(errors='ignore')
-
-                    matched = await detect_links(self.bot, content)
+                    # файл читается потоком и не дальше бюджета CONFIG.ATTACHMENT_SCAN_BYTE_BUDGET
+                    scan_result = await scan_text_attachment(self.bot, attachment, cached_only=under_pressure)
 
-                    if matched:
+                    if scan_result and scan_result.matched:
 
-                        preview = content[:300].replace("`", "'")
+                        matched = scan_result.matched
+                        preview = scan_result.preview.replace("`", "'")
 
                         file_info = (
                             f"Имя файла: {attachment.filename}\n"
                             f"Размер: {attachment.size} байт\n"
                             f"Тип: {attachment.content_type}\n"
+                            f"Вердикт извлечён из кэша: {'Да' if scan_result.from_cache else 'Нет'}\n"
                         )
 
                         extra = (
@@ -356,9 +299,46 @@ class AutoModeration(commands.Cog):
                         )
 
                         return
-                    
+
+                elif is_image_attachment(attachment) and priority > 1:
+
+                    # картинка хэшируется по уменьшенной копии и сравнивается с картинками прошлых рейдов;
+                    # хэш остаётся в кэше, и при бане за это сообщение картинка попадает в индекс без повторной загрузки
+                    image_hash = await hash_image_attachment(attachment, timeout=PRESSURE_TIMEOUT if under_pressure else HASH_TIMEOUT)
+                    known_match = KNOWN_IMAGES.match(image_hash) if image_hash is not None else None
+
+                    if known_match:
+
+                        file_info = (
+                            f"Имя файла: {attachment.filename}\n"
+                            f"Размер: {attachment.size} байт\n"
+                            f"Тип: {attachment.content_type}\n"
+                            f"Отличие от известной картинки: {known_match.distance} бит из 64\n"
+                            f"Причина, по которой картинка добавлена: {known_match.reason}\n"
+                            f"Хэш известной картинки: {known_match.known_hash:016x}\n"
+                        )
+
+                        await handle_violation(
+                            self.bot,
+                            detected_member=message.author,
+                            detected_channel=message.channel,
+                            detected_guild=message.guild,
+                            detected_message=message,
+                            reason_title="Картинка из рейда",
+                            reason_text="картинка, ранее замеченная в рейде",
+                            extra_info=f"Информация о файле:\n```\n{file_info}```",
+                            timeout_reason="Картинка из рейда",
+                            force_mute=True
+                        )
+
+                        return
+
+            # пропущенные под нагрузкой файлы проверятся полностью при редактировании
+            if not under_pressure:
+                remember_scanned(message.id, *(attachment.id for attachment in message.attachments))
+
         # модерация опросов
-        if message.poll and priority > 0:
+        if message.poll and priority > 0 and "poll" not in scanned_parts:
 
             poll_options = " | ".join([f'"{option.text}"' for option in message.poll.answers])
             poll_content = (
@@ -390,12 +370,15 @@ class AutoModeration(commands.Cog):
                 )
 
                 return
-            
-        # детект злоупотребления упоминаниями
-        if message.content and priority > 2:
-            is_mention_abuse, mention_content = await check_mention_abuse(message.author, message)
 
-            if is_mention_abuse:
+            remember_scanned(message.id, "poll")
+
+        # детект массовых упоминаний одной цели с разных новых аккаунтов
+        # (отредактированное сообщение уже учтено в окне при отправке)
+        if message.content and priority > 2 and rescan_text is None:
+            storm_target = check_mention_storm(message.author, message)
+
+            if storm_target:
 
                 await handle_violation(
                     self.bot,
@@ -403,20 +386,68 @@ class AutoModeration(commands.Cog):
                     detected_channel=message.channel,
                     detected_guild=message.guild,
                     detected_message=message,
-                    reason_title="Злоупотребление упоминаниями",
-                    reason_text="злоупотребление упоминаниями",
-                    extra_info=f"Содержание сообщения (первые 300 символов):\n```\n{mention_content[:300].replace('`', '')}\n```",
-                    timeout_reason="Злоупотребление упоминаниями от нового участника",
-                    force_mute=True
+                    reason_title="Массовые упоминания",
+                    reason_text="участие в массовых упоминаниях с новых аккаунтов",
+                    extra_info=(
+                        f"Цель упоминаний: {storm_target}\n"
+                        f"Содержание сообщения (первые 300 символов):\n```\n{message.content[:300].replace('`', '')}\n```"
+                    ),
+                    timeout_reason="Массовые упоминания с новых аккаунтов",
+                    force_mute=True,
+                    remember_images=True
                 )
 
-                await MENTIONS_FROM_NEW_MEMBERS_CACHE.delete(message.author.id)
-
                 return
+
+        # окна участника: блок стоит после проверки файлов, чтобы отпечатки вложений
+        # брались по уже посчитанным хэшам содержимого
+        is_mention_abuse = is_attachment_spam = False
+
+        if priority > 2:
+            flood_content = await extract_message_content(self.bot, message)
+
+            async with locked_member_state(message.author.id) as state:
+                if message.content:
+                    is_mention_abuse, mention_messages = check_mention_abuse(state, message)
+
+                flood_messages = list(append_message(state, flood_content, message))
+
+                if message.attachments and CONFIG.ATTACHMENT_SPAM_FILTER:
+                    is_attachment_spam, attachment_messages = check_attachment_spam(state, message)
+
+            # окна уже сброшены, поэтому их сообщения удаляются сразу: само сообщение
+            # может раньше наказать другая проверка (реклама, флуд), и удаление бы потерялось
+            if is_mention_abuse:
+                await delete_mention_abuse(message.author, mention_messages)
+
+            if is_attachment_spam:
+                await delete_attachment_spam(message.author, attachment_messages)
+
+        # детект злоупотребления упоминаниями
+        if is_mention_abuse:
+
+            await handle_violation(
+                self.bot,
+                detected_member=message.author,
+                detected_channel=message.channel,
+                detected_guild=message.guild,
+                detected_message=message,
+                reason_title="Злоупотребление упоминаниями",
+                reason_text="злоупотребление упоминаниями",
+                extra_info=f"Содержание сообщения (первые 300 символов):\n```\n{message.content[:300].replace('`', '')}\n```",
+                timeout_reason="Злоупотребление упоминаниями от нового участника",
+                force_mute=True
+            )
+
+            return
             
         # детект рекламы
         if priority > 1:
-            matched = await detect_links(self.bot, message)
+            matched = await detect_links(self.bot, rescan_text or message, follow_redirects=not under_pressure)
+
+            # пропуском считается только текст, где переход по ссылке действительно не выполнен
+            if under_pressure and not matched and has_redirect_candidates(rescan_text or await extract_message_content(self.bot, message)):
+                AUTOMOD_WORK_QUEUE.shed("redirects")
 
             if matched:
 
@@ -436,14 +467,18 @@ class AutoModeration(commands.Cog):
                     reason_title="Реклама в сообщении",
                     reason_text="реклама в тексте сообщения",
                     extra_info=extra,
-                    timeout_reason="Реклама в сообщении"
+                    timeout_reason="Реклама в сообщении",
+                    remember_content=True
                 )
 
                 return
             
-        # детект всех инвайт кодов
+        # детект всех инвайт кодов (под нагрузкой только по уже проверенным кодам, без запросов к API)
         if priority > 2:
-            is_invite = await check_message_for_invite_codes(self.bot, message, message.guild.id)
+            is_invite = await check_message_for_invite_codes(self.bot, rescan_text or message, message.guild.id, cached_only=under_pressure)
+
+            if is_invite.get("skipped"):
+                AUTOMOD_WORK_QUEUE.shed("invites")
 
             if is_invite.get("found_invite"):
 
@@ -463,14 +498,15 @@ class AutoModeration(commands.Cog):
                     reason_title="Ссылка-приглашение в сообщении",
                     reason_text="Ссылка-приглашение в сообщении",
                     extra_info=extra,
-                    timeout_reason="Ссылка-приглашение в сообщении"
+                    timeout_reason="Ссылка-приглашение в сообщении",
+                    remember_content=True
                 )
 
                 return
 
-        # детект флуда
+        # детект флуда (сообщение уже добавлено в окно вместе с остальными окнами участника)
         if priority > 2:
-            is_flood, flood_content = await flood_and_messages_check(self.bot, message.author, message)
+            is_flood = await flood_and_messages_check(message.author, message, flood_messages)
 
             if is_flood:
 
@@ -487,8 +523,6 @@ class AutoModeration(commands.Cog):
                     force_mute=True
                 )
 
-                await MESSAGES_FROM_NEW_MEMBERS_CACHE.delete(message.author.id)
-
                 return
             
         # модерация сообщений
@@ -520,28 +554,24 @@ class AutoModeration(commands.Cog):
                 return
                 
         # детект спама вложениями
-        # if message.attachments and priority > 2 and difference_between_join_and_now and difference_between_join_and_now < timedelta(minutes=7):
-            
-        #     is_attachment_spam, attachment_content = await check_attachment_spam(message.author, message)
-
-        #     if is_attachment_spam:
-
-        #         await handle_violation(
-        #             self.bot,
-        #             detected_member=message.author,
-        #             detected_channel=message.channel,
-        #             detected_guild=message.guild,
-        #             detected_message=message,
-        #             reason_title="Подозрение на спам вложениями",
-        #             reason_text="нечеловеческое поведение / подозрение на спам вложениями",
-        #             extra_info=f"Содержание сообщения (первые 300 символов):\n```\n{attachment_content[:300].replace('`', '')}\n```",
-        #             timeout_reason="Подозрение на спам вложениями от нового участника",
-        #             force_mute=True
-        #         )
-
-        #         await ATTACHMENTS_FROM_NEW_MEMBERS_CACHE.delete(message.author.id)
+        if is_attachment_spam:
+
+            attachment_content = describe_attachments(message)
+
+            await handle_violation(
+                self.bot,
+                detected_member=message.author,
+                detected_channel=message.channel,
+                detected_guild=message.guild,
+                detected_message=message,
+                reason_title="Подозрение на спам вложениями",
+                reason_text="нечеловеческое поведение / подозрение на спам вложениями",
+                extra_info=f"Содержание сообщения (первые 300 символов):\n```\n{attachment_content[:300].replace('`', '')}\n```",
+                timeout_reason="Подозрение на спам вложениями от нового участника",
+                force_mute=True
+            )
 
-        #         return
+            return
 
     @commands.Cog.listener()
     async def on_automod_action(self, execution: discord.AutoModAction):
@@ -560,29 +590,50 @@ class AutoModeration(commands.Cog):
         if channel.id not in CONFIG.PROTECTED_CHANNELS_IDS:
             return
 
-        await asyncio.sleep(1)
-
         who_deleted: typing.List[typing.Union[discord.User, discord.Member]] = []
 
-        try:
-            async for entry in guild.audit_logs(limit=15, action=discord.AuditLogAction.channel_delete):
-                if entry.target.id == channel.id:
-                    if entry.user.id != self.bot.user.id:
-                        who_deleted.append(entry.user)
-                    break
-        except:
-            pass
+        # запись журнала приходит вслед за событием удаления, поэтому сначала её ждут в кэше
+        entry = await AUDIT_LOG.wait_for(guild, discord.AuditLogAction.channel_delete, channel.id, after=AUDIT_LOG.recent(60))
+
+        if entry is None:
+            # событие журнала могло опоздать или потеряться при переподключении шлюза
+            try:
+                async for logged in guild.audit_logs(limit=15, action=discord.AuditLogAction.channel_delete):
+                    if logged.target.id == channel.id:
+                        entry = logged
+                        break
+            except:
+                pass
+
+        if entry is not None and entry.user_id != self.bot.user.id:
+            user = entry.user
+            if user is None:
+                try:
+                    user = await self.bot.fetch_user(entry.user_id)
+                except:
+                    pass
+            if user is not None:
+                who_deleted.append(user)
 
         resolved: typing.List[typing.Union[discord.User, discord.Member]] = []
 
         for user in who_deleted:
             resolved.append(user)
             if user.bot:
+                added_after = datetime.now(timezone.utc) - timedelta(days=3)
+                entry = AUDIT_LOG.find(guild, discord.AuditLogAction.bot_add, user.id, after=added_after)
+
+                if entry is not None:
+                    if entry.user is not None:
+                        resolved.append(entry.user)
+                    continue
+
+                # бот мог быть добавлен до запуска, тогда в кэше записи нет
                 try:
                     async for entry in guild.audit_logs(
                         limit=10,
                         action=discord.AuditLogAction.bot_add,
-                        after=datetime.now(timezone.utc) - timedelta(days=3)
+                        after=added_after
                     ):
                         if entry.target.id == user.id:
                             resolved.append(entry.user)
@@ -634,6 +685,56 @@ class AutoModeration(commands.Cog):
         await safe_send_to_log(self.bot, embeds=embeds)
 
 
+    # Название голосового канала с рекламой: канал удаляется сразу, а наказания всех участников
+    # уходят одним пакетом в исполнитель действий, который ограничивает число одновременных запросов,
+    # поэтому реклама видна одинаково недолго при любом числе участников в канале
+    async def _moderate_voice_channel_name(self, channel: discord.VoiceChannel):
+        # детект рекламы
+        matched = await NAME_VERDICTS.detect_links(self.bot, channel.guild, channel.name)
+
+        if matched:
+            reason_title = "Реклама в названии голосового канала"
+            reason_text = "реклама путём создания голосового канала"
+            extra = (
+                f"Совпадение:\n```\n{matched}\n```\n"
+                f"Название голосового канала:\n```\n{channel.name}```"
+            )
+        else:
+            # детект всех инвайт кодов
+            is_invite = await NAME_VERDICTS.check_invite_codes(self.bot, channel.guild, channel.name)
+
+            if not is_invite.get("found_invite"):
+                return
+
+            reason_title = "Ссылка-приглашение в названии голосового канала"
+            reason_text = "Ссылка-приглашение в названии голосового канала"
+            extra = (
+                f"Информация по ссылке-приглашению:\n```\nКод: {is_invite['invite_code']}\nВедёт на сервер: {is_invite['guild_name']} (ID: {is_invite['guild_id']})\nКоличество участников: {is_invite['member_count']}\nИнформация извлечена из кэша: {'Да' if is_invite['from_cache'] else 'Нет'}\n```"
+            )
+
+        # после удаления канал уже не знает своих участников
+        members = list(channel.members)
+
+        try:
+            await channel.delete(reason=reason_title)
+        except:
+            pass
+
+        # сами мут и уведомления уходят через исполнитель действий, здесь только их постановка
+        for member in members:
+            await handle_violation(
+                self.bot,
+                detected_member=member,
+                detected_channel=channel,
+                detected_guild=channel.guild,
+                reason_title=reason_title,
+                reason_text=reason_text,
+                extra_info=extra,
+                timeout_reason=reason_title,
+                force_mute=True,
+                notify_channel=False
+            )
+
     @commands.Cog.listener()
     async def on_guild_channel_create(self, channel: discord.abc.GuildChannel):
         guild = channel.guild
@@ -641,64 +742,7 @@ class AutoModeration(commands.Cog):
             return
         
         if isinstance(channel, discord.VoiceChannel):
-            
-            members = channel.members
-            # детект рекламы
-            matched = await detect_links(self.bot, channel.name)
-
-            if matched:
-
-                extra = (
-                    f"Совпадение:\n```\n{matched}\n```\n"
-                    f"Название голосового канала:\n```\n{channel.name}```"
-                )
-
-                if members:
-                    for member in members:
-                        await handle_violation(
-                            self.bot,
-                            detected_member=member,
-                            detected_channel=channel,
-                            detected_guild=channel.guild,
-                            reason_title="Реклама в названии голосового канала",
-                            reason_text="реклама путём создания голосового канала",
-                            extra_info=extra,
-                            timeout_reason="Реклама в названии голосового канала",
-                            force_mute=True
-                        )
-
-                try:
-                    await channel.delete(reason="Реклама в названии голосового канала")
-                except:
-                    pass
-
-                return
-            
-            # детект всех инвайт кодов
-            is_invite = await check_message_for_invite_codes(self.bot, channel.name, channel.guild.id)
-
-            if is_invite.get("found_invite"):
-
-                extra = (
-                    f"Информация по ссылке-приглашению:\n```\nКод: {is_invite['invite_code']}\nВедёт на сервер: {is_invite['guild_name']} (ID: {is_invite['guild_id']})\nКоличество участников: {is_invite['member_count']}\nИнформация извлечена из кэша: {'Да' if is_invite['from_cache'] else 'Нет'}\n```"
-                )
-
-                if members:
-                    for member in members:
-                        await handle_violation(
-                            self.bot,
-                            detected_member=member,
-                            detected_channel=channel,
-                            detected_guild=channel.guild,
-                            reason_title="Ссылка-приглашение в названии голосового канала",
-                            reason_text="Ссылка-приглашение в названии голосового канала",
-                            extra_info=extra,
-                            timeout_reason="Ссылка-приглашение в названии голосового канала",
-                            force_mute=True
-                        )
-
-                return
-            
+            await self._moderate_voice_channel_name(channel)
 
     @commands.Cog.listener()
     async def on_guild_channel_update(self, before: discord.abc.GuildChannel, after: discord.abc.GuildChannel):
@@ -707,68 +751,7 @@ class AutoModeration(commands.Cog):
             return
         
         if isinstance(after, discord.VoiceChannel) and before.name != after.name:
-            
-            members = after.members
-            # детект рекламы
-            matched = await detect_links(self.bot, after.name)
-
-            if matched:
-
-                extra = (
-                    f"Совпадение:\n```\n{matched}\n```\n"
-                    f"Название голосового канала:\n```\n{after.name}```"
-                )
-
-                if members:
-                    for member in members:
-                        await handle_violation(
-                            self.bot,
-                            detected_member=member,
-                            detected_channel=after,
-                            detected_guild=after.guild,
-                            reason_title="Реклама в названии голосового канала",
-                            reason_text="реклама путём создания голосового канала",
-                            extra_info=extra,
-                            timeout_reason="Реклама в названии голосового канала",
-                            force_mute=True
-                        )
-
-                try:
-                    await after.delete(reason="Реклама в названии голосового канала")
-                except:
-                    pass
-
-                return
-            
-            # детект всех инвайт кодов
-            is_invite = await check_message_for_invite_codes(self.bot, after.name, after.guild.id)
-
-            if is_invite.get("found_invite"):
-
-                extra = (
-                    f"Информация по ссылке-приглашению:\n```\nКод: {is_invite['invite_code']}\nВедёт на сервер: {is_invite['guild_name']} (ID: {is_invite['guild_id']})\nКоличество участников: {is_invite['member_count']}\nИнформация извлечена из кэша: {'Да' if is_invite['from_cache'] else 'Нет'}\n```"
-                )
-
-                if members:
-                    for member in members:
-                        await handle_violation(
-                            self.bot,
-                            detected_member=member,
-                            detected_channel=after,
-                            detected_guild=after.guild,
-                            reason_title="Ссылка-приглашение в названии голосового канала",
-                            reason_text="Ссылка-приглашение в названии голосового канала",
-                            extra_info=extra,
-                            timeout_reason="Ссылка-приглашение в названии голосового канала",
-                            force_mute=True
-                        )
-
-                try:
-                    await after.delete(reason="Реклама в названии голосового канала")
-                except:
-                    pass
-
-                return
+            await self._moderate_voice_channel_name(after)
 
 async def setup(bot: LittleAngelBot):
     await bot.add_cog(AutoModeration(bot))
\ No newline at end of file
@@ -28,6 +28,8 @@ class ServersUpdate(commands.Cog):
         if log_channel:
             embed = discord.Embed(title="Бот был добавлен на сервер", color=CONFIG.LITTLE_ANGEL_COLOR, description = f"Участников: {guild.member_count}\nID сервера: {guild.id}")
             user = None
+            # событие о собственном добавлении бот получить не может: запись появляется раньше,
+            # чем он становится участником сервера, поэтому её сразу запрашивают
             try:
                 async for entry in guild.audit_logs(limit=1, action=discord.AuditLogAction.bot_add):
                     user = entry.user
@@ -0,0 +1,234 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import time
+import typing
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+
+LOGGER = logging.getLogger(__name__)
+
+ANALYSIS_WORKERS   = max(1, (os.cpu_count() or 2) - 1)  # сколько процессов анализа держать
+INLINE_SIZE_LIMIT  = 2000                               # задачи меньше этого размера выполняются сразу: пересылка дороже проверки
+SHARED_MEMORY_MIN  = 64 * 1024                          # байты больше этого размера передаются через общую память, а не через pipe
+JOB_TIMEOUT        = 2.0                                # сколько секунд максимум занимает одна задача в процессе (с момента, когда процесс её взял)
+START_TIMEOUT      = 10.0                               # сколько секунд ждать, пока процесс возьмёт задачу: дольше - пул завис целиком
+SLOW_JOB_SECONDS   = 0.2                                # задачи дольше этого записываются как медленные
+MAX_SLOW_JOBS      = 50                                 # сколько последних медленных задач хранить
+
+def _run_with_shared_bytes(func: typing.Callable, name: str, size: int, *args) -> typing.Any:
+    # блоком владеет основной процесс: он же удаляет его после ответа
+    memory = shared_memory.SharedMemory(name=name)
+    try:
+        data = bytes(memory.buf[:size])
+    finally:
+        memory.close()
+
+    return func(data, *args)
+
+def _timed(func: typing.Callable, *args) -> typing.Tuple[typing.Any, float]:
+    started = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - started
+
+# Общие с основным процессом массивы по слотам задач: какой процесс и когда взял задачу слота.
+# По ним отсчитывается бюджет задачи и находится процесс, который нужно остановить
+_SLOT_PIDS    = None
+_SLOT_STARTED = None
+
+def _init_worker(pids, started):
+    global _SLOT_PIDS, _SLOT_STARTED
+    _SLOT_PIDS, _SLOT_STARTED = pids, started
+
+def _run_in_slot(slot: int, func: typing.Callable, *args) -> typing.Tuple[typing.Any, float]:
+    _SLOT_PIDS[slot] = os.getpid()
+    _SLOT_STARTED[slot] = time.monotonic()
+    try:
+        return _timed(func, *args)
+    finally:
+        _SLOT_PIDS[slot] = 0
+
+def _job_name(func: typing.Callable) -> str:
+    return f"{func.__module__}.{func.__qualname__}"
+
+class SlowJob(typing.NamedTuple):
+    name: str
+    size: int
+    seconds: float
+    timed_out: bool
+
+# Пул процессов для тяжёлого анализа содержимого (нормализация, регулярки, кластеризация флуда, хэши картинок):
+# цикл событий и heartbeat шлюза не ждут процессор, а пропускная способность растёт с числом ядер.
+# Задачи - только чистые функции модулей без зависимостей от бота (content_analysis, spam_filter) и простые данные.
+# В пул одновременно отдаётся не больше задач, чем в нём процессов, остальные ждут своей очереди здесь:
+# бюджет JOB_TIMEOUT считается с момента, когда процесс взял задачу, а не с постановки в очередь.
+# Задача дольше бюджета (например, регулярка ушла в перебор) снимается вместе со своим процессом
+# и даёт вердикт fallback, который выбрал вызывающий: для детекторов это срабатывание, а не «чисто»
+class AnalysisPool:
+    def __init__(self, workers: int = ANALYSIS_WORKERS):
+        self._workers = workers
+        self._executor: typing.Optional[ProcessPoolExecutor] = None
+        self._context = multiprocessing.get_context("spawn")
+
+        self._slots = asyncio.Semaphore(workers)
+        self._free_slots: typing.List[int] = list(range(workers))
+        self._pids = self._context.Array("i", workers, lock=False)
+        self._started = self._context.Array("d", workers, lock=False)
+
+        # задачи меньше этого размера выполняются на месте; 0 - всё через пул с бюджетом времени
+        self.inline_limit: int = INLINE_SIZE_LIMIT
+
+        self.slow_jobs: typing.Deque[SlowJob] = deque(maxlen=MAX_SLOW_JOBS)
+
+        self.offloaded: int = 0
+        self.inline: int    = 0
+        self.shared: int    = 0
+        self.restarts: int  = 0
+        self.timeouts: int  = 0
+
+    def start(self):
+        if self._executor is None:
+            # spawn работает одинаково на всех платформах и не копирует потоки и соединения бота
+            self._executor = ProcessPoolExecutor(
+                max_workers=self._workers,
+                mp_context=self._context,
+                initializer=_init_worker,
+                initargs=(self._pids, self._started)
+            )
+
+    def _restart(self, executor: ProcessPoolExecutor, kill: typing.Optional[int] = None, kill_all: bool = False):
+        # пул пересоздаётся один раз, даже если сломанным его увидели несколько задач
+        if self._executor is not executor:
+            return
+
+        self.restarts += 1
+        self._executor = None
+
+        # зависший процесс штатно не прерывается, остановить его можно только сигналом.
+        # Останавливается только процесс зависшей задачи; задачи соседних процессов получат
+        # BrokenProcessPool и повторятся в новом пуле, а ждущие слота в пул ещё не попали
+        processes = executor._processes or {}
+        if kill_all:
+            for process in list(processes.values()):
+                process.terminate()
+        elif kill and kill in processes:
+            processes[kill].terminate()
+
+        executor.shutdown(wait=False, cancel_futures=True)
+        self.start()
+
+    def _record(self, name: str, size: int, seconds: float, timed_out: bool = False):
+        if seconds < SLOW_JOB_SECONDS and not timed_out:
+            return
+
+        self.slow_jobs.append(SlowJob(name, size, seconds, timed_out))
+
+        if timed_out:
+            self.timeouts += 1
+            LOGGER.warning(f"Задача анализа {name} (размер {size}) не уложилась в {seconds:.1f} с и снята")
+        else:
+            LOGGER.info(f"Медленная задача анализа {name} (размер {size}): {seconds:.3f} с")
+
+    def _run_inline(self, name: str, func: typing.Callable, args: tuple, size: int) -> typing.Any:
+        self.inline += 1
+        result, seconds = _timed(func, *args)
+        self._record(name, size, seconds)
+        return result
+
+    async def _wait(self, executor: ProcessPoolExecutor, slot: int, func: typing.Callable, args: tuple, timeout: float) -> typing.Tuple[typing.Any, float]:
+        self._pids[slot] = 0
+        self._started[slot] = 0
+
+        submitted = time.monotonic()
+        future = asyncio.get_running_loop().run_in_executor(executor, _run_in_slot, slot, func, *args)
+
+        while True:
+            started = self._started[slot]
+            # пока процесс не взял задачу (например, новый пул ещё запускается), бюджет не идёт
+            deadline = started + timeout if started else submitted + START_TIMEOUT
+            remaining = deadline - time.monotonic()
+
+            if remaining <= 0:
+                future.cancel()
+                if started:
+                    self._restart(executor, kill=self._pids[slot])
+                else:
+                    self._restart(executor, kill_all=True)
+                raise asyncio.TimeoutError
+
+            done, _ = await asyncio.wait({future}, timeout=remaining if started else min(remaining, timeout))
+            if done:
+                return future.result()
+
+    async def _submit(self, name: str, func: typing.Callable, args: tuple, size: int, timeout: float, fallback: typing.Any) -> typing.Any:
+        # задачи, попавшие в один пул с зависшей, повторяются один раз в новом пуле
+        for _ in range(2):
+            executor = self._executor
+            if executor is None:
+                break
+
+            try:
+                async with self._slots:
+                    slot = self._free_slots.pop()
+                    try:
+                        result, seconds = await self._wait(executor, slot, func, args, timeout)
+                    finally:
+                        self._free_slots.append(slot)
+            except asyncio.TimeoutError:
+                self._record(name, size, timeout, timed_out=True)
+                return fallback
+            except BrokenProcessPool:
+                LOGGER.error("Пул процессов анализа сломан, пересоздаём")
+                self._restart(executor)
+                continue
+
+            self._record(name, size, seconds)
+            return result
+
+        # пул так и не заработал: задача выполняется на месте, как без пула
+        return self._run_inline(name, func, args, size)
+
+    # fallback - вердикт для задачи, снятой по таймауту: детекторы передают срабатывание,
+    # чтобы зависшая на враждебном тексте проверка не пропускала его как чистый
+    async def run(self, func: typing.Callable, *args, size: int = 0, timeout: float = JOB_TIMEOUT, fallback: typing.Any = None) -> typing.Any:
+        if self._executor is None or size < self.inline_limit:
+            return self._run_inline(_job_name(func), func, args, size)
+
+        self.offloaded += 1
+        return await self._submit(_job_name(func), func, args, size, timeout, fallback)
+
+    async def run_with_bytes(self, func: typing.Callable, data: bytes, *args, timeout: float = JOB_TIMEOUT, fallback: typing.Any = None) -> typing.Any:
+        if self._executor is None or len(data) < SHARED_MEMORY_MIN:
+            return await self.run(func, data, *args, size=len(data), timeout=timeout, fallback=fallback)
+
+        memory = shared_memory.SharedMemory(create=True, size=len(data))
+        try:
+            memory.buf[:len(data)] = data
+            self.shared += 1
+            return await self._submit(_job_name(func), _run_with_shared_bytes, (func, memory.name, len(data), *args), len(data), timeout, fallback)
+        finally:
+            memory.close()
+            memory.unlink()
+
+    async def close(self):
+        if self._executor is not None:
+            executor, self._executor = self._executor, None
+            await asyncio.to_thread(executor.shutdown, wait=True, cancel_futures=True)
+
+    def stats(self) -> typing.Dict[str, int]:
+        return {
+            "workers": self._workers if self._executor is not None else 0,
+            "offloaded": self.offloaded,
+            "inline": self.inline,
+            "shared": self.shared,
+            "restarts": self.restarts,
+            "slow": len(self.slow_jobs),
+            "timeouts": self.timeouts,
+            "inline_limit": self.inline_limit,
+        }
+
+ANALYSIS_POOL = AnalysisPool()
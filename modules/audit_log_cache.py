@@ -0,0 +1,135 @@
+import asyncio
+import typing
+
+from collections import deque
+from datetime import datetime, timedelta
+
+from cachetools import TTLCache
+import discord
+
+AUDIT_LOG_TTL        = 3 * 24 * 3600  # сколько секунд хранить записи: добавление бота ищется за последние 3 дня
+MAX_AUDIT_KEYS       = 10_000         # сколько пар (действие, цель) хранить одновременно
+MAX_ENTRIES_PER_KEY  = 10             # сколько последних записей хранить для одной пары
+AUDIT_WAIT_TIMEOUT   = 3              # сколько секунд максимум ждать запись, которая ещё не пришла
+
+AuditKey = typing.Tuple[int, discord.AuditLogAction, typing.Optional[int]]
+
+def _target_id(entry: discord.AuditLogEntry) -> typing.Optional[int]:
+    return getattr(entry.target, "id", None)
+
+# Журнал аудита, собранный из события on_audit_log_entry_create: (сервер, действие, цель) -> последние записи.
+# Удаления сообщений, защита каналов и добавление бота находят виновника без запросов к API и без задержек:
+# если запись ещё не пришла (событие удаления приходит раньше записи журнала), её можно подождать
+class AuditLogCache:
+    def __init__(self, size: int = MAX_AUDIT_KEYS, ttl: int = AUDIT_LOG_TTL):
+        self._entries: TTLCache = TTLCache(maxsize=size, ttl=ttl)
+        self._waiters: typing.Dict[AuditKey, typing.List[typing.Tuple[datetime, asyncio.Future]]] = {}
+
+        self.received: int = 0
+        self.hits: int     = 0
+        self.misses: int   = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, entry: discord.AuditLogEntry):
+        key = (entry.guild.id, entry.action, _target_id(entry))
+        self.received += 1
+
+        entries = self._entries.get(key)
+        if entries is None:
+            entries = deque(maxlen=MAX_ENTRIES_PER_KEY)
+        entries.append(entry)
+        # повторная запись продлевает жизнь ключа
+        self._entries[key] = entries
+
+        for after, future in self._waiters.get(key, ()):
+            if not future.done() and entry.created_at >= after:
+                future.set_result(entry)
+
+    def _find(
+        self,
+        key: AuditKey,
+        after: typing.Optional[datetime],
+        check: typing.Optional[typing.Callable[[discord.AuditLogEntry], bool]]
+    ) -> typing.Optional[discord.AuditLogEntry]:
+        for entry in reversed(self._entries.get(key, ())):
+            if after is not None and entry.created_at < after:
+                break
+            if check is None or check(entry):
+                return entry
+        return None
+
+    def find(
+        self,
+        guild: discord.Guild,
+        action: discord.AuditLogAction,
+        target_id: typing.Optional[int],
+        after: typing.Optional[datetime] = None,
+        check: typing.Optional[typing.Callable[[discord.AuditLogEntry], bool]] = None
+    ) -> typing.Optional[discord.AuditLogEntry]:
+        entry = self._find((guild.id, action, target_id), after, check)
+
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+
+        return entry
+
+    async def wait_for(
+        self,
+        guild: discord.Guild,
+        action: discord.AuditLogAction,
+        target_id: typing.Optional[int],
+        after: datetime,
+        check: typing.Optional[typing.Callable[[discord.AuditLogEntry], bool]] = None,
+        timeout: float = AUDIT_WAIT_TIMEOUT
+    ) -> typing.Optional[discord.AuditLogEntry]:
+        key = (guild.id, action, target_id)
+
+        entry = self._find(key, after, check)
+        if entry is not None:
+            self.hits += 1
+            return entry
+
+        deadline = asyncio.get_running_loop().time() + timeout
+
+        while True:
+            remaining = deadline - asyncio.get_running_loop().time()
+            if remaining <= 0:
+                self.misses += 1
+                return None
+
+            waiter = (after, asyncio.get_running_loop().create_future())
+            self._waiters.setdefault(key, []).append(waiter)
+
+            try:
+                entry = await asyncio.wait_for(waiter[1], timeout=remaining)
+            except asyncio.TimeoutError:
+                self.misses += 1
+                return None
+            finally:
+                waiters = self._waiters.get(key, [])
+                if waiter in waiters:
+                    waiters.remove(waiter)
+                if not waiters:
+                    self._waiters.pop(key, None)
+
+            if check is None or check(entry):
+                self.hits += 1
+                return entry
+
+    @staticmethod
+    def recent(seconds: float) -> datetime:
+        return discord.utils.utcnow() - timedelta(seconds=seconds)
+
+    def stats(self) -> typing.Dict[str, int]:
+        return {
+            "keys": len(self._entries),
+            "received": self.received,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+AUDIT_LOG = AuditLogCache()
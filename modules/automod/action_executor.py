@@ -0,0 +1,214 @@
+import asyncio
+import logging
+import traceback
+import typing
+
+from datetime import timedelta
+import discord
+
+from modules.lock_manager import KeyedLockManager
+
+LOGGER = logging.getLogger(__name__)
+
+# очистка канала держит блокировку на время запросов к API, поэтому каналы не делят блокировки между собой
+_CHANNEL_PURGE_LOCKS = KeyedLockManager()
+
+MAX_CONCURRENT_ACTIONS = 8      # сколько запросов к API выполняется одновременно
+DELETE_COALESCE_DELAY  = 0.5    # сколько секунд копить удаления в канале перед пакетным удалением
+BAN_COALESCE_DELAY     = 1.0    # сколько секунд копить баны перед массовым баном
+MAX_BULK_DELETE        = 100    # ограничение Discord на одно массовое удаление
+MAX_BULK_BAN           = 200    # ограничение Discord на один массовый бан
+CLOSE_TIMEOUT          = 15     # сколько секунд ждать завершения действий при остановке бота
+BULK_DELETE_MAX_AGE    = timedelta(days=14, minutes=-5)  # с запасом на расхождение часов
+
+async def delete_messages_safe(
+    channel: typing.Union[discord.TextChannel, discord.Thread, discord.VoiceChannel, discord.StageChannel],
+    message_ids: set[int],
+    reason: str = "Автоматическая очистка"
+):
+
+    if not message_ids:
+        return
+
+    # массовое удаление доступно только для сообщений младше 14 дней
+    oldest_bulk_id = discord.utils.time_snowflake(discord.utils.utcnow() - BULK_DELETE_MAX_AGE)
+
+    recent_ids = sorted(msg_id for msg_id in message_ids if msg_id > oldest_bulk_id)
+    old_ids    = [msg_id for msg_id in message_ids if msg_id <= oldest_bulk_id]
+
+    async with _CHANNEL_PURGE_LOCKS.lock(channel.id):
+
+        for i in range(0, len(recent_ids), MAX_BULK_DELETE):
+            chunk = recent_ids[i:i + MAX_BULK_DELETE]
+
+            try:
+                await channel.delete_messages(
+                    [discord.Object(id=msg_id) for msg_id in chunk],
+                    reason=reason
+                )
+            except discord.NotFound:
+                continue
+            except discord.HTTPException:
+                old_ids.extend(chunk)
+
+        for msg_id in old_ids:
+
+            try:
+                await channel.delete_messages(
+                    [
+                        discord.Object(id=msg_id)
+                    ],
+                    reason=reason
+                )
+            except discord.NotFound:
+                continue
+            except discord.HTTPException:
+                await asyncio.sleep(2)
+            finally:
+                await asyncio.sleep(0.25)
+
+class ModerationActionExecutor:
+    def __init__(self, max_concurrency: int = MAX_CONCURRENT_ACTIONS):
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._tasks: typing.Set[asyncio.Task] = set()
+
+        # id канала -> (канал, id сообщений, причина)
+        self._pending_deletes: typing.Dict[int, typing.Tuple[discord.abc.Messageable, typing.Set[int], str]] = {}
+        # (id сервера, причина, секунды удаления сообщений) -> (сервер, {id пользователя: пользователь})
+        self._pending_bans: typing.Dict[typing.Tuple[int, str, int], typing.Tuple[discord.Guild, typing.Dict[int, discord.abc.Snowflake]]] = {}
+        self._timers: typing.Dict[typing.Hashable, asyncio.TimerHandle] = {}
+
+    @property
+    def pending_tasks(self) -> int:
+        return len(self._tasks)
+
+    async def _run(self, coro: typing.Coroutine):
+        async with self._semaphore:
+            try:
+                return await coro
+            except Exception:
+                LOGGER.error(f"Ошибка при выполнении действия модерации:\n{traceback.format_exc()}")
+
+    def submit(self, coro: typing.Coroutine) -> asyncio.Task:
+        task = asyncio.create_task(self._run(coro))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    def _schedule(self, key: typing.Hashable, delay: float, callback: typing.Callable[[], None]):
+        if key in self._timers:
+            return
+        self._timers[key] = asyncio.get_running_loop().call_later(delay, callback)
+
+    def _cancel_timer(self, key: typing.Hashable):
+        timer = self._timers.pop(key, None)
+        if timer:
+            timer.cancel()
+
+    # удаление сообщений
+
+    def delete_message(self, message: discord.Message, reason: str = "Автоматическая очистка"):
+        self.delete_messages(message.channel, {message.id}, reason=reason)
+
+    def delete_messages(self, channel: discord.abc.Messageable, message_ids: typing.Iterable[int], reason: str = "Автоматическая очистка"):
+        pending = self._pending_deletes.get(channel.id)
+
+        if pending is None:
+            pending = (channel, set(), reason)
+            self._pending_deletes[channel.id] = pending
+
+        pending[1].update(message_ids)
+
+        if len(pending[1]) >= MAX_BULK_DELETE:
+            self._flush_deletes(channel.id)
+        else:
+            self._schedule(("delete", channel.id), DELETE_COALESCE_DELAY, lambda: self._flush_deletes(channel.id))
+
+    def _flush_deletes(self, channel_id: int):
+        self._cancel_timer(("delete", channel_id))
+
+        pending = self._pending_deletes.pop(channel_id, None)
+        if not pending:
+            return
+
+        channel, message_ids, reason = pending
+        ids = list(message_ids)
+
+        for i in range(0, len(ids), MAX_BULK_DELETE):
+            self.submit(delete_messages_safe(channel, set(ids[i:i + MAX_BULK_DELETE]), reason=reason))
+
+    # баны
+
+    def ban(self, guild: discord.Guild, user: discord.abc.Snowflake, reason: str = None, delete_message_seconds: int = 0):
+        key = (guild.id, reason or "", delete_message_seconds)
+
+        pending = self._pending_bans.get(key)
+        if pending is None:
+            pending = (guild, {})
+            self._pending_bans[key] = pending
+
+        pending[1][user.id] = user
+
+        if len(pending[1]) >= MAX_BULK_BAN:
+            self._flush_bans(key)
+        else:
+            self._schedule(("ban", key), BAN_COALESCE_DELAY, lambda: self._flush_bans(key))
+
+    def _flush_bans(self, key: typing.Tuple[int, str, int]):
+        self._cancel_timer(("ban", key))
+
+        pending = self._pending_bans.pop(key, None)
+        if not pending:
+            return
+
+        guild, users = pending
+        _, reason, delete_message_seconds = key
+
+        self.submit(self._execute_bans(guild, list(users.values()), reason or None, delete_message_seconds))
+
+    async def _execute_bans(self, guild: discord.Guild, users: typing.List[discord.abc.Snowflake], reason: typing.Optional[str], delete_message_seconds: int):
+        if len(users) > 1:
+            try:
+                await guild.bulk_ban(users, reason=reason, delete_message_seconds=delete_message_seconds)
+                return
+            except discord.HTTPException:
+                LOGGER.warning(f"Не удалось выполнить массовый бан {len(users)} пользователей, баню по одному")
+
+        for user in users:
+            try:
+                await guild.ban(user, reason=reason, delete_message_seconds=delete_message_seconds)
+            except Exception:
+                pass
+
+    # муты
+
+    def timeout(self, member: discord.Member, duration: timedelta, reason: str = None):
+        self.submit(self._execute_timeout(member, duration, reason))
+
+    async def _execute_timeout(self, member: discord.Member, duration: timedelta, reason: typing.Optional[str]):
+        try:
+            await member.timeout(duration, reason=reason)
+        except Exception:
+            pass
+
+    # остановка
+
+    def flush(self):
+        for channel_id in list(self._pending_deletes):
+            self._flush_deletes(channel_id)
+        for key in list(self._pending_bans):
+            self._flush_bans(key)
+
+    async def close(self, timeout: float = CLOSE_TIMEOUT):
+        self.flush()
+
+        if not self._tasks:
+            return
+
+        done, pending = await asyncio.wait(set(self._tasks), timeout=timeout)
+        if pending:
+            LOGGER.warning(f"Не дождались завершения {len(pending)} действий модерации при остановке")
+            for task in pending:
+                task.cancel()
+
+ACTION_EXECUTOR = ModerationActionExecutor()
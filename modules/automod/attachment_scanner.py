@@ -0,0 +1,144 @@
+import asyncio
+import codecs
+import hashlib
+import logging
+import typing
+
+from cachetools import TTLCache
+import aiohttp
+import discord
+
+from classes.bot import LittleAngelBot
+from modules.automod.link_filter import detect_links
+from modules.configuration import CONFIG
+from modules.http_session import get_http_session
+
+CHUNK_SIZE       = 64 * 1024  # сколько байт читать за раз
+WINDOW_SIZE      = 16 * 1024  # сколько символов проверять за раз
+WINDOW_OVERLAP   = 512        # сколько символов предыдущего окна добавлять к следующему, чтобы не разрезать ссылку
+MAX_NUL_BYTES    = 100        # сколько нулевых байт в первом блоке допустимо для текстового файла
+PREVIEW_LENGTH   = 300        # сколько символов файла показывать в логе
+SCAN_TIMEOUT     = 30         # сколько секунд максимум занимает проверка одного файла
+PREKEY_BYTES     = 4096       # сколько первых байт файла входит в ключ кэша вердиктов
+VERDICT_TTL      = 3600       # сколько секунд помнить вердикт по файлу
+MAX_VERDICTS     = 5000       # сколько вердиктов хранить одновременно
+
+TEXT_CONTENT_TYPES = (
+    "text/", "application/json", "application/xml",
+    "application/x-yaml", "application/yaml"
+)
+
+def is_text_attachment(attachment: discord.Attachment) -> bool:
+    return bool(attachment.content_type) and any(ct in attachment.content_type for ct in TEXT_CONTENT_TYPES)
+
+class AttachmentScanResult(typing.NamedTuple):
+    matched: typing.Optional[str]
+    preview: str
+    from_cache: bool = False
+
+# (размер, имя файла, хэш первых PREKEY_BYTES байт) -> вердикт.
+# Хранятся только найденные совпадения: файл с тем же началом может прятать ссылку дальше,
+# поэтому чистый вердикт по началу файла переиспользовать нельзя
+ATTACHMENT_VERDICT_CACHE: TTLCache = TTLCache(maxsize=MAX_VERDICTS, ttl=VERDICT_TTL)
+
+# (размер, имя файла) файлов с найденной рекламой: под нагрузкой читается только начало таких файлов,
+# чтобы повторная рассылка получила вердикт из кэша без полной загрузки
+ATTACHMENT_VERDICT_SHAPES: TTLCache = TTLCache(maxsize=MAX_VERDICTS, ttl=VERDICT_TTL)
+
+# id вложения -> ключ по началу файла: по нему фильтр спама вложениями узнаёт одинаковые файлы
+ATTACHMENT_PREKEYS: TTLCache = TTLCache(maxsize=MAX_VERDICTS, ttl=VERDICT_TTL)
+
+def has_cached_verdict_shape(attachment: discord.Attachment) -> bool:
+    return (attachment.size, attachment.filename) in ATTACHMENT_VERDICT_SHAPES
+
+async def _read_head(response: aiohttp.ClientResponse) -> bytes:
+    try:
+        return await response.content.readexactly(PREKEY_BYTES)
+    except asyncio.IncompleteReadError as e:
+        return e.partial
+
+async def _iter_chunks(head: bytes, response: aiohttp.ClientResponse) -> typing.AsyncIterator[bytes]:
+    if head:
+        yield head
+    async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+        yield chunk
+
+async def _scan_stream(bot: LittleAngelBot, chunks: typing.AsyncIterator[bytes], byte_budget: int) -> typing.Optional[AttachmentScanResult]:
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+
+    read_bytes = 0
+    preview = None
+    window = ""
+    tail = ""
+
+    async for chunk in chunks:
+        chunk = chunk[:byte_budget - read_bytes]
+
+        # бинарные файлы распознаются по первому блоку и дальше не читаются
+        if read_bytes == 0 and chunk.count(b"\x00") > MAX_NUL_BYTES:
+            return None
+
+        read_bytes += len(chunk)
+        window += decoder.decode(chunk)
+
+        if preview is None:
+            preview = window[:PREVIEW_LENGTH]
+
+        while len(window) >= WINDOW_SIZE:
+            part, window = window[:WINDOW_SIZE], window[WINDOW_SIZE:]
+
+            matched = await detect_links(bot, tail + part)
+            if matched:
+                return AttachmentScanResult(matched, preview)
+
+            tail = part[-WINDOW_OVERLAP:]
+
+        if read_bytes >= byte_budget:
+            break
+
+    window += decoder.decode(b"", final=True)
+
+    if window:
+        matched = await detect_links(bot, tail + window)
+        if matched:
+            return AttachmentScanResult(matched, preview or window[:PREVIEW_LENGTH])
+
+    return AttachmentScanResult(None, preview or "")
+
+# Читает вложение потоком через общий пул соединений, не дальше бюджета байт,
+# и проверяет текст перекрывающимися окнами до первого совпадения.
+# С cached_only читается только начало файла для поиска вердикта в кэше
+async def scan_text_attachment(bot: LittleAngelBot, attachment: discord.Attachment, cached_only: bool = False) -> typing.Optional[AttachmentScanResult]:
+    byte_budget = CONFIG.ATTACHMENT_SCAN_BYTE_BUDGET
+
+    try:
+        async with asyncio.timeout(SCAN_TIMEOUT):
+            async with get_http_session().get(attachment.url) as response:
+                if response.status != 200:
+                    return None
+
+                head = await _read_head(response)
+                prekey = (attachment.size, attachment.filename, hashlib.sha256(head).hexdigest())
+                ATTACHMENT_PREKEYS[attachment.id] = prekey
+
+                # повторно присланный файл получает вердикт без полной загрузки и нормализации
+                cached: typing.Optional[AttachmentScanResult] = ATTACHMENT_VERDICT_CACHE.get(prekey)
+                if cached:
+                    response.close()
+                    return cached._replace(from_cache=True)
+
+                if cached_only:
+                    response.close()
+                    return None
+
+                result = await _scan_stream(bot, _iter_chunks(head, response), byte_budget)
+
+                if result and result.matched:
+                    ATTACHMENT_VERDICT_CACHE[prekey] = result
+                    ATTACHMENT_VERDICT_SHAPES[(attachment.size, attachment.filename)] = True
+
+                return result
+
+    except (asyncio.TimeoutError, aiohttp.ClientError) as e:
+        logging.debug(f"Не удалось прочитать вложение {attachment.filename}: {e}")
+        return None
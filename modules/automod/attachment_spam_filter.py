@@ -1,102 +1,128 @@
-import asyncio
 import logging
+import time
 import traceback
 import typing
 
-from aiocache import SimpleMemoryCache
 from collections import defaultdict
 import discord
 
-from modules.automod.handle_violation import delete_messages_safe
-from modules.lock_manager import LockManagerWithIdleTTL
-
-ATTACHMENTS_FROM_NEW_MEMBERS_CACHE = SimpleMemoryCache()
-LOCK_MANAGER = LockManagerWithIdleTTL(idle_ttl=2400)
-
-MAX_ATTACHMENT_COUNT_FOR_NEW_MEMBER = 3  # максимум вложений от одного пользователя
-MAX_STORED_MESSAGES = 50                 # сколько последних сообщений хранить в кэше
-
-async def get_cached_attachments_and_append(member: discord.Member, message: discord.Message = None) -> tuple:
-    async with LOCK_MANAGER.lock(member.id):
-
-        attachments_dict: dict = await ATTACHMENTS_FROM_NEW_MEMBERS_CACHE.get(member.id) or {}
-        messages = attachments_dict.setdefault("messages", [])
-
-        if message:
-
-            messages = [m for m in messages if m.get("id") != message.id]
-
-            if message.attachments:
-                attachments_dict["attachment_count"] = attachments_dict.get("attachment_count", 0) + len(message.attachments)
+from modules.automod.action_executor import ACTION_EXECUTOR
+from modules.automod.attachment_scanner import ATTACHMENT_PREKEYS
+from modules.automod.image_hash import IMAGE_HASHES
+from modules.automod.member_state import MemberAutomodState
+from modules.sliding_window import BucketedWindowCounter, DecayingCounterTable
+
+ATTACHMENT_WINDOW          = 60   # за сколько секунд считается частота вложений
+ATTACHMENT_BUCKET          = 5    # длина корзины окна частоты в секундах
+MAX_ATTACHMENTS_PER_WINDOW = 12   # максимум вложений от одного пользователя за окно
+MAX_COUNTED_PER_MESSAGE    = 4    # сколько вложений одного сообщения учитывается: альбом до 10 фото - одно действие
+IDENTICAL_SPAM_SCORE       = 2.5  # с какого значения счётчика одинаковых вложений считается спамом (≈3 копии за пару минут)
+IDENTICAL_HALF_LIFE        = 300  # за сколько секунд счётчик одинаковых вложений уменьшается вдвое
+MAX_TRACKED_FINGERPRINTS   = 8    # сколько разных вложений отслеживать одновременно
+SIZE_GRANULARITY           = 1024 # с точностью до скольких байт сравнивается размер
+MAX_STORED_MESSAGES        = 50   # сколько последних сообщений хранить в кэше
+
+# Отпечаток вложения: по содержимому, если оно уже проверялось (dHash картинки или начало
+# текстового файла), иначе по метаданным, которые Discord отдаёт без загрузки файла:
+# пересохранённая копия той же картинки совпадает по типу, разрешению и примерному размеру
+def attachment_fingerprint(attachment: discord.Attachment) -> typing.Hashable:
+    image_hash = IMAGE_HASHES.get(attachment.id)
+    if image_hash is not None:
+        return ("image", image_hash)
+
+    prekey = ATTACHMENT_PREKEYS.get(attachment.id)
+    if prekey is not None:
+        return ("text", prekey)
+
+    return (
+        attachment.content_type,
+        attachment.width,
+        attachment.height,
+        attachment.size // SIZE_GRANULARITY
+    )
+
+def append_attachments(state: MemberAutomodState, message: discord.Message, now: float):
+    # повторный проход по тому же сообщению не учитывает его вложения дважды
+    if message.id in state.attachment_messages:
+        return
+
+    if state.attachment_rate is None:
+        state.attachment_rate = BucketedWindowCounter(ATTACHMENT_WINDOW, ATTACHMENT_BUCKET)
+        state.attachment_fingerprints = DecayingCounterTable(MAX_TRACKED_FINGERPRINTS, IDENTICAL_HALF_LIFE)
+
+    state.attachment_rate.add(now, min(len(message.attachments), MAX_COUNTED_PER_MESSAGE))
+    # одинаковые вложения внутри одного сообщения считаются один раз
+    for fingerprint in {attachment_fingerprint(attachment) for attachment in message.attachments}:
+        state.attachment_fingerprints.add(fingerprint, now)
+
+    state.attachment_messages[message.id] = message.channel.id
+
+    if len(state.attachment_messages) > MAX_STORED_MESSAGES:
+        del state.attachment_messages[next(iter(state.attachment_messages))]
+
+    state.attachments_updated = now
+
+
+def detect_attachment_spam(state: MemberAutomodState, message: discord.Message) -> typing.Tuple[bool, list]:
+    now = time.time()
+    append_attachments(state, message, now)
+
+    messages = [{"id": message_id, "channel_id": channel_id} for message_id, channel_id in state.attachment_messages.items()]
+
+    if state.attachment_rate.total(now) > MAX_ATTACHMENTS_PER_WINDOW:
+        return True, messages
 
-            messages.append(
-                {
-                    "id": message.id,
-                    "channel_id": message.channel.id
-                }
-            )
+    if state.attachment_fingerprints.max_score(now) >= IDENTICAL_SPAM_SCORE:
+        return True, messages
 
-            if len(messages) > MAX_STORED_MESSAGES:
-                messages = messages[-MAX_STORED_MESSAGES:]
+    return False, messages
 
-            attachments_dict["messages"] = messages
 
-            await ATTACHMENTS_FROM_NEW_MEMBERS_CACHE.set(member.id, attachments_dict, ttl=1200)
+# Вызывается под блокировкой состояния участника
+def check_attachment_spam(state: MemberAutomodState, message: discord.Message) -> typing.Tuple[bool, list]:
+    is_attachment_spam, messages = detect_attachment_spam(state, message)
 
-        attachments_copy = {k: v for k, v in attachments_dict.items() if k != "messages"}
-        return attachments_copy, messages
+    # окно сбрасывается сразу, чтобы параллельная проверка не сработала на нём повторно
+    if is_attachment_spam:
+        state.reset_attachments()
 
+    return is_attachment_spam, messages
 
-async def detect_attachment_spam(member: discord.Member, message: discord.Message) -> typing.Tuple[bool, list]:
-    attachments, messages = await get_cached_attachments_and_append(member, message)
-    if not attachments:
-        return False, messages
 
-    max_count = attachments.get("attachment_count", 0)
+async def delete_attachment_spam(member: discord.Member, messages: list):
+    try:
+        messages_by_channel = defaultdict(set)
 
-    if max_count >= MAX_ATTACHMENT_COUNT_FOR_NEW_MEMBER:
-        return True, messages
+        for msg in messages:
+            messages_by_channel[msg["channel_id"]].add(msg["id"])
 
-    return False, messages
+        for channel_id, ids in messages_by_channel.items():
+            try:
+                channel = member.guild.get_channel(channel_id) or await member.guild.fetch_channel(channel_id)
+                ACTION_EXECUTOR.delete_messages(
+                    channel,
+                    ids,
+                    reason="Подозрение на спам вложениями от нового участника"
+                )
+            except Exception:
+                logging.error(traceback.format_exc())
 
+    except Exception:
+        logging.error(traceback.format_exc())
 
-async def check_attachment_spam(member: discord.Member, message: discord.Message) -> typing.Tuple[bool, str]:
-    is_attachment_spam, messages = await detect_attachment_spam(member, message)
 
+def describe_attachments(message: discord.Message) -> str:
     attachment_content = message.content
 
-    if is_attachment_spam:
-        try:
-            messages_by_channel = defaultdict(set)
-
-            for msg in messages:
-                messages_by_channel[msg["channel_id"]].add(msg["id"])
-
-            for channel_id, ids in messages_by_channel.items():
-                try:
-                    channel = member.guild.get_channel(channel_id) or await member.guild.fetch_channel(channel_id)
-                    asyncio.create_task(
-                        delete_messages_safe(
-                            channel,
-                            ids,
-                            reason="Подозрение на спам вложениями от нового участника"
-                        )
-                    )
-                except Exception:
-                    logging.error(traceback.format_exc())
-
-        except Exception:
-            logging.error(traceback.format_exc())
-
-        if message.attachments:
-            if attachment_content:
-                attachment_content += "\n\n"
-            attachment_content += "[Вложения:]\n\n"
-            for attachment in message.attachments:
-                attachment_content += (
-                    f"Имя файла: {attachment.filename}\n"
-                    f"Размер: {attachment.size} байт\n"
-                    f"Тип: {attachment.content_type}\n\n"
-                )
+    if message.attachments:
+        if attachment_content:
+            attachment_content += "\n\n"
+        attachment_content += "[Вложения:]\n\n"
+        for attachment in message.attachments:
+            attachment_content += (
+                f"Имя файла: {attachment.filename}\n"
+                f"Размер: {attachment.size} байт\n"
+                f"Тип: {attachment.content_type}\n\n"
+            )
 
-    return is_attachment_spam, attachment_content
\ No newline at end of file
+    return attachment_content
\ No newline at end of file
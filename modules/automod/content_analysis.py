@@ -0,0 +1,504 @@
+import io
+import re
+import typing
+import unicodedata
+import urllib.parse
+
+from PIL import Image
+from rapidfuzz import fuzz
+
+# Чистые функции анализа содержимого: только данные на входе и вердикт на выходе, без бота,
+# конфигурации и сети. Выполняются в процессах ANALYSIS_POOL, поэтому модуль не должен импортировать discord
+
+VARIATION_SELECTOR_RE = re.compile(r"[\uFE0F]")
+ZERO_WIDTH_RE = re.compile(r"[\u200B-\u200F\uFEFF\u2060]")
+MARKDOWN_LINKS_RE = re.compile(r'\[([^\]]+)\]\(([^\)]+)\)')
+
+SPACED_LINK_PATTERNS = [
+    (re.compile(r't[\s\.\-_•]{0,3}\.[\s\.\-_•]{0,3}m[\s\.\-_•]{0,3}e[\s\.\-_•]{0,3}/[\s\.\-_•]{0,3}\w+'), "t.me"),
+    (re.compile(r't[\s\.\-_•]{1,3}m[\s\.\-_•]{1,3}e[\s\.\-_•]{0,3}/[\s\.\-_•]{0,3}\w+'), "t.me"),
+    
+    (re.compile(r'd[\s\.\-_•]{0,2}i[\s\.\-_•]{0,2}s[\s\.\-_•]{0,2}c[\s\.\-_•]{0,2}o[\s\.\-_•]{0,2}r[\s\.\-_•]{0,2}d[\s\.\-_•]{0,3}\.[\s\.\-_•]{0,3}g[\s\.\-_•]{0,3}g'), "discord.gg"),
+    (re.compile(r'd[\s\.\-_•]{0,2}i[\s\.\-_•]{0,2}s[\s\.\-_•]{0,2}c[\s\.\-_•]{0,2}[\s\.\-_•]{0,2}r[\s\.\-_•]{0,2}d[\s\.\-_•]{0,3}\.[\s\.\-_•]{0,3}g[\s\.\-_•]{0,3}g'), "discord.gg"),
+    
+    (re.compile(r'd[\s\.\-_•]{0,2}i[\s\.\-_•]{0,2}s[\s\.\-_•]{0,2}c[\s\.\-_•]{0,2}o[\s\.\-_•]{0,2}r[\s\.\-_•]{0,2}d[\s\.\-_•]{0,2}a[\s\.\-_•]{0,2}p[\s\.\-_•]{0,2}p'), "discordapp.com"),
+    
+    (re.compile(r't[\s\.\-_•]{0,2}e[\s\.\-_•]{0,2}l[\s\.\-_•]{0,2}e[\s\.\-_•]{0,2}g[\s\.\-_•]{0,2}r[\s\.\-_•]{0,2}a[\s\.\-_•]{0,2}m[\s\.\-_•]{0,3}\.[\s\.\-_•]{0,3}(me|org)'), "telegram"),
+]
+
+COLLAPSE_RE = re.compile(r"\s+")
+COMPACT_RE = re.compile(r"[^a-z0-9]")
+
+NATURAL_INDICATORS_PATTERNS = (
+    re.compile(r'[а-яё]{3,}'),
+    re.compile(r'[,;:!?]'),
+    re.compile(r'\b(и|в|на|с|что|как|это|для|от|по|но|а|или)\b')
+)
+
+# совпадение начинается только с начала последовательности букв и цифр: без этого поиск пробует
+# каждую позицию внутри длинного слова и дочитывает его до конца, что даёт квадратичное время
+DOMAINS_WITH_DOT_RE = re.compile(r"(?<![a-zA-Z0-9])([a-zA-Z0-9]+)\.([a-zA-Z]{2,6})\b")
+GLUED_DOMAINS_RE = re.compile(r"(?<![a-zA-Z0-9])([a-zA-Z0-9]{6,})(gg|com|app)\b")
+
+EXPLICIT_URL_PATTERNS = [
+    (re.compile(r'https?://discord\.gg/\w+', re.IGNORECASE), 'discord.gg (явная ссылка)'),
+    (re.compile(r'https?://discord\.com/invite/\w+', re.IGNORECASE), 'discord.com/invite (явная ссылка)'),
+    (re.compile(r'https?://discordapp\.com/invite/\w+', re.IGNORECASE), 'discordapp.com/invite (явная ссылка)'),
+    (re.compile(r'https?://t\.me/\w+', re.IGNORECASE), 't.me (явная ссылка)'),
+]
+
+TME_SPECIAL_PATTERNS = (
+    re.compile(r't\.me/'),
+    re.compile(r't\s*\.\s*me/'),
+    re.compile(r'tme/'),
+)
+
+FUZZY_INVITE_RE = re.compile(r'invit|nvite|vite')
+DISCORDGG_RE = re.compile(r'discordgg')
+
+
+EMOJI_ASCII_MAP = {
+    "🅰️": "a", "🅱️": "b", "🅾️": "o", "🅿️": "p",
+    "Ⓜ️": "m", "ℹ️": "i", "❌": "x", "⭕": "o",
+}
+
+REGIONAL_INDICATOR_MAP = {
+    chr(code): chr(ord('a') + (code - 0x1F1E6))
+    for code in range(0x1F1E6, 0x1F1FF + 1)
+}
+
+HOMOGLYPHS = {
+    "а": "a", "А": "a",
+    "е": "e", "Е": "e", "ё": "e", "Ё": "e",
+    "о": "o", "О": "o",
+    "р": "p", "Р": "p",
+    "с": "c", "С": "c",
+    "х": "x", "Х": "x",
+    "у": "y", "У": "y",
+    "к": "k", "К": "k",
+    "м": "m", "М": "m",
+    "т": "t", "Т": "t",
+    "в": "b", "В": "b",
+    "н": "h", "Н": "h",
+    "д": "d", "Д": "d",
+    "г": "g", "Г": "g",
+    "б": "b", "Б": "b",
+    "і": "i", "І": "i",
+
+    "0": "o",
+    "1": "l",
+    "3": "e",
+}
+
+ENCLOSED_ALPHANUM_MAP = {
+    "🄰": "a","🄱": "b","🄲": "c","🄳": "d","🄴": "e",
+    "🄵": "f","🄶": "g","🄷": "h","🄸": "i","🄹": "j",
+    "🄺": "k","🄻": "l","🄼": "m","🄽": "n","🄾": "o",
+    "🄿": "p","🅀": "q","🅁": "r","🅂": "s","🅃": "t",
+    "🅄": "u","🅅": "v","🅆": "w","🅇": "x","🅈": "y",
+    "🅉": "z",
+    "🅐": "a","🅑": "b","🅒": "c","🅓": "d","🅔": "e",
+    "🅕": "f","🅖": "g","🅗": "h","🅘": "i","🅙": "j",
+    "🅚": "k","🅛": "l","🅜": "m","🅝": "n","🅞": "o",
+    "🅟": "p","🅠": "q","🅡": "r","🅢": "s","🅣": "t",
+    "🅤": "u","🅥": "v","🅦": "w","🅧": "x","🅨": "y",
+    "🅩": "z",
+    "🆊": "j","🆋": "k","🆌": "l","🆍": "m","🆎": "ab",
+    "🆏": "k","🆐": "p","🆑": "cl","🆒": "cool",
+    "🆓": "free","🆔": "id","🆕": "new","🆖": "ng",
+    "🆗": "ok","🆘": "sos","🆙": "up",
+    "🆚": "vs","🆛": "b","🆜": "m","🆝": "n",
+    "🆞": "o","🆟": "p","🆠": "q","🆡": "p",
+    "🆢": "s","🆣": "t","🆤": "u","🆥": "v",
+    "🆦": "w","🆧": "x","🆨": "h","🆩": "i",
+    "🆪": "j","🆫": "k","🆬": "l","🆭": "m",
+    "🆮": "n","🆯": "o",
+}
+
+FANCY_MAP = {
+    **{chr(i): chr(i - 0xFEE0).lower() for i in range(0xFF21, 0xFF3B)},
+    **{chr(i): chr(i - 0xFEE0).lower() for i in range(0xFF41, 0xFF5B)},
+    **{chr(0x1D400 + i): chr(ord('a') + i) for i in range(26)},
+    **{chr(0x1D41A + i): chr(ord('a') + i) for i in range(26)},
+    **{chr(0x1D434 + i): chr(ord('a') + i) for i in range(26)},
+    **{chr(0x1D44E + i): chr(ord('a') + i) for i in range(26)},
+    **{chr(0x1D468 + i): chr(ord('a') + i) for i in range(26)},
+    **{chr(0x1D482 + i): chr(ord('a') + i) for i in range(26)},
+    **{chr(0x1D49C + i): chr(ord('a') + i) for i in range(26) if i not in [1,4,7,11,12,17,18]},
+    **{chr(0x1D4B6 + i): chr(ord('a') + i) for i in range(26)},
+    **{chr(0x1D4D0 + i): chr(ord('a') + i) for i in range(26)},
+    **{chr(0x1D4EA + i): chr(ord('a') + i) for i in range(26)},
+    **{chr(0x1D504 + i): chr(ord('a') + i) for i in range(26) if i not in [1,4,18,23]},
+    **{chr(0x1D51E + i): chr(ord('a') + i) for i in range(26)},
+    **{chr(0x1D538 + i): chr(ord('a') + i) for i in range(26) if i not in [1,4,17]},
+    **{chr(0x1D552 + i): chr(ord('a') + i) for i in range(26)},
+    **{chr(0x1D5A0 + i): chr(ord('a') + i) for i in range(26)},
+    **{chr(0x1D5BA + i): chr(ord('a') + i) for i in range(26)},
+    **{chr(0x1D5D4 + i): chr(ord('a') + i) for i in range(26)},
+    **{chr(0x1D5EE + i): chr(ord('a') + i) for i in range(26)},
+    **{chr(0x1D608 + i): chr(ord('a') + i) for i in range(26)},
+    **{chr(0x1D622 + i): chr(ord('a') + i) for i in range(26)},
+    **{chr(0x1D63C + i): chr(ord('a') + i) for i in range(26)},
+    **{chr(0x1D656 + i): chr(ord('a') + i) for i in range(26)},
+    **{chr(0x1D670 + i): chr(ord('a') + i) for i in range(26)},
+    **{chr(0x1D68A + i): chr(ord('a') + i) for i in range(26)},
+    **{chr(0x24B6 + i): chr(ord('a') + i) for i in range(26)},
+    **{chr(0x24D0 + i): chr(ord('a') + i) for i in range(26)},
+    **{chr(0x1F150 + i): chr(ord('a') + i) for i in range(26)},
+    **{chr(0x1F130 + i): chr(ord('a') + i) for i in range(26)},
+    **{chr(0x1F170 + i): chr(ord('a') + i) for i in range(26)},
+}
+
+_COMBINED_MAP = {}
+_COMBINED_MAP.update(EMOJI_ASCII_MAP)
+_COMBINED_MAP.update(REGIONAL_INDICATOR_MAP)
+_COMBINED_MAP.update(ENCLOSED_ALPHANUM_MAP)
+_COMBINED_MAP.update(HOMOGLYPHS)
+_COMBINED_MAP.update(FANCY_MAP)
+
+STRICT_INVITE_CODE_PATTERN = re.compile(
+    r'\b(?=[a-zA-Z0-9]{6,20}\b)(?=[a-zA-Z0-9]{0,19}[a-z])(?=[a-zA-Z0-9]{0,19}[A-Z])(?=(?:[a-zA-Z0-9]{0,18}[A-Z][a-zA-Z0-9]{0,18}[A-Z])|(?=[a-zA-Z0-9]{0,19}\d))[a-zA-Z0-9]{6,20}\b'
+)
+
+URL_PATTERN_FOR_EXTRACTING_WORDS = re.compile(
+    r'https?:\/\/(www\.)?[-a-zA-Z0-9@:%._\+~#=]{1,256}\.[a-zA-Z0-9()]{1,6}\b([-a-zA-Z0-9()@:%_\+.~#?&\/\/=]*)'
+)
+
+DATE_RE = re.compile(r'^\d{2,4}-\d{2}')
+DISCORD_EMOJI_PATTERN = re.compile(r'<a?:[^:>]+:\d{17,20}>|:[^:\s]+:')
+
+WHITELISTED_WORDS = ("spotify",)
+
+def should_skip_potential_code(code: str) -> bool:
+    
+    if not any(c.isalpha() and c.isascii() for c in code):
+        return True
+
+    if DATE_RE.match(code):
+        return True
+    
+    if any(w in code.lower() for w in WHITELISTED_WORDS):
+        return True
+    
+    return False
+
+# кластеры флуда
+GUARANTEED_WINDOW = 15            # количество сообщений для гарантированного флуда
+ALTERNATING_WINDOW = 60           # окно анализа для чередования
+FUZZY_THRESHOLD = 80              # порог нечёткого сравнения в процентах
+MIN_CLUSTERS_FOR_ALTERNATING = 2  # количество кластеров для засчитывания флуда как чередование
+MIN_CLUSTER_SIZE = 15             # количество сообщений в кластере для засчитывания флуда как чередование
+
+# dHash картинок
+HASH_SIZE        = 8            # размер dHash по стороне (8 -> 64 бита)
+DRAFT_SIZE       = 64           # до какого размера JPEG распаковывается сразу при открытии
+MAX_IMAGE_PIXELS = 4096 * 4096  # защита от «бомб» распаковки, если прокси отдал оригинал
+
+def _char_to_ascii(ch: str) -> str:
+    if VARIATION_SELECTOR_RE.match(ch):
+        return ""
+    if ZERO_WIDTH_RE.match(ch):
+        return ""
+    if ch in _COMBINED_MAP:
+        return _COMBINED_MAP[ch]
+
+    code = ord(ch)
+    if 0x1F1E6 <= code <= 0x1F1FF:
+        return chr(ord("a") + (code - 0x1F1E6))
+
+    decomp = unicodedata.normalize("NFKD", ch)
+    if decomp:
+        base = decomp[0]
+        if ('A' <= base <= 'Z') or ('a' <= base <= 'z'):
+            return base.lower()
+
+    if ch.isdigit():
+        return ch
+
+    if ch in " \t\r\n./\\|_•·-:":
+        return " "
+
+    try:
+        name = unicodedata.name(ch)
+    except ValueError:
+        name = ""
+
+    if name:
+        nm = name.upper().split()
+        for token in nm:
+            if len(token) == 1 and 'A' <= token <= 'Z':
+                return token.lower()
+
+    return " "
+
+def normalize_and_compact(raw_text: str) -> str:
+
+    text = unicodedata.normalize("NFKC", raw_text)
+
+    out = []
+    for ch in text:
+        out.append(_char_to_ascii(ch))
+
+    collapsed = "".join(out)
+    collapsed = COLLAPSE_RE.sub(" ", collapsed).strip()
+    compact = COMPACT_RE.sub("", collapsed.lower())
+    return compact
+
+def looks_like_discord(word: str, threshold: int = 85):
+    if len(word) < 6:
+        return False
+    score = fuzz.partial_ratio("discord", word)
+    return score >= threshold
+
+def extract_markdown_links(text: str):
+    return re.findall(MARKDOWN_LINKS_RE, text)
+
+def is_natural_word_context(text: str, match_pos: int, match_len: int) -> bool:
+    start = max(0, match_pos - 20)
+    end = min(len(text), match_pos + match_len + 20)
+    context = text[start:end].lower()
+    
+    for pattern in NATURAL_INDICATORS_PATTERNS:
+        if pattern.search(context):
+            return True
+    
+    return False
+
+def extract_spaced_patterns(text: str, compact: str):
+    findings = []
+    
+    text_lower = text.lower()
+    
+    for pattern, label in SPACED_LINK_PATTERNS:
+        matches = pattern.finditer(text_lower)
+        for match in matches:
+            if not is_natural_word_context(text, match.start(), len(match.group())):
+                findings.append((label, match.group()))
+    
+    return findings
+
+def extract_possible_domains(text: str):
+    text_no_spaces = text.replace(" ", "")
+    candidates = []
+
+    dom1 = DOMAINS_WITH_DOT_RE.findall(text_no_spaces)
+    for a, b in dom1:
+        candidates.append(a + "." + b)
+
+    dom2 = GLUED_DOMAINS_RE.findall(text_no_spaces)
+    for a, b in dom2:
+        candidates.append(a + b)
+
+    return candidates
+
+
+def analyze_links(raw_text: str) -> typing.Optional[str]:
+
+    decoded_text = raw_text
+    for _ in range(5):
+        try:
+            new_decoded = urllib.parse.unquote(decoded_text)
+            if new_decoded == decoded_text:
+                break
+            decoded_text = new_decoded
+        except Exception:
+            break
+    
+    compact = normalize_and_compact(decoded_text)
+    
+    for pattern, label in EXPLICIT_URL_PATTERNS:
+        if pattern.search(decoded_text):
+            return label
+    
+    if "discord" in compact:
+        if FUZZY_INVITE_RE.search(compact):
+            return "discord.com/invite (замаскированная через encoding)"
+    
+    if DISCORDGG_RE.search(compact):
+        return "discord.gg (замаскированная)"
+    
+    if "discordapp" in compact and FUZZY_INVITE_RE.search(compact):
+        return "discordapp.com/invite (замаскированная через encoding)"
+    
+    if TME_SPECIAL_PATTERNS[2].search(compact):
+        return "t.me (замаскированная)"
+    
+    if len(raw_text) < 8:
+        return None
+    
+    spaced_findings = extract_spaced_patterns(decoded_text, compact)
+    if spaced_findings:
+        label, matched = spaced_findings[0]
+        return f"{label} (замаскированная ссылка: {matched})"
+    
+    markdown_links = extract_markdown_links(decoded_text)
+    all_urls_to_check = [decoded_text]
+    
+    for link_text, url in markdown_links:
+        all_urls_to_check.append(url)
+        all_urls_to_check.append(link_text)
+    
+    for text_fragment in all_urls_to_check:
+        result = _check_single_fragment(text_fragment, decoded_text, compact)
+        if result:
+            return result
+    
+    return None
+
+
+def _check_single_fragment(text_fragment: str, original_text: str, compact: str):
+    
+    if not compact:
+        compact = normalize_and_compact(text_fragment)
+
+    if "tme" in compact and ("t.me" in text_fragment.lower() or "tme/" in text_fragment.lower()):
+        return "t.me"
+    
+    text_lower = text_fragment.replace(" ", "").lower()
+    
+    if len(compact) < 5:
+        return None
+    
+    if "discord" in compact:
+        invite_parts = ['invit', 'nvite', 'vite']
+        if any(part in compact for part in invite_parts):
+            match_pos = text_fragment.lower().find("discord")
+            if match_pos != -1:
+                if is_natural_word_context(text_fragment, match_pos, 7):
+                    return None
+            return "discord.com/invite"
+        
+        if compact.endswith("gg") or "discordgg" in compact:
+            match_pos = text_fragment.lower().find("discord")
+            if match_pos != -1:
+                if is_natural_word_context(text_fragment, match_pos, 7):
+                    return None
+            return "discord.gg"
+    
+    if "discordgg" in compact:
+        match_pos = text_fragment.lower().find("discord")
+        if match_pos != -1:
+            if is_natural_word_context(text_fragment, match_pos, 7):
+                return None
+        return "discord.gg"
+    
+    if "discordcom" in compact:
+        if "/channels/" not in text_lower:
+            match_pos = text_fragment.lower().find("discord")
+            if match_pos != -1:
+                if is_natural_word_context(text_fragment, match_pos, 7):
+                    return None
+            return "discord.com"
+    
+    if "discordappcom" in compact:
+        if not any(x in original_text for x in ["https://cdn.discordapp.com", "https://media.discordapp.net", "https://images-ext-1.discordapp.net"]):
+            return "discordapp.com"
+        elif any(part in compact for part in ['invit', 'nvite']):
+            return "discordapp.com/invite"
+    
+    if "telegramme" in compact or "telegramorg" in compact:
+        return "telegram.me" if "telegramme" in compact else "telegram.org"
+    
+    if "tme" in compact:
+        for pattern in TME_SPECIAL_PATTERNS:
+            if pattern.search(text_lower):
+                match = pattern.search(text_lower)
+                if match and not is_natural_word_context(text_fragment, match.start(), len(match.group())):
+                    return "t.me"
+    
+    candidates = extract_possible_domains(compact)
+    
+    for cand in candidates:
+        if len(cand) < 8:
+            continue
+            
+        left = cand.split(".")[0].replace("gg","").replace("com","").replace("app","")
+        
+        if looks_like_discord(left):
+            if left == "discord":
+                continue
+            
+            if any(x in cand for x in ["imagesext1discordapp", "mediadiscordapp", "cdndiscordapp"]):
+                if not any(part in compact for part in ['invit', 'nvite']):
+                    continue
+            
+            if "/channels/" in text_lower:
+                continue
+            
+            match_pos = text_fragment.lower().find(left)
+            if match_pos != -1:
+                if is_natural_word_context(text_fragment, match_pos, len(left)):
+                    continue
+            
+            return f"Похоже на ссылку приглашения в Discord сервер ({cand})"
+    
+    return None
+
+def extract_invite_code_candidates(text: str) -> typing.List[str]:
+
+    clean_text = DISCORD_EMOJI_PATTERN.sub(' ', text)
+    
+    clean_text = URL_PATTERN_FOR_EXTRACTING_WORDS.sub(' ', clean_text)
+    
+    matches = STRICT_INVITE_CODE_PATTERN.findall(clean_text)
+    
+    filtered_codes = [code for code in matches if not should_skip_potential_code(code)]
+    
+    seen = set()
+    unique_codes = []
+    for code in filtered_codes:
+        code_lower = code.lower()
+        if code_lower not in seen:
+            seen.add(code_lower)
+            unique_codes.append(code)
+    
+    return unique_codes[:5]
+
+
+def _cluster_sizes(contents: typing.List[str]) -> typing.List[int]:
+    prototypes = []
+    sizes = []
+
+    for content in contents:
+        cur = (content or "").strip()
+        if not cur:
+            continue
+
+        for index, proto in enumerate(prototypes):
+            if cur == proto or fuzz.ratio(cur, proto) >= FUZZY_THRESHOLD:
+                sizes[index] += 1
+                break
+        else:
+            prototypes.append(cur)
+            sizes.append(1)
+
+    return sizes
+
+def detect_flood_clusters(contents: typing.List[str]) -> bool:
+    guaranteed_slice = contents[-(GUARANTEED_WINDOW + 20):]
+
+    if len(guaranteed_slice) >= GUARANTEED_WINDOW:
+        if any(size >= GUARANTEED_WINDOW for size in _cluster_sizes(guaranteed_slice)):
+            return True
+
+    repeating_clusters = [size for size in _cluster_sizes(contents[-ALTERNATING_WINDOW:]) if size >= MIN_CLUSTER_SIZE]
+
+    return len(repeating_clusters) >= MIN_CLUSTERS_FOR_ALTERNATING
+
+# dHash: картинка в оттенках серого сжимается до 9x8, и каждый бит показывает,
+# ярче ли пиксель своего правого соседа. Пересжатие и изменение размера почти не меняют биты
+def dhash(data: bytes) -> typing.Optional[int]:
+    with Image.open(io.BytesIO(data)) as image:
+        if image.width * image.height > MAX_IMAGE_PIXELS:
+            return None
+
+        image.draft("L", (DRAFT_SIZE, DRAFT_SIZE))
+        pixels = list(image.convert("L").resize((HASH_SIZE + 1, HASH_SIZE), Image.Resampling.BILINEAR).getdata())
+
+    value = 0
+    for row in range(HASH_SIZE):
+        offset = row * (HASH_SIZE + 1)
+        for column in range(HASH_SIZE):
+            value = (value << 1) | (pixels[offset + column] > pixels[offset + column + 1])
+
+    return value
@@ -0,0 +1,187 @@
+import hashlib
+import logging
+import re
+import time
+import typing
+import unicodedata
+
+from collections import OrderedDict
+
+from classes.database import db
+from modules.analysis_pool import ANALYSIS_POOL
+from modules.bk_tree import BKTree
+
+MIN_FINGERPRINT_LENGTH = 20    # короче этого нормализованный текст не запоминается и не проверяется
+MAX_FINGERPRINT_LENGTH = 4000  # сколько символов нормализованного текста учитывается
+MIN_SIMHASH_FEATURES   = 8     # меньше этого слов SimHash ненадёжен, и сравнивается только точный хэш
+MAX_SIMHASH_DISTANCE   = 6     # до скольких отличающихся бит текст считается тем же
+KNOWN_CONTENT_TTL      = 7 * 24 * 3600  # сколько секунд рассылка остаётся в индексе
+MAX_KNOWN_CONTENTS     = 5000  # сколько рассылок хранить максимум
+EVICT_BATCH            = 500   # сколько самых старых рассылок вытеснять за раз при переполнении
+
+DISCORD_MENTION_RE = re.compile(r"<(?:@[!&]?|#)\d{17,20}>")
+ZERO_WIDTH_RE      = re.compile(r"[\u200B-\u200F\uFEFF\u2060]")
+NON_WORD_RE        = re.compile(r"[\W_]+")
+
+# Приводит текст к виду, в котором копии одной рассылки совпадают: упоминания разных
+# участников, регистр, невидимые символы и пунктуация не влияют на отпечаток
+def normalize_for_fingerprint(text: str) -> str:
+    text = DISCORD_MENTION_RE.sub(" ", text)
+    text = ZERO_WIDTH_RE.sub("", unicodedata.normalize("NFKC", text))
+    text = NON_WORD_RE.sub(" ", text.casefold())
+    return " ".join(text.split())[:MAX_FINGERPRINT_LENGTH]
+
+def _hash64(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "big")
+
+def _features(words: typing.List[str]) -> typing.Set[str]:
+    return set(words) | {f"{first} {second}" for first, second in zip(words, words[1:])}
+
+# SimHash: каждый признак голосует за биты своего хэша, и тексты, отличающиеся
+# парой слов, получают отпечатки с малым расстоянием Хэмминга
+def simhash(features: typing.Iterable[str]) -> int:
+    weights = [0] * 64
+
+    for feature in features:
+        value = _hash64(feature)
+        for bit in range(64):
+            weights[bit] += 1 if value >> bit & 1 else -1
+
+    result = 0
+    for bit in range(64):
+        if weights[bit] > 0:
+            result |= 1 << bit
+
+    return result
+
+class ContentFingerprint(typing.NamedTuple):
+    text_hash: int
+    simhash: typing.Optional[int]
+
+def fingerprint(text: str) -> typing.Optional[ContentFingerprint]:
+    normalized = normalize_for_fingerprint(text)
+    if len(normalized) < MIN_FINGERPRINT_LENGTH:
+        return None
+
+    words = normalized.split()
+    return ContentFingerprint(
+        _hash64(normalized),
+        simhash(_features(words)) if len(words) >= MIN_SIMHASH_FEATURES else None
+    )
+
+class ContentMatch(typing.NamedTuple):
+    exact: bool
+    distance: int
+    reason: str
+
+# Отпечатки содержимого подтверждённых нарушений (реклама, приглашения): точный хэш нормализованного текста
+# и SimHash для почти таких же копий. Хранятся в базе, чтобы известная рассылка ловилась сразу после перезапуска,
+# но не дольше KNOWN_CONTENT_TTL и не больше MAX_KNOWN_CONTENTS самых свежих
+class ContentFingerprintIndex:
+    def __init__(self):
+        # точный хэш -> (SimHash, причина, когда добавлен), от старых к новым
+        self._entries: typing.OrderedDict[int, typing.Tuple[typing.Optional[int], str, float]] = OrderedDict()
+        self._similar = BKTree()
+        self._similar_owners: typing.Dict[int, int] = {}  # SimHash -> точный хэш
+
+        self.lookups: int = 0
+        self.matches: int = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _rebuild(self):
+        self._similar.clear()
+        self._similar_owners.clear()
+
+        for text_hash, (similar_hash, _, _) in self._entries.items():
+            if similar_hash is not None and self._similar.add(similar_hash):
+                self._similar_owners[similar_hash] = text_hash
+
+    async def load(self):
+        await db.execute("CREATE TABLE IF NOT EXISTS known_contents (text_hash TEXT PRIMARY KEY, simhash TEXT, reason TEXT, added_at REAL);")
+        await db.execute("DELETE FROM known_contents WHERE added_at < ?;", time.time() - KNOWN_CONTENT_TTL)
+
+        self._entries.clear()
+
+        rows = await db.fetch("SELECT text_hash, simhash, reason, added_at FROM known_contents ORDER BY added_at DESC LIMIT ?", MAX_KNOWN_CONTENTS)
+        for text_hash, similar_hash, reason, added_at in reversed(rows):
+            self._entries[int(text_hash, 16)] = (int(similar_hash, 16) if similar_hash else None, reason, added_at)
+
+        self._rebuild()
+
+        logging.info(f"Загружено известных рассылок: {len(self._entries)}")
+
+    def _alive(self, text_hash: int, now: float) -> typing.Optional[typing.Tuple[typing.Optional[int], str, float]]:
+        entry = self._entries.get(text_hash)
+        if entry is None or now - entry[2] > KNOWN_CONTENT_TTL:
+            return None
+        return entry
+
+    # Отпечаток считается в пуле процессов анализа, как и остальной разбор текста
+    async def match(self, text: str) -> typing.Optional[ContentMatch]:
+        if not self._entries:
+            return None
+
+        content = await ANALYSIS_POOL.run(fingerprint, text, size=len(text))
+        if content is None:
+            return None
+
+        self.lookups += 1
+        now = time.time()
+
+        entry = self._alive(content.text_hash, now)
+        if entry is not None:
+            self.matches += 1
+            return ContentMatch(True, 0, entry[1])
+
+        if content.simhash is None:
+            return None
+
+        for distance, known in self._similar.search(content.simhash, MAX_SIMHASH_DISTANCE):
+            entry = self._alive(self._similar_owners.get(known), now)
+            if entry is not None:
+                self.matches += 1
+                return ContentMatch(False, distance, entry[1])
+
+        return None
+
+    async def add(self, text: str, reason: str):
+        content = await ANALYSIS_POOL.run(fingerprint, text, size=len(text))
+        if content is None:
+            return
+
+        now = time.time()
+        known = content.text_hash in self._entries
+
+        self._entries[content.text_hash] = (content.simhash, reason, now)
+        self._entries.move_to_end(content.text_hash)
+
+        if not known and content.simhash is not None and self._similar.add(content.simhash):
+            self._similar_owners[content.simhash] = content.text_hash
+
+        # hex, потому что 64-битный хэш не помещается в знаковый INTEGER SQLite
+        await db.execute(
+            "INSERT OR REPLACE INTO known_contents (text_hash, simhash, reason, added_at) VALUES (?, ?, ?, ?);",
+            f"{content.text_hash:016x}",
+            f"{content.simhash:016x}" if content.simhash is not None else None,
+            reason,
+            now
+        )
+
+        if len(self._entries) > MAX_KNOWN_CONTENTS:
+            await self._evict()
+
+    # вытесняет самые старые записи пачкой, чтобы BK-дерево не перестраивалось на каждое добавление
+    async def _evict(self):
+        evicted = []
+        while len(self._entries) > MAX_KNOWN_CONTENTS - EVICT_BATCH:
+            text_hash, _ = self._entries.popitem(last=False)
+            evicted.append(f"{text_hash:016x}")
+
+        self._rebuild()
+
+        for text_hash in evicted:
+            await db.execute("DELETE FROM known_contents WHERE text_hash = ?;", text_hash)
+
+KNOWN_CONTENTS = ContentFingerprintIndex()
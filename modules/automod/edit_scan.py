@@ -0,0 +1,72 @@
+import re
+import typing
+
+from cachetools import TTLCache
+import discord
+
+from modules.extract_message_content import format_dict_fields
+
+EDIT_OVERLAP         = 64      # сколько символов вокруг изменения сканировать повторно, чтобы не разрезать ссылку
+SCANNED_PARTS_TTL    = 3600    # сколько секунд помнить проверенные части сообщения
+MAX_SCANNED_MESSAGES = 50_000  # сколько сообщений помнить одновременно
+
+WHITESPACE_RE = re.compile(r"\s")
+
+# id сообщения -> проверенные неизменяемые части ("activity", "poll", id вложений)
+SCANNED_PARTS: TTLCache = TTLCache(maxsize=MAX_SCANNED_MESSAGES, ttl=SCANNED_PARTS_TTL)
+
+def get_scanned_parts(message_id: int) -> typing.Set[typing.Hashable]:
+    return SCANNED_PARTS.get(message_id) or set()
+
+def remember_scanned(message_id: int, *parts: typing.Hashable):
+    scanned = SCANNED_PARTS.get(message_id)
+    if scanned is None:
+        scanned = set()
+        SCANNED_PARTS[message_id] = scanned
+    scanned.update(parts)
+
+def changed_segment(before: str, after: str) -> str:
+    limit = min(len(before), len(after))
+
+    prefix = 0
+    while prefix < limit and before[prefix] == after[prefix]:
+        prefix += 1
+
+    suffix = 0
+    while suffix < limit - prefix and before[-1 - suffix] == after[-1 - suffix]:
+        suffix += 1
+
+    start = max(0, prefix - EDIT_OVERLAP)
+    end   = min(len(after), len(after) - suffix + EDIT_OVERLAP)
+
+    # расширяет границы до ближайших пробелов, чтобы не разрезать слово или ссылку
+    while start > 0 and not WHITESPACE_RE.match(after[start - 1]):
+        start -= 1
+    while end < len(after) and not WHITESPACE_RE.match(after[end]):
+        end += 1
+
+    return after[start:end]
+
+def added_embeds(before: discord.Message, after: discord.Message) -> typing.List[discord.Embed]:
+    known = [embed.to_dict() for embed in before.embeds]
+    return [embed for embed in after.embeds if embed.to_dict() not in known]
+
+async def edit_scan_text(before: discord.Message, after: discord.Message) -> typing.Optional[str]:
+    parts = []
+
+    if before.content != after.content:
+        segment = changed_segment(before.content, after.content)
+        if segment.strip():
+            parts.append(segment)
+
+    # превью ссылок приходят отдельным редактированием уже после отправки сообщения
+    embeds = added_embeds(before, after)
+    if embeds:
+        parts.append("[Ембеды:]")
+        for idx, embed in enumerate(embeds, 1):
+            parts.append(f"--- Ембед {idx} ---\n{await format_dict_fields(embed.to_dict())}")
+
+    if not parts:
+        return None
+
+    return "\n\n".join(parts)
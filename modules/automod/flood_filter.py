@@ -1,188 +1,68 @@
-import asyncio
 from collections import defaultdict
 import logging
 import traceback
+import time
 import typing
 
-from aiocache import SimpleMemoryCache
-from cache import AsyncTTL
 import discord
-from rapidfuzz import fuzz
 
-from classes.bot import LittleAngelBot
-from modules.automod.handle_violation import delete_messages_safe
-from modules.extract_message_content import extract_message_content
-from modules.lock_manager import LockManagerWithIdleTTL
-
-MESSAGES_FROM_NEW_MEMBERS_CACHE = SimpleMemoryCache()
-LOCK_MANAGER = LockManagerWithIdleTTL(idle_ttl=2400)
+from modules.analysis_pool import ANALYSIS_POOL
+from modules.automod.action_executor import ACTION_EXECUTOR
+from modules.automod.content_analysis import detect_flood_clusters
+from modules.automod.member_state import MemberAutomodState, locked_member_state
 
 MAX_CACHE_MESSAGES = 60           # максимальное количество сообщений в кэше
-GUARANTEED_WINDOW = 15            # количество сообщений для гарантированного флуда
-ALTERNATING_WINDOW = 60           # окно анализа для чередования
-FUZZY_THRESHOLD = 80              # порог нечёткого сравнения в процентах
-MIN_CLUSTERS_FOR_ALTERNATING = 2  # количество кластеров для засчитывания флуда как чередование
-MIN_CLUSTER_SIZE = 15             # количество сообщений в кластере для засчитывания флуда как чередование
-
-@AsyncTTL(time_to_live=1600, maxsize=20000)
-async def fuzzy_compare(str1: str, str2: str) -> int:
-    try:
-        score = fuzz.ratio(str1, str2)
-    except Exception:
-        score = 0
-    return score
-
-async def get_cached_messages_and_append(member: discord.Member, append_message_content: str = None, append_message: discord.Message = None) -> list:
-    async with LOCK_MANAGER.lock(member.id):
-        messages = await MESSAGES_FROM_NEW_MEMBERS_CACHE.get(member.id) or []
-
-        messages = messages[-MAX_CACHE_MESSAGES:]  # ограничение кэша до MAX_CACHE_MESSAGES
-
-        if append_message_content:
-
-            # Удаляет предыдущее сообщение с таким же id
-            messages = [m for m in messages if m.get("id") != append_message.id]
-
-            messages.append({
-                "content": append_message_content,
-                "id": append_message.id,
-                "channel_id": append_message.channel.id
-            })
-
-            await MESSAGES_FROM_NEW_MEMBERS_CACHE.set(member.id, messages, ttl=1200)
-
-
-    return messages
-
-async def append_cached_messages(bot: LittleAngelBot, member: discord.Member, message: discord.Message) -> str:
 
-    message_content = await extract_message_content(bot, message)
+def append_message(state: MemberAutomodState, message_content: str, message: discord.Message) -> list:
+    # Удаляет предыдущее сообщение с таким же id
+    messages = [m for m in state.flood_messages[-MAX_CACHE_MESSAGES:] if m.get("id") != message.id]
 
-    messages = await get_cached_messages_and_append(member, append_message_content=message_content, append_message=message)
+    messages.append({
+        "content": message_content,
+        "id": message.id,
+        "channel_id": message.channel.id
+    })
 
-    return message_content, messages
+    # ограничение кэша до MAX_CACHE_MESSAGES
+    state.flood_messages = messages[-MAX_CACHE_MESSAGES:]
+    state.flood_updated = time.time()
 
-async def detect_flood(bot: LittleAngelBot, member: discord.Member, message: discord.Message) -> typing.Tuple[bool, list, str]:
+    return state.flood_messages
 
-    message_content, message_list = await append_cached_messages(bot, member, message)
+# Сообщение добавляется в окно вызывающим под блокировкой состояния (append_message), сюда приходит
+# снимок окна: кластеризация в пуле идёт без блокировки, а блокировка берётся снова только для сброса окна
+async def detect_flood(member: discord.Member, message: discord.Message, message_list: list) -> bool:
 
-    guaranteed_slice = message_list[-(GUARANTEED_WINDOW + 20):]
-    alternating_slice = message_list[-ALTERNATING_WINDOW:]
+    contents = [msg["content"] for msg in message_list]
 
-    result = {
-        "detected": False,
-        "guaranteed_flood": False,
-        "alternating_flood": False,
-        "alternating_clusters_count": 0,
-        "details": {
-            "guaranteed_checked": len(guaranteed_slice),
-            "alternating_checked": len(alternating_slice),
-            "clusters": []
-        }
-    }
+    # нечёткая кластеризация последних сообщений выполняется в пуле процессов анализа
+    is_flood = await ANALYSIS_POOL.run(detect_flood_clusters, contents, size=sum(len(content or "") for content in contents), fallback=True)
 
-    if len(guaranteed_slice) >= GUARANTEED_WINDOW:
-
-        guaranteed_clusters = []
-
-        for i, msg in enumerate(guaranteed_slice):
-            cur = (msg["content"] or "").strip()
-            if not cur:
-                continue
-
-            placed = False
-
-            for cl in guaranteed_clusters:
-                proto = cl["prototype"]
-
-                if cur == proto:
-                    cl["count"] += 1
-                    cl["indices"].append(i)
-                    placed = True
-                    break
-
-                sim = await fuzzy_compare(cur, proto)
-                if sim >= FUZZY_THRESHOLD:
-                    cl["count"] += 1
-                    cl["indices"].append(i)
-                    placed = True
-                    break
-
-            if not placed:
-                guaranteed_clusters.append({
-                    "prototype": cur,
-                    "count": 1,
-                    "indices": [i]
-                })
-
-        for cl in guaranteed_clusters:
-            if cl["count"] >= GUARANTEED_WINDOW:
-                result["detected"] = True
-                result["guaranteed_flood"] = True
-                return True, message_list, message_content
+    if is_flood:
+        async with locked_member_state(member.id) as state:
+            # окно уже сброшено параллельной проверкой, которая и наказала за этот флуд
+            if not any(msg["id"] == message.id for msg in state.flood_messages):
+                return False
 
-    clusters = []
+            state.reset_flood()
 
-    for i, msg in enumerate(alternating_slice):
-        cur = (msg["content"] or "").strip()
-        if not cur:
-            continue
+    return is_flood
 
-        placed = False
-        for cl in clusters:
-            proto = cl["prototype"]
-            if cur == proto:
-                cl["indices"].append(i)
-                cl["count"] += 1
-                placed = True
-                break
-            else:
-                try:
-                    sim = await fuzzy_compare(cur, proto)
-                except Exception:
-                    sim = 0
-                if sim >= FUZZY_THRESHOLD:
-                    cl["indices"].append(i)
-                    cl["count"] += 1
-                    placed = True
-                    break
-
-        if not placed:
-            clusters.append({
-                "prototype": cur,
-                "indices": [i],
-                "count": 1
-            })
-
-    repeating_clusters = [c for c in clusters if c["count"] >= MIN_CLUSTER_SIZE]
-    result["alternating_clusters_count"] = len(repeating_clusters)
-    result["details"]["clusters"] = [
-        {"prototype": c["prototype"][:200], "count": c["count"], "indices": c["indices"]} for c in clusters
-    ]
-
-    if len(repeating_clusters) >= MIN_CLUSTERS_FOR_ALTERNATING:
-        result["alternating_flood"] = True
-        result["detected"] = True
-
-        return True, message_list, message_content
-    
-    return False, message_list, message_content
-
-async def flood_and_messages_check(bot: LittleAngelBot, member: discord.Member, message: discord.Message) -> typing.Tuple[bool, str]:
-    is_flood, messages, message_content = await detect_flood(bot, member, message)
+async def flood_and_messages_check(member: discord.Member, message: discord.Message, message_list: list) -> bool:
+    is_flood = await detect_flood(member, message, message_list)
 
     if is_flood:
         
         try:
             messages_by_channel = defaultdict(set)
 
-            for msg in messages:
+            for msg in message_list:
                 messages_by_channel[msg["channel_id"]].add(msg["id"])
 
             for channel_id, ids in messages_by_channel.items():
                 try:
                     channel = member.guild.get_channel(channel_id) or await member.guild.fetch_channel(channel_id)
-                    asyncio.create_task(delete_messages_safe(channel, ids, reason="Флуд от нового участника"))
+                    ACTION_EXECUTOR.delete_messages(channel, ids, reason="Флуд от нового участника")
 
                 except Exception:
                     logging.error(traceback.format_exc())
@@ -192,4 +72,4 @@ async def flood_and_messages_check(bot: LittleAngelBot, member: discord.Member,
             logging.error(traceback.format_exc())
             pass
 
-    return is_flood, message_content
\ No newline at end of file
+    return is_flood
\ No newline at end of file
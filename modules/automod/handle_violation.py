@@ -1,4 +1,3 @@
-import asyncio
 import hashlib
 import time
 import traceback
@@ -6,29 +5,29 @@ import typing
 import logging
 
 from aiocache import SimpleMemoryCache
+from collections import defaultdict
 from datetime import timedelta
 import discord
 
 from classes.bot import LittleAngelBot
+from modules.automod.action_executor import ACTION_EXECUTOR
+from modules.automod.content_fingerprints import KNOWN_CONTENTS
+from modules.automod.image_hash import KNOWN_IMAGES
+from modules.automod.log_writer import AUTOMOD_LOG_WRITER
+from modules.automod.member_state import get_member_state
 from modules.configuration import CONFIG
-from modules.lock_manager import LockManagerWithIdleTTL
+from modules.lock_manager import StripedLockManager
+from modules.sliding_window import BucketedWindowCounter
 
 AUTOMOD_HIT_CACHE       = SimpleMemoryCache()
-HIT_CACHE               = SimpleMemoryCache()
-SENT_MESSAGES_CACHE     = SimpleMemoryCache()
-VIOLATION_CACHE         = SimpleMemoryCache()
 INVITE_LOCKDOWN_CACHE   = SimpleMemoryCache()
 
-_PURGE_SEMAPHORE = asyncio.Semaphore(1)
+LOCK_MANAGER_FOR_GUILD    = StripedLockManager(stripes=8)
 
-LOCK_MANAGER_FOR_HITS     = LockManagerWithIdleTTL(idle_ttl=3600)
-LOCK_MANAGER_FOR_MESSAGES = LockManagerWithIdleTTL(idle_ttl=2400)
-LOCK_MANAGER_FOR_GUILD    = LockManagerWithIdleTTL(idle_ttl=7200)
+LOCK_MANAGER_FOR_AUTOMOD_HITS  = StripedLockManager()
+LOCK_MANAGER_FOR_GUILD_AUTOMOD = StripedLockManager(stripes=8)
 
-LOCK_MANAGER_FOR_AUTOMOD_HITS  = LockManagerWithIdleTTL(idle_ttl=300)
-LOCK_MANAGER_FOR_GUILD_AUTOMOD = LockManagerWithIdleTTL(idle_ttl=600)
-
-LOCK_MANAGER_FOR_DISCORD_AUTOMOD = LockManagerWithIdleTTL(idle_ttl=1200)
+LOCK_MANAGER_FOR_DISCORD_AUTOMOD = StripedLockManager()
 DISCORD_AUTOMOD_CACHE            = SimpleMemoryCache()
 
 INVITE_LOCKDOWN_DURATION = 2 * 60 * 60  # 2 часа
@@ -36,6 +35,8 @@ INVITE_LOCKDOWN_COOLDOWN = 45 * 60      # 45 минут
 VIOLATION_WINDOW         = 5 * 60       # 5 минут
 VIOLATION_LIMIT          = 10           # 10 нарушений в VILOATION_WINDOW минут
 
+VIOLATION_COUNTERS: typing.DefaultDict[int, BucketedWindowCounter] = defaultdict(lambda: BucketedWindowCounter(VIOLATION_WINDOW))
+
 async def apply_invite_lockdown(bot: LittleAngelBot, guild: discord.Guild, reason: str):
     now = time.time()
 
@@ -100,22 +101,15 @@ async def apply_invite_lockdown(bot: LittleAngelBot, guild: discord.Guild, reaso
 def generate_message_hash(message_content: str) -> str:
     return hashlib.md5(message_content.encode()).hexdigest()[:16]
 
-async def check_message_sent_recently(user_id: int, message_hash: str) -> bool:
-    async with LOCK_MANAGER_FOR_MESSAGES.lock(user_id):
-        last_sent_cache: typing.List = await SENT_MESSAGES_CACHE.get(user_id)
-        
-        if last_sent_cache is None:
-            last_sent_cache = []
-        
-        if message_hash in last_sent_cache:
-            return True
-        
-        last_sent_cache.append(message_hash)
-        if len(last_sent_cache) > 10:
-            last_sent_cache = last_sent_cache[-10:]
-        
-        await SENT_MESSAGES_CACHE.set(user_id, last_sent_cache, ttl=60)
-        return False
+def check_message_sent_recently(user_id: int, message_hash: str) -> bool:
+    state = get_member_state(user_id)
+
+    if message_hash in state.sent_hashes:
+        return True
+
+    state.sent_hashes.append(message_hash)
+    state.sent_updated = time.time()
+    return False
 
 async def safe_ban(guild: discord.Guild, member: discord.abc.Snowflake, reason: str = None, delete_message_seconds: int = 0):
     try:
@@ -124,7 +118,7 @@ async def safe_ban(guild: discord.Guild, member: discord.abc.Snowflake, reason:
         pass
 
 async def safe_send_to_channel(channel: discord.abc.Messageable, *args, user_id: int = None, message_content: str = None, **kwargs):
-    if user_id and message_content and await check_message_sent_recently(user_id, generate_message_hash(message_content)):
+    if user_id and message_content and check_message_sent_recently(user_id, generate_message_hash(message_content)):
         return None
     try:
         await channel.send(*args, **kwargs)
@@ -133,8 +127,15 @@ async def safe_send_to_channel(channel: discord.abc.Messageable, *args, user_id:
         return None
 
 async def safe_send_to_log(bot: LittleAngelBot, *args, user_id: int = None, message_content: str = None, **kwargs):
-    if user_id and message_content and await check_message_sent_recently(user_id, generate_message_hash(message_content)):
+    if user_id and message_content and check_message_sent_recently(user_id, generate_message_hash(message_content)):
         return None
+
+    # сообщения только из ембедов копятся и отправляются пачками
+    if not args and kwargs and set(kwargs) <= {"embed", "embeds"}:
+        embeds = kwargs.get("embeds") or [kwargs["embed"]]
+        AUTOMOD_LOG_WRITER.enqueue(bot, embeds)
+        return
+
     try:
         channel: discord.TextChannel = bot.get_channel(CONFIG.AUTOMOD_LOGS_CHANNEL_ID)
         if not channel:
@@ -150,42 +151,6 @@ async def safe_delete(msg: discord.Message):
     except Exception:
         pass
 
-async def delete_messages_safe(
-    channel: typing.Union[discord.TextChannel, discord.Thread, discord.VoiceChannel, discord.StageChannel],
-    message_ids: set[int],
-    reason: str = "Автоматическая очистка"
-):
-
-    if not message_ids:
-        return
-
-    async with _PURGE_SEMAPHORE:
-        try:
-            await channel.purge(
-                check=lambda m: m.id in message_ids,
-                bulk=True,
-                limit=200,
-                reason=reason
-            )
-            return
-        except discord.HTTPException:
-            pass
-
-    for msg_id in message_ids:
-
-        try:
-            await channel.delete_messages(
-                [
-                    discord.Object(id=msg_id)
-                ]
-            )
-        except discord.NotFound:
-            continue
-        except discord.HTTPException:
-            await asyncio.sleep(2)
-        finally:
-            await asyncio.sleep(0.25)
-
 async def safe_timeout(member: discord.Member, duration: timedelta, reason: str = None):
     try:
         await member.timeout(duration, reason=reason)
@@ -254,7 +219,7 @@ async def handle_automod_violation(
         logging.warning(f"Ошибка при получении ссылки на сообщение: {e}\n{traceback.format_exc()}")
         pass
 
-    asyncio.create_task(safe_send_to_log(bot, embed=log_embed, user_id=execution.member.id, message_content=log_desc))
+    await safe_send_to_log(bot, embed=log_embed, user_id=execution.member.id, message_content=log_desc)
 
     # MENTION EMBED
     mention_desc = (
@@ -278,7 +243,7 @@ async def handle_automod_violation(
         )
     )
 
-    asyncio.create_task(
+    ACTION_EXECUTOR.submit(
             safe_send_to_channel(
             execution.member,
             embed=mention_embed,
@@ -288,7 +253,7 @@ async def handle_automod_violation(
     )
 
     if not isinstance(execution.channel, discord.ForumChannel):
-        asyncio.create_task(
+        ACTION_EXECUTOR.submit(
             safe_send_to_channel(
                 execution.channel,
                 content=execution.member.mention,
@@ -299,24 +264,13 @@ async def handle_automod_violation(
         )
 
     if not is_soft:
-        await safe_timeout(execution.member, timedelta(hours=1), "множественные срабатывания автомода / попытки обойти автомод")
+        ACTION_EXECUTOR.timeout(execution.member, timedelta(hours=1), "множественные срабатывания автомода / попытки обойти автомод")
         await AUTOMOD_HIT_CACHE.delete(execution.member.id)
 
-        async with LOCK_MANAGER_FOR_GUILD.lock(execution.guild.id):
-            violations = await VIOLATION_CACHE.get(execution.guild.id) or []
+        violations = VIOLATION_COUNTERS[execution.guild.id].add(time.time(), 3)
 
-            now = time.time()
-            violations = [t for t in violations if now - t <= VIOLATION_WINDOW]
-            violations.extend([now, now, now])
-
-            await VIOLATION_CACHE.set(
-                execution.guild.id,
-                violations,
-                ttl=VIOLATION_WINDOW
-            )
-
-            if len(violations) >= VIOLATION_LIMIT:
-                asyncio.create_task(apply_invite_lockdown(bot, execution.guild, "Подозрение на рейд сервера (массовые срабатывания автомодерации)"))
+        if violations >= VIOLATION_LIMIT:
+            ACTION_EXECUTOR.submit(apply_invite_lockdown(bot, execution.guild, "Подозрение на рейд сервера (массовые срабатывания автомодерации)"))
 
 
 async def handle_violation(
@@ -331,35 +285,26 @@ async def handle_violation(
     timeout_reason: str = None,
     force_mute: bool = False,
     force_ban: bool = False,
+    remember_content: bool = False,
+    remember_images: bool = False,
+    notify_channel: bool = True,
 ):
 
-    now = time.time()
-
-    async with LOCK_MANAGER_FOR_GUILD.lock(detected_guild.id):
-        violations = await VIOLATION_CACHE.get(detected_guild.id) or []
-
-        violations = [t for t in violations if now - t <= VIOLATION_WINDOW]
-        violations.append(now)
-
-        await VIOLATION_CACHE.set(
-            detected_guild.id,
-            violations,
-            ttl=VIOLATION_WINDOW
-        )
+    violations = VIOLATION_COUNTERS[detected_guild.id].add(time.time())
 
-        if len(violations) >= VIOLATION_LIMIT:
-            asyncio.create_task(apply_invite_lockdown(bot, detected_guild, "Подозрение на рейд сервера (массовые срабатывания автомодерации)"))
+    if violations >= VIOLATION_LIMIT:
+        ACTION_EXECUTOR.submit(apply_invite_lockdown(bot, detected_guild, "Подозрение на рейд сервера (массовые срабатывания автомодерации)"))
 
     # system message ignore
     if detected_message and detected_message.is_system():
-        await safe_delete(detected_message)
+        ACTION_EXECUTOR.delete_message(detected_message)
         return
 
     # hit-cache
-    async with LOCK_MANAGER_FOR_HITS.lock(detected_member.id):
-        hits = await HIT_CACHE.get(detected_member.id) or 0
-        hits += 1
-        await HIT_CACHE.set(detected_member.id, hits, ttl=3600)
+    member_state = get_member_state(detected_member.id)
+    member_state.hits += 1
+    member_state.hits_updated = time.time()
+    hits = member_state.hits
 
     is_soft = hits < 3 and not force_mute and not force_ban
 
@@ -401,7 +346,7 @@ async def handle_violation(
             inline=False
         )
 
-    asyncio.create_task(safe_send_to_log(bot, embed=log_embed, user_id=detected_member.id, message_content=log_desc))
+    await safe_send_to_log(bot, embed=log_embed, user_id=detected_member.id, message_content=log_desc)
 
     # MENTION EMBED
     mention_desc = (
@@ -425,7 +370,7 @@ async def handle_violation(
         )
     )
 
-    asyncio.create_task(
+    ACTION_EXECUTOR.submit(
             safe_send_to_channel(
             detected_member,
             embed=mention_embed,
@@ -434,8 +379,9 @@ async def handle_violation(
         )
     )
 
-    if not isinstance(detected_channel, discord.ForumChannel):
-        asyncio.create_task(
+    # в удалённый канал уведомление не дойдёт, участник получит его только в личные сообщения
+    if notify_channel and not isinstance(detected_channel, discord.ForumChannel):
+        ACTION_EXECUTOR.submit(
             safe_send_to_channel(
                 detected_channel,
                 content=detected_member.mention,
@@ -445,15 +391,25 @@ async def handle_violation(
             )
         )
 
+    # картинки попадают в индекс известных рейдовых картинок только из бана или подтверждённого рейда:
+    # обычный мут за флуд мог прийти с популярным мемом
+    if detected_message and detected_message.attachments and (force_ban or remember_images):
+        await KNOWN_IMAGES.add_from_message(detected_message, reason_title)
+
+    # текст подтверждённой рекламы запоминается, и следующая такая же рассылка ловится без проверок;
+    # мягкое срабатывание ещё не подтверждение
+    if remember_content and not is_soft and detected_message and detected_message.content:
+        await KNOWN_CONTENTS.add(detected_message.content, reason_title)
+
     if detected_message and not force_ban:
-        asyncio.create_task(safe_delete(detected_message))
+        ACTION_EXECUTOR.delete_message(detected_message)
 
     # выдаёт бан
     if force_ban:
-        await safe_ban(detected_guild, detected_member, timeout_reason, delete_message_seconds=216000)
-        await HIT_CACHE.delete(detected_member.id)
+        ACTION_EXECUTOR.ban(detected_guild, detected_member, timeout_reason, delete_message_seconds=216000)
+        member_state.reset_hits()
 
     # выдаёт мут
     elif not is_soft:
-        await safe_timeout(detected_member, timedelta(hours=1), timeout_reason)
-        await HIT_CACHE.delete(detected_member.id)
\ No newline at end of file
+        ACTION_EXECUTOR.timeout(detected_member, timedelta(hours=1), timeout_reason)
+        member_state.reset_hits()
\ No newline at end of file
@@ -0,0 +1,166 @@
+import asyncio
+import logging
+import time
+import typing
+
+from cachetools import TTLCache
+from PIL import Image
+import aiohttp
+import discord
+
+from classes.database import db
+from modules.analysis_pool import ANALYSIS_POOL
+from modules.automod.content_analysis import dhash
+from modules.bk_tree import BKTree
+from modules.http_session import get_http_session
+
+PROXY_SIZE          = 64                # до какого размера картинку уменьшает медиапрокси Discord
+MAX_IMAGE_SIZE      = 25 * 1024 * 1024  # картинки больше этого размера не хэшируются
+MAX_PROXY_BYTES     = 256 * 1024        # сколько байт уменьшенной копии читать максимум
+MAX_HASH_DISTANCE   = 6                 # до скольких отличающихся бит картинка считается той же
+HASH_TIMEOUT        = 5                 # сколько секунд максимум занимает загрузка копии
+PRESSURE_TIMEOUT    = 1                 # то же при переполненной очереди автомодерации
+HASHES_TTL          = 1800              # сколько секунд помнить хэш вложения
+KNOWN_IMAGE_TTL     = 30 * 24 * 3600    # сколько секунд картинка рейда остаётся в индексе
+MIN_HASH_BITS       = 8                 # хэш, в котором единиц или нулей меньше этого, не индексируется
+MAX_STORED_HASHES   = 10_000            # сколько хэшей вложений хранить одновременно
+
+IMAGE_CONTENT_TYPES = ("image/png", "image/jpeg", "image/webp", "image/gif")
+
+def is_image_attachment(attachment: discord.Attachment) -> bool:
+    return (
+        bool(attachment.content_type)
+        and attachment.content_type.split(";")[0] in IMAGE_CONTENT_TYPES
+        and attachment.size <= MAX_IMAGE_SIZE
+    )
+
+# id вложения -> dHash, чтобы подтверждённое нарушение не скачивало картинку повторно
+IMAGE_HASHES: TTLCache = TTLCache(maxsize=MAX_STORED_HASHES, ttl=HASHES_TTL)
+
+async def hash_image_attachment(attachment: discord.Attachment, timeout: float = HASH_TIMEOUT) -> typing.Optional[int]:
+    if attachment.id in IMAGE_HASHES:
+        return IMAGE_HASHES[attachment.id]
+
+    # медиапрокси сам уменьшает картинку, поэтому скачивается несколько килобайт вместо оригинала
+    url = f"{attachment.proxy_url}{'&' if '?' in attachment.proxy_url else '?'}width={PROXY_SIZE}&height={PROXY_SIZE}"
+
+    try:
+        async with asyncio.timeout(timeout):
+            async with get_http_session().get(url) as response:
+                if response.status != 200:
+                    return None
+
+                data = await response.content.read(MAX_PROXY_BYTES + 1)
+                if len(data) > MAX_PROXY_BYTES:
+                    return None
+
+        value = await ANALYSIS_POOL.run_with_bytes(dhash, data)
+
+    except (asyncio.TimeoutError, aiohttp.ClientError) as e:
+        logging.debug(f"Не удалось загрузить картинку {attachment.filename}: {e}")
+        return None
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return None
+
+    if value is not None:
+        IMAGE_HASHES[attachment.id] = value
+
+    return value
+
+class KnownImageMatch(typing.NamedTuple):
+    distance: int
+    reason: str
+    known_hash: int
+
+# Почти однотонная картинка (белый скриншот, заливка) даёт dHash из одних нулей или единиц,
+# а такой хэш в пределах MAX_HASH_DISTANCE совпадает почти с чем угодно
+def is_informative_hash(value: int) -> bool:
+    return MIN_HASH_BITS <= value.bit_count() <= 64 - MIN_HASH_BITS
+
+# Хэши картинок из подтверждённых рейдов: поиск похожих идёт по BK-дереву по расстоянию Хэмминга,
+# а сами хэши хранятся в базе и переживают перезапуск, но не дольше KNOWN_IMAGE_TTL
+class KnownImageIndex:
+    def __init__(self):
+        self._tree = BKTree()
+        self._entries: typing.Dict[int, typing.Tuple[str, float]] = {}  # хэш -> (причина, когда добавлен)
+
+        self.lookups: int = 0
+        self.matches: int = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _rebuild(self):
+        self._tree.clear()
+        for value in self._entries:
+            self._tree.add(value)
+
+    async def load(self):
+        await db.execute("CREATE TABLE IF NOT EXISTS known_images (hash TEXT PRIMARY KEY, reason TEXT, added_at REAL);")
+        await db.execute("DELETE FROM known_images WHERE added_at < ?;", time.time() - KNOWN_IMAGE_TTL)
+
+        self._entries.clear()
+
+        for image_hash, reason, added_at in await db.fetch("SELECT hash, reason, added_at FROM known_images"):
+            value = int(image_hash, 16)
+            if is_informative_hash(value):
+                self._entries[value] = (reason, added_at)
+
+        self._rebuild()
+
+        logging.info(f"Загружено известных рейдовых картинок: {len(self._entries)}")
+
+    def match(self, value: int) -> typing.Optional[KnownImageMatch]:
+        if not self._entries or not is_informative_hash(value):
+            return None
+
+        self.lookups += 1
+        expired_before = time.time() - KNOWN_IMAGE_TTL
+
+        for distance, known in self._tree.search(value, MAX_HASH_DISTANCE):
+            reason, added_at = self._entries[known]
+            if added_at < expired_before:
+                continue
+
+            self.matches += 1
+            return KnownImageMatch(distance, reason, known)
+
+        return None
+
+    async def add(self, value: int, reason: str):
+        if not is_informative_hash(value):
+            return
+
+        # уже известная (или почти такая же) картинка не раздувает индекс, а продлевает срок
+        found = self._tree.nearest(value, MAX_HASH_DISTANCE)
+        if found is not None:
+            value = found[1]
+        else:
+            self._tree.add(value)
+
+        now = time.time()
+        self._entries[value] = (reason, now)
+        # hex, потому что 64-битный хэш не помещается в знаковый INTEGER SQLite
+        await db.execute(
+            "INSERT OR REPLACE INTO known_images (hash, reason, added_at) VALUES (?, ?, ?);",
+            f"{value:016x}", reason, now
+        )
+
+    async def remove(self, value: int) -> bool:
+        if value not in self._entries:
+            return False
+
+        del self._entries[value]
+        self._rebuild()
+        await db.execute("DELETE FROM known_images WHERE hash = ?;", f"{value:016x}")
+        return True
+
+    # Индексируются только хэши, посчитанные при проверке сообщения: картинка к этому
+    # моменту может быть уже удалена, а повторная загрузка заняла бы слот исполнителя действий
+    async def add_from_message(self, message: discord.Message, reason: str):
+        for attachment in message.attachments:
+            value = IMAGE_HASHES.get(attachment.id)
+            if value is not None:
+                await self.add(value, reason)
+
+KNOWN_IMAGES = KnownImageIndex()
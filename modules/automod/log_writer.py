@@ -0,0 +1,123 @@
+import asyncio
+import logging
+import traceback
+import typing
+
+from collections import Counter, deque
+import discord
+
+from modules.configuration import CONFIG
+
+LOGGER = logging.getLogger(__name__)
+
+LOG_BATCH_SIZE           = 10     # ограничение Discord на количество ембедов в одном сообщении
+LOG_BATCH_MAX_CHARACTERS = 6000   # ограничение Discord на суммарный размер ембедов в одном сообщении
+LOG_FLUSH_INTERVAL       = 2.0    # сколько секунд ждать заполнения пачки перед отправкой
+LOG_MAX_PENDING          = 200    # сколько ембедов может ждать отправки, остальные сводятся в итог
+LOG_CLOSE_TIMEOUT        = 15     # сколько секунд ждать отправки оставшихся логов при остановке бота
+
+class BatchedLogWriter:
+    def __init__(self, channel_id: int):
+        self._channel_id = channel_id
+        self._bot: typing.Optional[discord.Client] = None
+
+        self._pending: typing.Deque[discord.Embed] = deque()
+        self._dropped: typing.Counter[str] = Counter()
+
+        self._has_entries = asyncio.Event()
+        self._batch_full  = asyncio.Event()
+        self._task: typing.Optional[asyncio.Task] = None
+        self._closing = False
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def enqueue(self, bot: discord.Client, embeds: typing.Iterable[discord.Embed]):
+        self._bot = bot
+
+        for embed in embeds:
+            if len(self._pending) >= LOG_MAX_PENDING:
+                self._dropped[embed.title or "Без заголовка"] += 1
+                continue
+            self._pending.append(embed)
+
+        self._has_entries.set()
+        if len(self._pending) >= LOG_BATCH_SIZE:
+            self._batch_full.set()
+
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while not self._closing:
+            await self._has_entries.wait()
+
+            try:
+                await asyncio.wait_for(self._batch_full.wait(), timeout=LOG_FLUSH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+            await self.flush()
+
+    def _take_batch(self) -> typing.List[discord.Embed]:
+        batch = []
+        characters = 0
+
+        if self._dropped:
+            summary = "\n".join(f"- {title}: {count}" for title, count in self._dropped.most_common(15))
+            batch.append(discord.Embed(
+                title="Часть логов пропущена",
+                description=f"Из-за нагрузки не отправлено записей: **{sum(self._dropped.values())}**\n\n{summary}"[:4000],
+                color=0xfcb603
+            ))
+            characters += len(batch[0])
+            self._dropped.clear()
+
+        while self._pending and len(batch) < LOG_BATCH_SIZE:
+            size = len(self._pending[0])
+            if batch and characters + size > LOG_BATCH_MAX_CHARACTERS:
+                break
+            batch.append(self._pending.popleft())
+            characters += size
+
+        return batch
+
+    async def _send(self, embeds: typing.List[discord.Embed]):
+        try:
+            channel: discord.TextChannel = self._bot.get_channel(self._channel_id)
+            if not channel:
+                channel: discord.TextChannel = await self._bot.fetch_channel(self._channel_id)
+            await channel.send(embeds=embeds)
+        except Exception:
+            LOGGER.error(f"Не удалось отправить {len(embeds)} ембедов в канал логов:\n{traceback.format_exc()}")
+
+    async def flush(self):
+        while self._pending or self._dropped:
+            batch = self._take_batch()
+            try:
+                await self._send(batch)
+            except asyncio.CancelledError:
+                # прерванная отправка возвращает пачку в очередь, чтобы её дослал close
+                self._pending.extendleft(reversed(batch))
+                raise
+
+        self._has_entries.clear()
+        self._batch_full.clear()
+
+    async def close(self):
+        # цикл отправки досылает текущую пачку и завершается сам, а не прерывается посреди отправки
+        self._closing = True
+        self._has_entries.set()
+        self._batch_full.set()
+
+        if self._task and not self._task.done():
+            done, _ = await asyncio.wait({self._task}, timeout=LOG_CLOSE_TIMEOUT)
+            if not done:
+                self._task.cancel()
+                await asyncio.gather(self._task, return_exceptions=True)
+
+        if self._bot:
+            await self.flush()
+
+AUTOMOD_LOG_WRITER = BatchedLogWriter(CONFIG.AUTOMOD_LOGS_CHANNEL_ID)
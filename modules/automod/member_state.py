@@ -0,0 +1,107 @@
+import time
+import typing
+
+from cachetools import TTLCache
+from collections import deque
+from contextlib import asynccontextmanager
+
+from modules.lock_manager import StripedLockManager
+from modules.sliding_window import BucketedWindowCounter, DecayingCounterTable
+
+MEMBER_STATE_TTL    = 3600     # общее время жизни записи после последнего обращения
+MAX_TRACKED_MEMBERS = 100_000  # сколько участников хранится одновременно
+
+HITS_TTL        = 3600  # время жизни окна срабатываний
+FLOOD_TTL       = 1200  # время жизни окна сообщений для детекта флуда
+MENTIONS_TTL    = 1800  # время жизни окна упоминаний
+ATTACHMENTS_TTL = 1200  # время жизни окна вложений
+THREADS_TTL     = 1200  # время жизни окна веток
+SENT_TTL        = 60    # время жизни окна отправленных уведомлений
+
+MAX_SENT_HASHES = 10    # сколько последних уведомлений хранится для защиты от дублей
+
+# Всё состояние автомодерации одного участника в одной записи
+class MemberAutomodState:
+
+    __slots__ = (
+        "hits", "hits_updated",
+        "flood_messages", "flood_updated",
+        "mention_counters", "mention_messages", "mentions_updated",
+        "attachment_rate", "attachment_fingerprints", "attachment_messages", "attachments_updated",
+        "threads", "threads_updated",
+        "sent_hashes", "sent_updated",
+    )
+
+    def __init__(self):
+        self.hits: int            = 0
+        self.hits_updated: float  = 0.0
+
+        self.flood_messages: typing.List[dict] = []
+        self.flood_updated: float = 0.0
+
+        self.mention_counters: typing.Optional[DecayingCounterTable] = None
+        self.mention_messages: typing.Dict[int, int] = {}  # id сообщения -> id канала
+        self.mentions_updated: float = 0.0
+
+        self.attachment_rate: typing.Optional[BucketedWindowCounter] = None
+        self.attachment_fingerprints: typing.Optional[DecayingCounterTable] = None
+        self.attachment_messages: typing.Dict[int, int] = {}  # id сообщения -> id канала
+        self.attachments_updated: float = 0.0
+
+        self.threads: typing.List[int] = []
+        self.threads_updated: float = 0.0
+
+        self.sent_hashes: typing.Deque[str] = deque(maxlen=MAX_SENT_HASHES)
+        self.sent_updated: float = 0.0
+
+    def reset_hits(self):
+        self.hits = 0
+
+    def reset_flood(self):
+        self.flood_messages = []
+
+    def reset_mentions(self):
+        self.mention_counters = None
+        self.mention_messages = {}
+
+    def reset_attachments(self):
+        self.attachment_rate = None
+        self.attachment_fingerprints = None
+        self.attachment_messages = {}
+
+    def reset_threads(self):
+        self.threads = []
+
+    def expire(self, now: float):
+        if now - self.hits_updated > HITS_TTL:
+            self.reset_hits()
+        if now - self.flood_updated > FLOOD_TTL:
+            self.reset_flood()
+        if now - self.mentions_updated > MENTIONS_TTL:
+            self.reset_mentions()
+        if now - self.attachments_updated > ATTACHMENTS_TTL:
+            self.reset_attachments()
+        if now - self.threads_updated > THREADS_TTL:
+            self.reset_threads()
+        if now - self.sent_updated > SENT_TTL:
+            self.sent_hashes.clear()
+
+MEMBER_STATES: TTLCache = TTLCache(maxsize=MAX_TRACKED_MEMBERS, ttl=MEMBER_STATE_TTL)
+MEMBER_STATE_LOCKS = StripedLockManager(stripes=256)
+
+def get_member_state(member_id: int) -> MemberAutomodState:
+    state: typing.Optional[MemberAutomodState] = MEMBER_STATES.get(member_id)
+
+    if state is None:
+        state = MemberAutomodState()
+    else:
+        state.expire(time.time())
+
+    # повторная запись продлевает время жизни
+    MEMBER_STATES[member_id] = state
+    return state
+
+@asynccontextmanager
+async def locked_member_state(member_id: int):
+    async with MEMBER_STATE_LOCKS.lock(member_id):
+        yield get_member_state(member_id)
@@ -0,0 +1,91 @@
+import asyncio
+import math
+import typing
+
+from datetime import timedelta
+import discord
+
+from modules.configuration import CONFIG
+
+NEW_MEMBER_AGE     = timedelta(days=2)   # младше этого участник считается новым
+TRUSTED_MEMBER_AGE = timedelta(weeks=2)  # старше этого участник считается проверенным
+FILL_BATCH_SIZE    = 1000                # сколько участников обрабатывать за раз при заполнении кэша
+
+# Приоритет участника зависит только от его прав, ролей и даты входа, поэтому он считается
+# один раз и пересчитывается при изменении ролей или когда участник переходит порог возраста
+class MemberTierCache:
+    def __init__(self):
+        # id участника -> (приоритет сообщений, приоритет веток, когда пересчитать)
+        self._tiers: typing.Dict[int, typing.Tuple[int, int, float]] = {}
+
+        self.hits: int   = 0
+        self.misses: int = 0
+
+    @staticmethod
+    def _compute(member: discord.Member) -> typing.Tuple[int, int, float]:
+        if member.guild_permissions.manage_messages:
+            return 0, 0, math.inf
+
+        if not member.joined_at:
+            return 2, 2, math.inf
+
+        now = discord.utils.utcnow()
+        age = now - member.joined_at
+
+        if age > TRUSTED_MEMBER_AGE:
+            return 1, 1, math.inf
+
+        whitelisted = any(role.id in CONFIG.AUTOMOD_WHITELISTED_ROLES_IDS for role in member.roles)
+
+        recompute_at = (member.joined_at + TRUSTED_MEMBER_AGE).timestamp()
+
+        if age < NEW_MEMBER_AGE:
+            recompute_at = (member.joined_at + NEW_MEMBER_AGE).timestamp()
+            return (1 if whitelisted else 3), 3, recompute_at
+
+        return (1 if whitelisted else 2), 2, recompute_at
+
+    def _get(self, member: discord.Member) -> typing.Tuple[int, int, float]:
+        entry = self._tiers.get(member.id)
+
+        # переход порога возраста проверяется лениво при обращении
+        if entry is None or entry[2] <= discord.utils.utcnow().timestamp():
+            self.misses += 1
+            entry = self._compute(member)
+            self._tiers[member.id] = entry
+        else:
+            self.hits += 1
+
+        return entry
+
+    def message_priority(self, member: discord.Member) -> int:
+        return self._get(member)[0]
+
+    def thread_priority(self, member: discord.Member) -> int:
+        return self._get(member)[1]
+
+    def update(self, member: discord.Member):
+        self._tiers[member.id] = self._compute(member)
+
+    def discard(self, member_id: int):
+        self._tiers.pop(member_id, None)
+
+    def clear(self):
+        self._tiers.clear()
+
+    async def fill(self, guild: discord.Guild):
+        for index, member in enumerate(list(guild.members)):
+            self._tiers[member.id] = self._compute(member)
+
+            # не блокирует цикл событий на больших серверах
+            if index % FILL_BATCH_SIZE == FILL_BATCH_SIZE - 1:
+                await asyncio.sleep(0)
+
+    def stats(self) -> typing.Dict[str, int]:
+        return {
+            "members": len(self._tiers),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+MEMBER_TIERS = MemberTierCache()
@@ -1,111 +1,108 @@
-import asyncio
 import logging
+import time
 import traceback
 import typing
 
-from aiocache import SimpleMemoryCache
 from collections import defaultdict
 import discord
 
-from modules.automod.handle_violation import delete_messages_safe
-from modules.lock_manager import LockManagerWithIdleTTL
+from modules.automod.action_executor import ACTION_EXECUTOR
+from modules.automod.member_state import MemberAutomodState
+from modules.sliding_window import DecayingCounterTable
 
-MENTIONS_FROM_NEW_MEMBERS_CACHE = SimpleMemoryCache()
-LOCK_MANAGER = LockManagerWithIdleTTL(idle_ttl=2400)
-
-MAX_SIMILLAR_MENTIONS = 10  # максимум упоминаний одного id
-MAX_DIFFERENT_MENTIONS = 5  # максимум уникальных упоминаний
+MAX_SIMILLAR_MENTIONS = 10  # максимум упоминаний одного id (с учётом затухания)
+MAX_DIFFERENT_MENTIONS = 5  # максимум уникальных недавних упоминаний
 MAX_STORED_MESSAGES = 200   # сколько последних сообщений хранить в кэше
+MAX_TRACKED_TARGETS = 16    # сколько упомянутых id отслеживать одновременно
+MENTION_HALF_LIFE = 120     # за сколько секунд счётчик упоминаний уменьшается вдвое
+ACTIVE_MENTION_SCORE = 0.5  # с какого значения счётчика упоминание считается недавним
 
-async def get_cached_mentions_and_append(member: discord.Member, message: discord.Message = None) -> tuple:
-    async with LOCK_MANAGER.lock(member.id):
-
-        mentions: dict = await MENTIONS_FROM_NEW_MEMBERS_CACHE.get(member.id) or {}
-        messages = mentions.setdefault("messages", [])
+def extract_mention_targets(message: discord.Message) -> typing.List[str]:
+    targets = []
 
-        if message:
+    if "@everyone" in message.content:
+        targets.append("@everyone")
 
-            messages = [m for m in messages if m.get("id") != message.id]
+    if "@here" in message.content:
+        targets.append("@here")
 
-            if "@everyone" in message.content:
-                mentions["@everyone"] = mentions.get("@everyone", 0) + 1
+    replied_message_author_id = None
+    if message.reference and message.reference.resolved:
+        if isinstance(message.reference.resolved, discord.Message):
+            replied_message_author_id = message.reference.resolved.author.id
 
-            if "@here" in message.content:
-                mentions["@here"] = mentions.get("@here", 0) + 1
+    for user in message.mentions:
+        if user.id != replied_message_author_id and not user.bot:
+            targets.append(user.mention)
 
-            replied_message_author_id = None
-            if message.reference and message.reference.resolved:
-                if isinstance(message.reference.resolved, discord.Message):
-                    replied_message_author_id = message.reference.resolved.author.id
-            
-            for user in message.mentions:
-                if user.id != replied_message_author_id and not user.bot:
-                    mentions[user.id] = mentions.get(user.id, 0) + 1
-            
-            for role in message.role_mentions:
-                mentions[role.id] = mentions.get(role.id, 0) + 1
+    for role in message.role_mentions:
+        targets.append(role.mention)
 
-            messages.append(
-                {
-                    "id": message.id,
-                    "channel_id": message.channel.id
-                }
-            )
+    return targets
 
-            # Ограничение кэша
-            if len(messages) > MAX_STORED_MESSAGES:
-                messages = messages[-MAX_STORED_MESSAGES:]
+def append_mentions(state: MemberAutomodState, message: discord.Message, now: float):
+    # повторный проход по тому же сообщению (например, после редактирования) не учитывается дважды
+    if message.id in state.mention_messages:
+        return
 
-            mentions["messages"] = messages
+    if state.mention_counters is None:
+        state.mention_counters = DecayingCounterTable(MAX_TRACKED_TARGETS, MENTION_HALF_LIFE)
 
-            await MENTIONS_FROM_NEW_MEMBERS_CACHE.set(member.id, mentions, ttl=1800)
+    for target in extract_mention_targets(message):
+        state.mention_counters.add(target, now)
 
-        mentions_copy = {k: v for k, v in mentions.items() if k != "messages"}
+    state.mention_messages[message.id] = message.channel.id
 
-        return mentions_copy, messages
+    # Ограничение кэша
+    if len(state.mention_messages) > MAX_STORED_MESSAGES:
+        del state.mention_messages[next(iter(state.mention_messages))]
 
+    state.mentions_updated = now
 
-async def detect_mention_abuse(member: discord.Member, message: discord.Message) -> typing.Tuple[bool, list]:
-    mentions, messages = await get_cached_mentions_and_append(member, message)
 
-    if not mentions:
-        return False, messages
+def detect_mention_abuse(state: MemberAutomodState, message: discord.Message) -> typing.Tuple[bool, list]:
+    now = time.time()
+    append_mentions(state, message, now)
 
-    max_count = max(mentions.values()) if mentions else 0
+    messages = [{"id": message_id, "channel_id": channel_id} for message_id, channel_id in state.mention_messages.items()]
 
-    if max_count >= MAX_SIMILLAR_MENTIONS:
+    if state.mention_counters.max_score(now) >= MAX_SIMILLAR_MENTIONS:
         return True, messages
 
-    if len(mentions) >= MAX_DIFFERENT_MENTIONS:
+    if state.mention_counters.active_count(now, ACTIVE_MENTION_SCORE) >= MAX_DIFFERENT_MENTIONS:
         return True, messages
 
     return False, messages
 
 
-async def check_mention_abuse(member: discord.Member, message: discord.Message) -> typing.Tuple[bool, str]:
-    is_abuse, messages = await detect_mention_abuse(member, message)
+# Вызывается под блокировкой состояния участника
+def check_mention_abuse(state: MemberAutomodState, message: discord.Message) -> typing.Tuple[bool, list]:
+    is_abuse, messages = detect_mention_abuse(state, message)
 
+    # окно сбрасывается сразу, чтобы параллельная проверка не сработала на нём повторно
     if is_abuse:
-        try:
-            messages_by_channel = defaultdict(set)
-
-            for msg in messages:
-                messages_by_channel[msg["channel_id"]].add(msg["id"])
-
-            for channel_id, ids in messages_by_channel.items():
-                try:
-                    channel = member.guild.get_channel(channel_id) or await member.guild.fetch_channel(channel_id)
-                    asyncio.create_task(
-                        delete_messages_safe(
-                            channel,
-                            ids,
-                            reason="Злоупотребление упоминаниями от нового участника"
-                        )
-                    )
-                except Exception:
-                    logging.error(traceback.format_exc())
-
-        except Exception:
-            logging.error(traceback.format_exc())
-
-    return is_abuse, message.content
\ No newline at end of file
+        state.reset_mentions()
+
+    return is_abuse, messages
+
+
+async def delete_mention_abuse(member: discord.Member, messages: list):
+    try:
+        messages_by_channel = defaultdict(set)
+
+        for msg in messages:
+            messages_by_channel[msg["channel_id"]].add(msg["id"])
+
+        for channel_id, ids in messages_by_channel.items():
+            try:
+                channel = member.guild.get_channel(channel_id) or await member.guild.fetch_channel(channel_id)
+                ACTION_EXECUTOR.delete_messages(
+                    channel,
+                    ids,
+                    reason="Злоупотребление упоминаниями от нового участника"
+                )
+            except Exception:
+                logging.error(traceback.format_exc())
+
+    except Exception:
+        logging.error(traceback.format_exc())
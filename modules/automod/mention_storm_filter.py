@@ -0,0 +1,99 @@
+import time
+import typing
+
+from collections import OrderedDict, deque
+from datetime import timedelta
+import discord
+
+from modules.automod.action_executor import ACTION_EXECUTOR
+from modules.automod.mention_filter import extract_mention_targets
+
+STORM_WINDOW = 15                   # окно в секундах, в котором считаются упоминания одной цели
+STORM_MIN_ACCOUNTS = 5              # сколько разных новых аккаунтов должны упомянуть одну цель
+MAX_TARGETS_PER_MESSAGE = 10        # сколько целей из одного сообщения учитывается
+MAX_TRACKED_TARGETS = 512           # сколько целей отслеживается одновременно
+MAX_TRACKED_AUTHORS = 64            # сколько авторов хранится для одной цели
+MAX_TRACKED_MESSAGES = 100          # сколько сообщений хранится для одной цели
+STORM_TIMEOUT = timedelta(hours=1)  # мут остальным участникам шторма
+
+class TargetWindow:
+
+    __slots__ = ("authors", "messages", "storm_until", "punished")
+
+    def __init__(self):
+        self.authors: typing.OrderedDict[int, float] = OrderedDict()  # id автора -> время последнего упоминания
+        self.messages: typing.Deque[typing.Tuple[float, discord.abc.Messageable, int]] = deque(maxlen=MAX_TRACKED_MESSAGES)
+        self.storm_until: float = 0.0
+        self.punished: typing.Set[int] = set()  # участники шторма, которым уже выдан мут
+
+    def expire(self, now: float):
+        if now >= self.storm_until:
+            self.punished.clear()
+
+        while self.authors:
+            author_id, last_seen = next(iter(self.authors.items()))
+            if now - last_seen <= STORM_WINDOW:
+                break
+            del self.authors[author_id]
+
+        while self.messages and now - self.messages[0][0] > STORM_WINDOW:
+            self.messages.popleft()
+
+_TARGETS: typing.OrderedDict[typing.Tuple[int, str], TargetWindow] = OrderedDict()
+
+def _get_target_window(guild_id: int, target: str) -> TargetWindow:
+    key = (guild_id, target)
+
+    window = _TARGETS.get(key)
+    if window is None:
+        window = TargetWindow()
+        _TARGETS[key] = window
+
+        if len(_TARGETS) > MAX_TRACKED_TARGETS:
+            _TARGETS.popitem(last=False)
+    else:
+        _TARGETS.move_to_end(key)
+
+    return window
+
+# Возвращает цель шторма или None. Автора сообщения наказывает вызывающий код,
+# остальным участникам шторма мут выдаётся здесь, по одному разу на шторм
+def check_mention_storm(member: discord.Member, message: discord.Message) -> typing.Optional[str]:
+    now = time.time()
+    storm_target = None
+
+    targets = list(dict.fromkeys(extract_mention_targets(message)))[:MAX_TARGETS_PER_MESSAGE]
+
+    for target in targets:
+        window = _get_target_window(member.guild.id, target)
+        window.expire(now)
+
+        window.authors[member.id] = now
+        window.authors.move_to_end(member.id)
+        if len(window.authors) > MAX_TRACKED_AUTHORS:
+            window.authors.popitem(last=False)
+
+        window.messages.append((now, message.channel, message.id))
+
+        if len(window.authors) >= STORM_MIN_ACCOUNTS:
+            window.storm_until = now + STORM_WINDOW
+
+        if now < window.storm_until:
+            # удаляет все сообщения шторма, накопленные в окне; исполнитель объединяет их в пачки по каналам
+            while window.messages:
+                _, channel, message_id = window.messages.popleft()
+                ACTION_EXECUTOR.delete_messages(channel, (message_id,), reason="Массовые упоминания с новых аккаунтов")
+
+            window.punished.add(member.id)
+            for author_id in window.authors:
+                if author_id in window.punished:
+                    continue
+
+                window.punished.add(author_id)
+                participant = member.guild.get_member(author_id)
+                if participant is not None:
+                    ACTION_EXECUTOR.timeout(participant, STORM_TIMEOUT, "Массовые упоминания с новых аккаунтов")
+
+            storm_target = storm_target or target
+
+    return storm_target
@@ -0,0 +1,75 @@
+import typing
+
+from cachetools import TTLCache
+import discord
+
+from classes.bot import LittleAngelBot
+from modules.automod.link_filter import INVITE_CODE_CACHE_TTL, check_message_for_invite_codes, detect_links
+
+NAMES_PER_CHANNEL  = 4     # сколько разных названий помнить на один канал или ветку: переименования туда и обратно
+MIN_NAME_VERDICTS  = 256   # меньше этого кэш не бывает даже на маленьком сервере
+
+_MISSING = object()
+
+# Вердикты по коротким названиям (голосовые каналы, ветки): повторное название, в том числе
+# при переименовании туда и обратно, проверяется сразу и не тратит запросы на проверку приглашений.
+# Ключ - название как есть: пути ссылок и коды приглашений чувствительны к регистру и проверяются
+# по исходному тексту, поэтому даже отличающиеся только регистром названия проверяются отдельно
+# Размер подстраивается под число каналов и веток сервера
+class NameVerdictCache:
+    def __init__(self, ttl: int = INVITE_CODE_CACHE_TTL):
+        self._ttl = ttl
+        self._verdicts: TTLCache = TTLCache(maxsize=MIN_NAME_VERDICTS, ttl=ttl)
+
+        self.hits: int   = 0
+        self.misses: int = 0
+
+    def __len__(self) -> int:
+        return len(self._verdicts)
+
+    def fit(self, guild: discord.Guild):
+        needed = max(MIN_NAME_VERDICTS, (len(guild.channels) + len(guild.threads)) * NAMES_PER_CHANNEL)
+        if needed <= self._verdicts.maxsize:
+            return
+
+        # растёт степенями двойки, чтобы не пересоздаваться на каждый новый канал
+        verdicts = TTLCache(maxsize=1 << (needed - 1).bit_length(), ttl=self._ttl)
+        verdicts.update(self._verdicts)
+        self._verdicts = verdicts
+
+    async def _get(self, guild: discord.Guild, key: typing.Hashable, check: typing.Callable[[], typing.Awaitable[typing.Any]]) -> typing.Any:
+        verdict = self._verdicts.get(key, _MISSING)
+        if verdict is not _MISSING:
+            self.hits += 1
+            return verdict
+
+        self.misses += 1
+        self.fit(guild)
+
+        verdict = await check()
+        self._verdicts[key] = verdict
+        return verdict
+
+    async def detect_links(self, bot: LittleAngelBot, guild: discord.Guild, name: str) -> typing.Optional[str]:
+        return await self._get(guild, ("links", name), lambda: detect_links(bot, name))
+
+    async def check_invite_codes(self, bot: LittleAngelBot, guild: discord.Guild, name: str) -> dict:
+        key = ("invite", guild.id, name)
+        cached = key in self._verdicts
+
+        result = await self._get(guild, key, lambda: check_message_for_invite_codes(bot, name, guild.id))
+
+        if cached and result.get("found_invite"):
+            return {**result, "from_cache": True}
+
+        return result
+
+    def stats(self) -> typing.Dict[str, int]:
+        return {
+            "size": len(self._verdicts),
+            "capacity": int(self._verdicts.maxsize),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+NAME_VERDICTS = NameVerdictCache()
@@ -0,0 +1,118 @@
+import importlib
+import logging
+import random
+import re
+import string
+import sys
+import time
+import typing
+
+from modules.analysis_pool import ANALYSIS_POOL, INLINE_SIZE_LIMIT
+
+AUDIT_SIZES    = (2000, 20000)  # длины проверочных строк: граница выполнения на месте и крупное сообщение
+AUDIT_BUDGET   = 0.1            # сколько секунд допустимо для одного шаблона на одной строке
+AUDIT_SEED     = 1337           # случайные строки одинаковы от запуска к запуску
+AUDIT_TIMEOUT  = 120            # сколько секунд максимум занимает весь аудит
+
+AUDITED_MODULES = (
+    "modules.automod.content_analysis",
+    "modules.automod.spam_filter",
+    "modules.automod.link_filter",
+    "modules.automod.content_fingerprints",
+    "modules.automod.edit_scan",
+)
+
+# Строки, на которых регулярные выражения с вложенными квантификаторами и
+# опережающими проверками чаще всего уходят в перебор
+def adversarial_inputs(size: int) -> typing.List[typing.Tuple[str, str]]:
+    generator = random.Random(AUDIT_SEED)
+
+    def fill(unit: str) -> str:
+        return (unit * (size // len(unit) + 1))[:size]
+
+    return [
+        ("одна буква", fill("a")),
+        ("буквы без границы слова", fill("aB3")),
+        ("буквы с хвостом", fill("a")[:-2] + "!."),
+        ("точки и пробелы", fill(". ")),
+        ("разделители", fill("-_•.")),
+        ("вертикальные черты", fill("a|")),
+        ("черта и дефис", fill("|-")),
+        ("разрядка", fill("d i s c o r d ")),
+        ("почти ссылка", fill("t.m.e")),
+        ("кавычки", fill("`")),
+        ("пустые строки", fill("\n \n")),
+        ("почти домен", fill("discordgg")[:-1] + "."),
+        ("упоминания", fill("<@1234567890")),
+        ("эмодзи-код", fill(":a")),
+        ("кириллица", fill("приветdiscord")),
+        ("случайные буквы", "".join(generator.choices(string.ascii_letters + string.digits, k=size))),
+        ("случайные символы", "".join(generator.choices(string.printable, k=size))),
+    ]
+
+def collect_patterns(module_names: typing.Iterable[str]) -> typing.List[typing.Tuple[str, re.Pattern]]:
+    patterns = []
+
+    def walk(name: str, value: typing.Any):
+        if isinstance(value, re.Pattern):
+            patterns.append((name, value))
+        elif isinstance(value, (list, tuple)):
+            for index, item in enumerate(value):
+                walk(f"{name}[{index}]", item)
+
+    for module_name in module_names:
+        module = importlib.import_module(module_name)
+        for attribute, value in vars(module).items():
+            if attribute.isupper():
+                walk(f"{module_name.rsplit('.', 1)[-1]}.{attribute}", value)
+
+    return patterns
+
+# Прогоняет каждый скомпилированный шаблон по враждебным строкам и возвращает те,
+# что не укладываются в AUDIT_BUDGET: (шаблон, строка, длина, секунды)
+def audit_patterns(module_names: typing.Iterable[str] = AUDITED_MODULES) -> typing.List[typing.Tuple[str, str, int, float]]:
+    slow = []
+
+    for size in AUDIT_SIZES:
+        inputs = adversarial_inputs(size)
+
+        for name, pattern in collect_patterns(module_names):
+            for label, text in inputs:
+                started = time.perf_counter()
+                pattern.findall(text)
+                elapsed = time.perf_counter() - started
+
+                if elapsed > AUDIT_BUDGET:
+                    slow.append((name, label, size, elapsed))
+
+    return slow
+
+# Аудит при запуске: выполняется в пуле процессов и пишет в лог шаблоны, которые на враждебных
+# строках работают дольше бюджета. Если такие есть, короткие тексты тоже перестают проверяться
+# на месте: всё уходит в пул, где у каждой задачи есть бюджет времени и вердикт на случай таймаута
+async def run_regex_audit():
+    slow = await ANALYSIS_POOL.run(audit_patterns, AUDITED_MODULES, size=INLINE_SIZE_LIMIT, timeout=AUDIT_TIMEOUT)
+
+    if slow is None:
+        logging.warning(f"Аудит регулярных выражений не уложился в {AUDIT_TIMEOUT} с")
+    else:
+        for name, label, size, seconds in slow:
+            logging.warning(f"Регулярное выражение {name} работает {seconds:.3f} с на строке «{label}» длиной {size}")
+
+        if not slow:
+            logging.info("Аудит регулярных выражений пройден")
+            return
+
+    ANALYSIS_POOL.inline_limit = 0
+    logging.warning("Аудит регулярных выражений не пройден: все тексты проверяются в пуле процессов")
+
+# Тот же аудит как отдельная проверка перед выкладкой:
+# python -m modules.automod.regex_audit завершается с ненулевым кодом, если есть медленные шаблоны
+if __name__ == "__main__":
+    failures = audit_patterns()
+
+    for name, label, size, seconds in failures:
+        print(f"{name}: {seconds:.3f} с на строке «{label}» длиной {size}")
+
+    print(f"Медленных шаблонов: {len(failures)}")
+    sys.exit(1 if failures else 0)
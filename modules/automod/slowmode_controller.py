@@ -0,0 +1,343 @@
+import asyncio
+import heapq
+import logging
+import math
+import time
+import traceback
+import typing
+
+from collections import Counter, defaultdict
+import discord
+
+from modules.sliding_window import BucketedWindowCounter
+
+LOGGER = logging.getLogger(__name__)
+
+SLOWMODE_WINDOW   = 10   # за сколько секунд считается активность канала
+SLOWMODE_BUCKET   = 1.0  # длина одной корзины счётчика активности в секундах
+DEFAULT_HOLD_TIME = 120  # сколько секунд держать неизвестный уровень замедления
+
+FORECAST_TIME_CONSTANT = 20   # постоянная времени сглаживания прогноза активности в секундах
+RELAX_RATIO            = 0.6  # уровень снимается, только когда прогноз ниже этой доли его порога
+
+CHANNEL_EDIT_CAPACITY = 3     # сколько изменений замедления канала можно сделать подряд
+CHANNEL_EDIT_REFILL   = 60    # за сколько секунд восстанавливается одно изменение канала
+GLOBAL_EDIT_CAPACITY  = 10    # сколько изменений замедления во всех каналах можно сделать подряд
+GLOBAL_EDIT_REFILL    = 6     # за сколько секунд восстанавливается одно общее изменение
+
+# (сообщений за окно, задержка замедления, сколько секунд держать уровень)
+SLOWMODE_LEVELS = [
+    (40, 30, 600),
+    (30, 15, 300),
+    (15, 3, 120),
+]
+
+def target_delay_for(count: int) -> int:
+    for limit, delay, _ in SLOWMODE_LEVELS:
+        if count >= limit:
+            return delay
+    return 0
+
+def hold_time_for(delay: int) -> int:
+    return next((h for _, d, h in SLOWMODE_LEVELS if d == delay), DEFAULT_HOLD_TIME)
+
+# Экспоненциально сглаженная активность канала: падает медленнее самого счётчика,
+# поэтому короткое затишье посреди всплеска не снимает замедление
+class RateForecast:
+
+    __slots__ = ("value", "updated")
+
+    def __init__(self):
+        self.value: float = 0.0
+        self.updated: typing.Optional[float] = None
+
+    def update(self, count: int, now: float) -> float:
+        if self.updated is None:
+            self.value = float(count)
+        else:
+            alpha = 1.0 - math.exp(-(now - self.updated) / FORECAST_TIME_CONSTANT)
+            self.value += alpha * (count - self.value)
+
+        self.updated = now
+        return self.value
+
+# Бюджет изменений канала: ведро токенов, которое пополняется со временем
+class EditBudget:
+
+    __slots__ = ("capacity", "refill_seconds", "tokens", "updated")
+
+    def __init__(self, capacity: int, refill_seconds: float):
+        self.capacity = capacity
+        self.refill_seconds = refill_seconds
+        self.tokens: float = float(capacity)
+        self.updated: typing.Optional[float] = None
+
+    def _refill(self, now: float):
+        if self.updated is not None:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) / self.refill_seconds)
+        self.updated = now
+
+    def wait_time(self, now: float) -> float:
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) * self.refill_seconds
+
+    def take(self, now: float):
+        self._refill(now)
+        self.tokens -= 1
+
+# Замедление пересчитывается только по событиям: сразу, когда активность канала
+# превышает текущий уровень, и по таймеру, когда истекает время удержания уровня.
+# Каналы без замедления и без всплесков не стоят ничего
+class SlowmodeController:
+    def __init__(self, bot: discord.Client):
+        self.bot = bot
+
+        # цикл событий однопоточный, поэтому счётчикам не нужны блокировки
+        self._activity: typing.Dict[int, BucketedWindowCounter] = defaultdict(
+            lambda: BucketedWindowCounter(SLOWMODE_WINDOW, SLOWMODE_BUCKET)
+        )
+        self._state: typing.Dict[int, typing.Tuple[int, float]] = {}  # id канала -> (задержка, с какого момента)
+        self._forecasts: typing.Dict[int, RateForecast] = defaultdict(RateForecast)
+
+        self._budgets: typing.Dict[int, EditBudget] = defaultdict(lambda: EditBudget(CHANNEL_EDIT_CAPACITY, CHANNEL_EDIT_REFILL))
+        self._global_budget = EditBudget(GLOBAL_EDIT_CAPACITY, GLOBAL_EDIT_REFILL)
+        self._blocked_until: typing.Dict[int, float] = {}  # id канала -> когда бюджет позволит новое изменение
+        self._last_skips: typing.Dict[int, typing.Tuple[str, int]] = {}  # id канала -> (причина, уровень) последнего пропуска
+
+        self.metrics: typing.Counter[str] = Counter()
+
+        self._deadlines: typing.List[typing.Tuple[float, int]] = []  # куча (время проверки, id канала)
+        self._scheduled: typing.Dict[int, float] = {}                # id канала -> ближайшая проверка
+        self._timer: typing.Optional[asyncio.TimerHandle] = None
+        self._timer_deadline: typing.Optional[float] = None
+
+        self._evaluating: typing.Set[int] = set()
+        self._tasks: typing.Set[asyncio.Task] = set()
+
+    def record_message(self, channel: discord.TextChannel):
+        now = time.monotonic()
+        count = self._activity[channel.id].add(now)
+        self._forecasts[channel.id].update(count, now)
+
+        # пока бюджет исчерпан, проверка уже запланирована на момент его пополнения
+        if target_delay_for(count) > channel.slowmode_delay and now >= self._blocked_until.get(channel.id, 0.0):
+            self._evaluate_soon(channel.id)
+
+    def _count(self, channel_id: int, now: float) -> int:
+        counter = self._activity.get(channel_id)
+        if counter is None:
+            return 0
+        return counter.total(now)
+
+    # планирование
+
+    def _schedule(self, channel_id: int, when: float):
+        scheduled = self._scheduled.get(channel_id)
+        if scheduled is not None and scheduled <= when:
+            return
+
+        self._scheduled[channel_id] = when
+        heapq.heappush(self._deadlines, (when, channel_id))
+        self._arm_timer()
+
+    def _arm_timer(self):
+        if not self._deadlines:
+            if self._timer:
+                self._timer.cancel()
+            self._timer = None
+            self._timer_deadline = None
+            return
+
+        deadline = self._deadlines[0][0]
+        if self._timer and self._timer_deadline == deadline:
+            return
+
+        if self._timer:
+            self._timer.cancel()
+
+        self._timer_deadline = deadline
+        self._timer = asyncio.get_running_loop().call_later(max(0.0, deadline - time.monotonic()), self._on_timer)
+
+    def _on_timer(self):
+        self._timer = None
+        self._timer_deadline = None
+        now = time.monotonic()
+
+        while self._deadlines and self._deadlines[0][0] <= now:
+            when, channel_id = heapq.heappop(self._deadlines)
+
+            # устаревшая запись: проверка канала уже перенесена на более раннее время
+            if self._scheduled.get(channel_id) != when:
+                continue
+
+            del self._scheduled[channel_id]
+            self._evaluate_soon(channel_id)
+
+        self._arm_timer()
+
+    def _evaluate_soon(self, channel_id: int):
+        # текущая проверка канала сама запланирует следующую
+        if channel_id in self._evaluating:
+            return
+
+        self._evaluating.add(channel_id)
+        task = asyncio.create_task(self._evaluate(channel_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _forget(self, channel_id: int):
+        self._activity.pop(channel_id, None)
+        self._state.pop(channel_id, None)
+        self._scheduled.pop(channel_id, None)
+        self._forecasts.pop(channel_id, None)
+        self._budgets.pop(channel_id, None)
+        self._blocked_until.pop(channel_id, None)
+        self._last_skips.pop(channel_id, None)
+
+    # бюджет изменений
+
+    def _skip(self, channel_id: int, reason: str, current_delay: int, wanted_delay: int):
+        self.metrics[f"skipped_{reason}"] += 1
+
+        # гистерезис перепроверяет канал каждые SLOWMODE_WINDOW секунд: в INFO попадает только
+        # первый пропуск для канала и уровня, повторы видны в stats() и в DEBUG
+        skip = (reason, current_delay)
+        level = logging.DEBUG if self._last_skips.get(channel_id) == skip else logging.INFO
+        self._last_skips[channel_id] = skip
+
+        LOGGER.log(
+            level,
+            f"Пропущено изменение замедления канала {channel_id} ({current_delay} -> {wanted_delay}), причина: {reason}; "
+            f"изменений: {self.metrics['edits']}, пропусков по бюджету: {self.metrics['skipped_budget']}, "
+            f"по гистерезису: {self.metrics['skipped_hysteresis']}"
+        )
+
+    def _reserve_edit(self, channel_id: int, now: float, current_delay: int, wanted_delay: int) -> bool:
+        channel_budget = self._budgets[channel_id]
+        wait = max(channel_budget.wait_time(now), self._global_budget.wait_time(now))
+
+        if wait > 0:
+            self._skip(channel_id, "budget", current_delay, wanted_delay)
+            self._blocked_until[channel_id] = now + wait
+            self._schedule(channel_id, now + wait)
+            return False
+
+        channel_budget.take(now)
+        self._global_budget.take(now)
+        self._blocked_until.pop(channel_id, None)
+        self.metrics["edits"] += 1
+        return True
+
+    def stats(self) -> typing.Dict[str, float]:
+        return {
+            "channels": len(self._activity),
+            "slowmoded": len(self._state),
+            "scheduled": len(self._scheduled),
+            "global_edit_tokens": round(self._global_budget.tokens, 2),
+            "skipped_budget": self.metrics["skipped_budget"],
+            "skipped_hysteresis": self.metrics["skipped_hysteresis"],
+            **self.metrics,
+        }
+
+    # пересчёт уровня
+
+    async def _evaluate(self, channel_id: int):
+        try:
+            await self._apply_level(channel_id)
+        except Exception:
+            LOGGER.error(f"Ошибка при пересчёте замедления канала {channel_id}:\n{traceback.format_exc()}")
+        finally:
+            self._evaluating.discard(channel_id)
+
+    async def _apply_level(self, channel_id: int):
+        channel = self.bot.get_channel(channel_id)
+        if not channel or not isinstance(channel, discord.TextChannel):
+            self._forget(channel_id)
+            return
+
+        now = time.monotonic()
+        count = self._count(channel_id, now)
+
+        # прогноз не ниже текущей активности: снижение уровня решается по нему с запасом RELAX_RATIO
+        forecast    = max(count, self._forecasts[channel_id].update(count, now))
+        relax_delay = target_delay_for(forecast / RELAX_RATIO)
+
+        target_delay  = target_delay_for(count)
+        current_delay = channel.slowmode_delay
+        last_state    = self._state.get(channel_id)
+
+        if target_delay > current_delay:
+            if not self._reserve_edit(channel_id, now, current_delay, target_delay):
+                return
+
+            try:
+                await channel.edit(slowmode_delay=target_delay, reason="Ужесточение замедления в виду увеличения активности")
+                self._state[channel_id] = (target_delay, now)
+                self._schedule(channel_id, now + hold_time_for(target_delay))
+            except (discord.Forbidden, discord.HTTPException):
+                pass
+            return
+
+        if current_delay > target_delay and last_state:
+            last_delay, since = last_state
+
+            # замедление изменили вручную: отсчёт удержания начинается заново
+            if last_delay != current_delay:
+                self._state[channel_id] = (current_delay, now)
+                self._schedule(channel_id, now + hold_time_for(current_delay))
+                return
+
+            hold_time = hold_time_for(last_delay)
+
+            if now - since < hold_time:
+                self._schedule(channel_id, since + hold_time)
+                return
+
+            # активность ещё близка к порогу: снятый уровень пришлось бы сразу вернуть
+            if relax_delay >= last_delay:
+                self._skip(channel_id, "hysteresis", current_delay, target_delay)
+                self._schedule(channel_id, now + SLOWMODE_WINDOW)
+                return
+
+            lower_levels = [
+                d for _, d, _ in SLOWMODE_LEVELS
+                if d < last_delay
+            ]
+
+            next_delay = max(
+                (d for d in lower_levels if d >= relax_delay),
+                default=relax_delay
+            )
+
+            if not self._reserve_edit(channel_id, now, current_delay, next_delay):
+                return
+
+            try:
+                await channel.edit(slowmode_delay=next_delay, reason="Смягчение замедления в виду уменьшения активности")
+                if next_delay > 0:
+                    self._state[channel_id] = (next_delay, now)
+                    self._schedule(channel_id, now + hold_time_for(next_delay))
+                else:
+                    self._state.pop(channel_id, None)
+            except (discord.Forbidden, discord.HTTPException):
+                self._schedule(channel_id, now + SLOWMODE_WINDOW)
+            return
+
+        # активность всё ещё держит уровень: проверить снова, когда окно обновится
+        if current_delay > 0 and last_state:
+            self._schedule(channel_id, now + SLOWMODE_WINDOW)
+            return
+
+        if not count and current_delay == 0:
+            self._forget(channel_id)
+
+    def close(self):
+        if self._timer:
+            self._timer.cancel()
+        self._timer = None
+        self._timer_deadline = None
+
+        for task in self._tasks:
+            task.cancel()
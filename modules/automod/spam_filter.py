@@ -2,6 +2,8 @@ from cache import AsyncTTL
 from collections import Counter
 import re
 
+from modules.analysis_pool import ANALYSIS_POOL
+
 ZERO_WIDTH_RE = re.compile(r"[\u200B-\u200F\uFEFF\u2060]")
 EMPTY_SPAM_LINE_RE = re.compile(r"^[\s\`\u200B-\u200F\uFEFF]{0,}$")
 
@@ -27,8 +29,7 @@ SPECIAL_CHARS_SEQUENCE_LONG_PATTERN = re.compile(r"[!@#$%^&*()_+=\[\]{}|\\:;\"'<
 REPEATED_SEPARATORS_PATTERN = re.compile(r"[\.]{20,}|[-]{20,}|[_]{20,}|[=]{20,}|[+]{20,}")
 
 
-@AsyncTTL(time_to_live=600, maxsize=20000)
-async def is_spam_block(message: str) -> bool:
+def detect_spam_block(message: str) -> bool:
     msg_len = len(message)
     
     if msg_len < 3:
@@ -191,4 +192,8 @@ async def is_spam_block(message: str) -> bool:
             if special_chars / msg_len > 0.6:
                 return True
     
-    return False
\ No newline at end of file
+    return False
+
+@AsyncTTL(time_to_live=600, maxsize=20000)
+async def is_spam_block(message: str) -> bool:
+    return await ANALYSIS_POOL.run(detect_spam_block, message, size=len(message), fallback=True)
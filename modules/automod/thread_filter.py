@@ -1,50 +1,42 @@
 import asyncio
 import logging
+import time
 import traceback
 import typing
 
-from aiocache import SimpleMemoryCache
 import discord
 
 from classes.bot import LittleAngelBot
-from modules.automod.link_filter import detect_links
-from modules.lock_manager import LockManagerWithIdleTTL
-
-THREADS_FROM_NEW_MEMBERS_CACHE = SimpleMemoryCache()
+from modules.automod.action_executor import ACTION_EXECUTOR
+from modules.automod.member_state import MemberAutomodState, locked_member_state
+from modules.automod.name_verdicts import NAME_VERDICTS
 
 _DELETE_SEMAPHORE = asyncio.Semaphore(1)
-LOCK_MANAGER = LockManagerWithIdleTTL(idle_ttl=2400)
 
 MAX_THREADS = 7  # максимальное количество веток в кэше
 
-async def get_cached_threads_and_append(member: discord.Member, append_thread: discord.Thread) -> list:
-    async with LOCK_MANAGER.lock(member.id):
-        threads = await THREADS_FROM_NEW_MEMBERS_CACHE.get(member.id) or []
-
-        threads = threads[-MAX_THREADS:]
-
-        if append_thread:
-            threads.append({
-                "id": append_thread.id
-            })
+def append_thread(state: MemberAutomodState, thread: discord.Thread) -> list:
+    if thread.id not in state.threads:
+        state.threads.append(thread.id)
 
-            await THREADS_FROM_NEW_MEMBERS_CACHE.set(member.id, threads, ttl=1200)
+    state.threads = state.threads[-MAX_THREADS:]
+    state.threads_updated = time.time()
 
-
-    return threads
+    return state.threads
 
 async def analyze_thread(bot: LittleAngelBot, member: discord.Member, thread: discord.Thread) -> typing.Tuple[bool, list, typing.Optional[str]]:
 
-    threads_list = await get_cached_threads_and_append(member, append_thread=thread)
+    # название проверяется до блокировки состояния: блокировка берётся один раз,
+    # на добавление ветки и сброс окна
+    matched = await NAME_VERDICTS.detect_links(bot, thread.guild, thread.name)
+
+    async with locked_member_state(member.id) as state:
+        threads_list = list(append_thread(state, thread))
 
-    if len(threads_list) >= MAX_THREADS:
-        return True, threads_list, None
-    
-    matched = await detect_links(bot, thread.name)
+        if matched or len(threads_list) >= MAX_THREADS:
+            state.reset_threads()
+            return True, threads_list, matched
 
-    if matched:
-        return True, threads_list, matched
-    
     return False, threads_list, matched
 
 async def delete_thread_safe(
@@ -83,14 +75,14 @@ async def flood_and_threads_check(bot: LittleAngelBot, member: discord.Member, t
 
     if is_flood:
         
-        for th_dict in threads:
+        for thread_id in threads:
 
             try:
-                th = member.guild.get_thread(th_dict["id"]) or await member.guild.fetch_channel(th_dict["id"])
+                th = member.guild.get_thread(thread_id) or await member.guild.fetch_channel(thread_id)
                 if not isinstance(th, discord.Thread):
                     continue
                 
-                asyncio.create_task(delete_thread_safe(th, reason="Реклама в ветке" if matched else "Флуд ветками от нового участника"))
+                ACTION_EXECUTOR.submit(delete_thread_safe(th, reason="Реклама в ветке" if matched else "Флуд ветками от нового участника"))
 
             except Exception:
                 logging.error(traceback.format_exc())
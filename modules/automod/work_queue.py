@@ -0,0 +1,119 @@
+import asyncio
+import logging
+import traceback
+import typing
+
+from collections import Counter, deque
+
+from modules.interaction_lane import INTERACTION_LANE
+
+LOGGER = logging.getLogger(__name__)
+
+QUEUE_CAPACITY = 2000  # сколько сообщений может ждать проверки одновременно
+WORKER_COUNT   = 16    # сколько сообщений проверяется одновременно
+PRESSURE_RATIO = 0.5   # с какой заполненности очереди отключаются дорогие проверки
+RISK_LEVELS    = (3, 2, 1)  # приоритеты участников от самых рискованных к самым надёжным
+
+Job = typing.Callable[[], typing.Awaitable[None]]
+
+# Ограниченная очередь проверок автомодерации: сообщения новых участников обрабатываются первыми,
+# а при переполнении вытесняются задачи самых надёжных участников
+class AutomodWorkQueue:
+    def __init__(self, capacity: int = QUEUE_CAPACITY, workers: int = WORKER_COUNT):
+        self.capacity = capacity
+        self.worker_count = workers
+
+        self._lanes: typing.Dict[int, typing.Deque[Job]] = {risk: deque() for risk in RISK_LEVELS}
+        self._size = 0
+        self._has_work = asyncio.Event()
+        self._workers: typing.List[asyncio.Task] = []
+
+        self.busy = 0
+        self.max_depth = 0
+        self.metrics: typing.Counter[str] = Counter()
+
+    @property
+    def depth(self) -> int:
+        return self._size
+
+    @property
+    def under_pressure(self) -> bool:
+        return self._size >= self.capacity * PRESSURE_RATIO
+
+    def start(self):
+        if self._workers:
+            return
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.worker_count)]
+
+    def submit(self, risk: int, job: Job) -> bool:
+        lane = self._lanes.get(risk) or self._lanes[RISK_LEVELS[-1]]
+
+        if self._size >= self.capacity:
+            # вытесняет самую старую задачу наименее рискованного участника, если она ниже новой
+            victim = next((r for r in reversed(RISK_LEVELS) if self._lanes[r]), None)
+
+            if victim is None or victim > risk:
+                self.metrics["dropped"] += 1
+                return False
+
+            self._lanes[victim].popleft()
+            self._size -= 1
+            self.metrics["evicted"] += 1
+
+        lane.append(job)
+        self._size += 1
+        self.max_depth = max(self.max_depth, self._size)
+        self.metrics["submitted"] += 1
+        self._has_work.set()
+        return True
+
+    def shed(self, stage: str):
+        self.metrics[f"shed_{stage}"] += 1
+
+    def _pop(self) -> typing.Optional[Job]:
+        for risk in RISK_LEVELS:
+            lane = self._lanes[risk]
+            if lane:
+                self._size -= 1
+                return lane.popleft()
+        return None
+
+    async def _worker(self):
+        while True:
+            # взаимодействия с командами обслуживаются раньше проверок автомодерации
+            await INTERACTION_LANE.wait_idle()
+
+            job = self._pop()
+
+            if job is None:
+                self._has_work.clear()
+                await self._has_work.wait()
+                continue
+
+            self.busy += 1
+            try:
+                await job()
+            except Exception:
+                LOGGER.error(f"Ошибка при проверке сообщения автомодерацией:\n{traceback.format_exc()}")
+            finally:
+                self.busy -= 1
+                self.metrics["processed"] += 1
+
+    async def close(self):
+        for worker in self._workers:
+            worker.cancel()
+
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def stats(self) -> typing.Dict[str, int]:
+        return {
+            "depth": self._size,
+            "capacity": self.capacity,
+            "busy": self.busy,
+            "max_depth": self.max_depth,
+            **{f"depth_{risk}": len(lane) for risk, lane in self._lanes.items()},
+            **self.metrics,
+        }
+
+AUTOMOD_WORK_QUEUE = AutomodWorkQueue()
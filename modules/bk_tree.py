@@ -0,0 +1,67 @@
+import typing
+
+def hamming_distance(first: int, second: int) -> int:
+    return (first ^ second).bit_count()
+
+# BK-дерево для поиска ближайших значений по метрике: при поиске в радиусе r из каждого
+# узла обходятся только дети на расстоянии [d - r, d + r], поэтому большая часть дерева пропускается
+class BKTree:
+
+    __slots__ = ("_distance", "_root", "_size")
+
+    def __init__(self, distance: typing.Callable[[typing.Any, typing.Any], int] = hamming_distance):
+        self._distance = distance
+        self._root: typing.Optional[typing.Tuple[typing.Any, typing.Dict[int, tuple]]] = None
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, item: typing.Any) -> bool:
+        if self._root is None:
+            self._root = (item, {})
+            self._size = 1
+            return True
+
+        node = self._root
+        while True:
+            distance = self._distance(item, node[0])
+            if distance == 0:
+                return False
+
+            child = node[1].get(distance)
+            if child is None:
+                node[1][distance] = (item, {})
+                self._size += 1
+                return True
+
+            node = child
+
+    def search(self, item: typing.Any, max_distance: int) -> typing.List[typing.Tuple[int, typing.Any]]:
+        if self._root is None:
+            return []
+
+        found = []
+        stack = [self._root]
+
+        while stack:
+            node_item, children = stack.pop()
+            distance = self._distance(item, node_item)
+
+            if distance <= max_distance:
+                found.append((distance, node_item))
+
+            for child_distance, child in children.items():
+                if distance - max_distance <= child_distance <= distance + max_distance:
+                    stack.append(child)
+
+        found.sort(key=lambda pair: pair[0])
+        return found
+
+    def nearest(self, item: typing.Any, max_distance: int) -> typing.Optional[typing.Tuple[int, typing.Any]]:
+        found = self.search(item, max_distance)
+        return found[0] if found else None
+
+    def clear(self):
+        self._root = None
+        self._size = 0
@@ -40,6 +40,9 @@ class Settings(BaseSettings):
     AUTOMOD_LOGS_CHANNEL_ID:       int = 1415381171939967076
     NEWS_CHANNEL_ID:               int = 1435943738688929934
 
+    ATTACHMENT_SCAN_BYTE_BUDGET:   int = 1_000_000  # сколько байт текстового вложения проверять
+    ATTACHMENT_SPAM_FILTER:        bool = True      # проверять частоту и повторы вложений от новых участников
+
     AUTOMOD_WHITELISTED_ROLES_IDS: typing.List[int] = [
         1438936721449422930,
         1445780096181997750
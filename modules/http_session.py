@@ -0,0 +1,27 @@
+import typing
+
+import aiohttp
+
+HTTP_CONNECTION_LIMIT = 50  # сколько соединений держит общий пул
+
+_SESSION: typing.Optional[aiohttp.ClientSession] = None
+
+# Общая сессия с пулом соединений для всех внешних запросов бота
+def get_http_session() -> aiohttp.ClientSession:
+    global _SESSION
+
+    if _SESSION is None or _SESSION.closed:
+        _SESSION = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=HTTP_CONNECTION_LIMIT),
+            headers={'User-Agent': 'Mozilla/5.0'}
+        )
+
+    return _SESSION
+
+async def close_http_session():
+    global _SESSION
+
+    if _SESSION is not None and not _SESSION.closed:
+        await _SESSION.close()
+
+    _SESSION = None
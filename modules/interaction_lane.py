@@ -0,0 +1,93 @@
+import asyncio
+import logging
+import time
+import typing
+
+from collections import deque
+import discord
+
+LOGGER = logging.getLogger(__name__)
+
+ACKNOWLEDGE_DEADLINE  = 3.0    # сколько секунд Discord ждёт ответа на взаимодействие
+ACKNOWLEDGE_TARGET    = 1.0    # к какой задержке ответа стремимся
+ACKNOWLEDGE_POLL      = 0.05   # как часто проверять, ответили ли на взаимодействие
+YIELD_TIMEOUT         = 0.5    # сколько максимум автомодерация ждёт завершения взаимодействий
+MAX_LATENCY_SAMPLES   = 500    # сколько последних замеров хранить
+
+# Учёт взаимодействий, на которые ещё не ответили: пока они есть, обработчики
+# автомодерации не берут новые задачи, и цикл событий остаётся свободным для ответа
+class InteractionLane:
+    def __init__(self):
+        self._pending: typing.Set[int] = set()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._watchers: typing.Set[asyncio.Task] = set()
+
+        self.samples: typing.Deque[float] = deque(maxlen=MAX_LATENCY_SAMPLES)
+        self.recorded: int = 0
+        self.missed: int = 0
+        self.yields: int = 0
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    # record=False: взаимодействие задерживает автомодерацию, но не попадает в замеры (проверочные из /raidtest)
+    def begin(self, interaction: discord.Interaction, record: bool = True):
+        self._pending.add(interaction.id)
+        self._idle.clear()
+        task = asyncio.create_task(self._watch(interaction, record))
+        self._watchers.add(task)
+        task.add_done_callback(self._watchers.discard)
+
+    def _finish(self, interaction_id: int):
+        self._pending.discard(interaction_id)
+        if not self._pending:
+            self._idle.set()
+
+    async def _watch(self, interaction: discord.Interaction, record: bool):
+        try:
+            while not interaction.response.is_done():
+                if time.time() - interaction.created_at.timestamp() > ACKNOWLEDGE_DEADLINE:
+                    if record:
+                        self.missed += 1
+                        LOGGER.warning(f"Не успели ответить на взаимодействие {interaction.id} за {ACKNOWLEDGE_DEADLINE} с")
+                    return
+                await asyncio.sleep(ACKNOWLEDGE_POLL)
+
+            if record:
+                self.samples.append(time.time() - interaction.created_at.timestamp())
+                self.recorded += 1
+        finally:
+            self._finish(interaction.id)
+
+    async def wait_idle(self):
+        if self._idle.is_set():
+            return
+
+        self.yields += 1
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout=YIELD_TIMEOUT)
+        except asyncio.TimeoutError:
+            pass
+
+    def stats(self) -> typing.Dict[str, float]:
+        ordered = sorted(self.samples)
+
+        def percentile(p: float) -> float:
+            if not ordered:
+                return 0.0
+            return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+        return {
+            "samples": len(ordered),
+            "p50": percentile(0.5),
+            "p95": percentile(0.95),
+            "max": ordered[-1] if ordered else 0.0,
+            "over_target": sum(1 for sample in ordered if sample > ACKNOWLEDGE_TARGET),
+            "missed": self.missed,
+            "pending": self.pending,
+            "yields": self.yields,
+        }
+
+INTERACTION_LANE = InteractionLane()
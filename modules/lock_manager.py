@@ -1,62 +1,83 @@
 import asyncio
-import threading
 import time
 from contextlib import asynccontextmanager
-from typing import Dict, Optional, Tuple
-
-class LockManagerWithIdleTTL:
-    def __init__(self, idle_ttl: int = 3600):
-        self._start_lock = threading.Lock()
-        self._cleanup_started = False
-        self._locks: Dict[int, Tuple[asyncio.Lock, float]] = {}
-        self._creation_lock = asyncio.Lock()
-        self._idle_ttl = idle_ttl
-        self._cleanup_task: Optional[asyncio.Task] = None
-
-    def start_cleanup(self):
-        with self._start_lock:
-            if not self._cleanup_started:
-                self._cleanup_started = True
-                self._cleanup_task = asyncio.create_task(self._cleanup_loop())
-    
-    async def _cleanup_loop(self):
-        while True:
-            await asyncio.sleep(60)
-            now = time.time()
-            async with self._creation_lock:
-                expired = [
-                    uid for uid, (lock, last_used) in self._locks.items()
-                    if now - last_used >= self._idle_ttl and not lock.locked()
-                ]
-                for uid in expired:
-                    del self._locks[uid]
-    
-    async def get_lock(self, user_id: int) -> asyncio.Lock:
-
-        if not self._cleanup_started:
-            self.start_cleanup()
-
-        now = time.time()
-        
-        if user_id in self._locks:
-            lock, _ = self._locks[user_id]
-            self._locks[user_id] = (lock, now)
-            return lock
-        
-        async with self._creation_lock:
-            if user_id in self._locks:
-                lock, _ = self._locks[user_id]
-                self._locks[user_id] = (lock, now)
-                return lock
-            
-            new_lock = asyncio.Lock()
-            self._locks[user_id] = (new_lock, now)
-            return new_lock
-    
+from typing import Dict, Hashable, List, Tuple
+
+_FIBONACCI_MULTIPLIER = 0x9E3779B97F4A7C15
+_HASH_MASK            = (1 << 64) - 1
+
+# Фиксированный набор блокировок, между которыми ключи распределяются по хэшу:
+# память постоянна, блокировки не создаются на лету и не требуют очистки
+class StripedLockManager:
+    def __init__(self, stripes: int = 64):
+        self._locks: List[asyncio.Lock] = [asyncio.Lock() for _ in range(stripes)]
+
+        self.acquisitions: int  = 0
+        self.contended: int     = 0
+        self.total_wait: float  = 0.0
+        self.max_wait: float    = 0.0
+
+    def _stripe(self, key: Hashable) -> int:
+        # перемешивает биты, чтобы близкие snowflake-id не попадали в соседние блокировки
+        mixed = ((hash(key) & _HASH_MASK) * _FIBONACCI_MULTIPLIER) & _HASH_MASK
+        return (mixed >> 32) % len(self._locks)
+
+    def get_lock(self, key: Hashable) -> asyncio.Lock:
+        return self._locks[self._stripe(key)]
+
     @asynccontextmanager
-    async def lock(self, user_id: int):
-        lock = await self.get_lock(user_id)
-        async with lock:
+    async def lock(self, key: Hashable):
+        lock = self.get_lock(key)
+        self.acquisitions += 1
+
+        if lock.locked():
+            self.contended += 1
+            started = time.monotonic()
+            await lock.acquire()
+            waited = time.monotonic() - started
+            self.total_wait += waited
+            self.max_wait = max(self.max_wait, waited)
+        else:
+            await lock.acquire()
+
+        try:
             yield
-        if user_id in self._locks:
-            self._locks[user_id] = (self._locks[user_id][0], time.time())
\ No newline at end of file
+        finally:
+            lock.release()
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "stripes": len(self._locks),
+            "locked": sum(1 for lock in self._locks if lock.locked()),
+            "acquisitions": self.acquisitions,
+            "contended": self.contended,
+            "contention_ratio": self.contended / self.acquisitions if self.acquisitions else 0.0,
+            "average_wait": self.total_wait / self.contended if self.contended else 0.0,
+            "max_wait": self.max_wait,
+        }
+
+# Отдельная блокировка на каждый ключ для длинных критических секций (запросы к API):
+# у разных ключей нет общей блокировки, как у полос StripedLockManager. Блокировка
+# живёт, пока её держат или ждут, и удаляется последним вышедшим, поэтому очистка не нужна
+class KeyedLockManager:
+    def __init__(self):
+        # ключ -> (блокировка, сколько задач её держат или ждут)
+        self._locks: Dict[Hashable, Tuple[asyncio.Lock, int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+    @asynccontextmanager
+    async def lock(self, key: Hashable):
+        lock, users = self._locks.get(key) or (asyncio.Lock(), 0)
+        self._locks[key] = (lock, users + 1)
+
+        try:
+            async with lock:
+                yield
+        finally:
+            lock, users = self._locks[key]
+            if users <= 1:
+                del self._locks[key]
+            else:
+                self._locks[key] = (lock, users - 1)
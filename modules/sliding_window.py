@@ -0,0 +1,117 @@
+import math
+import typing
+
+# Таблица фиксированного размера с затухающими счётчиками: каждые half_life секунд
+# счётчик теряет половину значения, а новый ключ вытесняет самый слабый счётчик
+class DecayingCounterTable:
+
+    __slots__ = ("_half_life", "_keys", "_scores", "_stamps")
+
+    def __init__(self, size: int, half_life: float):
+        self._half_life = half_life
+        self._keys:   typing.List[typing.Optional[typing.Hashable]] = [None] * size
+        self._scores: typing.List[float] = [0.0] * size
+        self._stamps: typing.List[float] = [0.0] * size
+
+    def _decayed(self, index: int, now: float) -> float:
+        if self._keys[index] is None:
+            return 0.0
+
+        elapsed = now - self._stamps[index]
+        if elapsed <= 0:
+            return self._scores[index]
+
+        return self._scores[index] * math.pow(0.5, elapsed / self._half_life)
+
+    def add(self, key: typing.Hashable, now: float, amount: float = 1.0) -> float:
+        weakest_index = 0
+        weakest_score = math.inf
+
+        for index, stored_key in enumerate(self._keys):
+            score = self._decayed(index, now)
+
+            if stored_key == key:
+                score += amount
+                self._scores[index] = score
+                self._stamps[index] = now
+                return score
+
+            if score < weakest_score:
+                weakest_index = index
+                weakest_score = score
+
+        self._keys[weakest_index]   = key
+        self._scores[weakest_index] = amount
+        self._stamps[weakest_index] = now
+        return amount
+
+    def get(self, key: typing.Hashable, now: float) -> float:
+        for index, stored_key in enumerate(self._keys):
+            if stored_key == key:
+                return self._decayed(index, now)
+        return 0.0
+
+    def max_score(self, now: float) -> float:
+        return max((self._decayed(index, now) for index in range(len(self._keys))), default=0.0)
+
+    def active_count(self, now: float, min_score: float) -> int:
+        return sum(1 for index in range(len(self._keys)) if self._decayed(index, now) >= min_score)
+
+    def clear(self):
+        for index in range(len(self._keys)):
+            self._keys[index]   = None
+            self._scores[index] = 0.0
+            self._stamps[index] = 0.0
+
+# Скользящее окно из корзин фиксированной длины с поддержанием общей суммы:
+# добавление и запрос стоят O(1) (с амортизацией при очистке устаревших корзин)
+class BucketedWindowCounter:
+
+    __slots__ = ("_bucket_seconds", "_buckets", "_last_bucket", "_total")
+
+    def __init__(self, window: float, bucket_seconds: float = 1.0):
+        self._bucket_seconds = bucket_seconds
+        self._buckets: typing.List[int] = [0] * max(1, math.ceil(window / bucket_seconds))
+        self._last_bucket: typing.Optional[int] = None
+        self._total = 0
+
+    def _advance(self, now: float) -> int:
+        bucket = int(now // self._bucket_seconds)
+
+        if self._last_bucket is None:
+            self._last_bucket = bucket
+            return bucket
+
+        gap = bucket - self._last_bucket
+        if gap <= 0:
+            return self._last_bucket
+
+        size = len(self._buckets)
+        if gap >= size:
+            for index in range(size):
+                self._buckets[index] = 0
+            self._total = 0
+        else:
+            for step in range(1, gap + 1):
+                index = (self._last_bucket + step) % size
+                self._total -= self._buckets[index]
+                self._buckets[index] = 0
+
+        self._last_bucket = bucket
+        return bucket
+
+    def add(self, now: float, amount: int = 1) -> int:
+        bucket = self._advance(now)
+        self._buckets[bucket % len(self._buckets)] += amount
+        self._total += amount
+        return self._total
+
+    def total(self, now: float) -> int:
+        self._advance(now)
+        return self._total
+
+    def clear(self):
+        for index in range(len(self._buckets)):
+            self._buckets[index] = 0
+        self._last_bucket = None
+        self._total = 0